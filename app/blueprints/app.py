@@ -1,6 +1,11 @@
 from flask import Flask, redirect,url_for
 from app.blueprints.extensions import db, migrate, mail
+from app.blueprints.database import engine_options, replica_router, make_psycopg_cooperative
+from app.blueprints.survey.streaming import SurveyRequest
+from app.blueprints.ratelimit import rate_limiter, parse_policies
+from app.blueprints.instrumentation import instrumentation
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from dotenv import load_dotenv
 import os
@@ -14,14 +19,47 @@ load_dotenv()
 
 def create_app():
   app = Flask(__name__, template_folder='../templates', static_folder='../static')
+  # enforces File Upload size/type limits while the multipart body streams in
+  app.request_class = SurveyRequest
   @app.route('/')
   def index():
     return redirect(url_for('auth.login'))
     # Configurations
   app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
   app.config['WTF_CSRF_ENABLED'] = True
+  # number of reverse proxies in front of the app whose X-Forwarded-For is trusted
+  proxy_count = int(os.getenv('PROXY_FIX_X_FOR', 0))
+  if proxy_count:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count)
+  app.config['PROXY_FIX_X_FOR'] = proxy_count
+  # limits are per client IP, so they are off by default until the proxy is trusted:
+  # behind an untrusted proxy every client would share the proxy's bucket
+  app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true' if proxy_count else 'false') == 'true'
+  app.config['RATELIMIT_POLICIES'] = parse_policies(os.getenv('RATELIMIT_POLICIES'))
+  # 'memory' is per process; 'sqlite' shares buckets between worker processes on one host
+  app.config['RATELIMIT_BACKEND'] = os.getenv('RATELIMIT_BACKEND', 'memory')
+  app.config['RATELIMIT_STORAGE_PATH'] = os.getenv('RATELIMIT_STORAGE_PATH', os.path.join(app.instance_path, 'ratelimit.db'))
+  app.config['RATELIMIT_MAX_KEYS'] = int(os.getenv('RATELIMIT_MAX_KEYS', 100000))
+  # registered before CSRF so throttled requests are rejected before any other work
+  rate_limiter.init_app(app)
   csrf.init_app(app)
   app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
+  # connection pool of each engine (primary and every replica); pre-ping replaces connections the server dropped
+  app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'],
+    pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+    max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    pool_pre_ping=os.getenv('DB_POOL_PRE_PING', 'true') == 'true'
+  )
+  # comma-separated read replicas serving the read-only endpoints; empty reads everything from the primary
+  app.config['DATABASE_REPLICA_URIS'] = [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+  app.config['DATABASE_REPLICA_MAX_LAG'] = float(os.getenv('DATABASE_REPLICA_MAX_LAG', 5))
+  app.config['DATABASE_REPLICA_CHECK_INTERVAL'] = float(os.getenv('DATABASE_REPLICA_CHECK_INTERVAL', 5))
+  # replication delay in seconds as one value; defaults to a PostgreSQL streaming-replication query
+  app.config['DATABASE_REPLICA_LAG_QUERY'] = os.getenv('DATABASE_REPLICA_LAG_QUERY')
+  app.config['DATABASE_PRIMARY_STICKY_SECONDS'] = float(os.getenv('DATABASE_PRIMARY_STICKY_SECONDS', 10))
   
   @app.context_processor
   def inject_csrf_token():
@@ -34,7 +72,61 @@ def create_app():
   app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
   app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
   app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+  # OTP mails are queued and sent by background workers unless MAIL_ASYNC=false
+  app.config['MAIL_ASYNC'] = os.getenv('MAIL_ASYNC', 'true') == 'true'
+  app.config['MAIL_QUEUE_SIZE'] = int(os.getenv('MAIL_QUEUE_SIZE', 1000))
+  app.config['MAIL_WORKERS'] = int(os.getenv('MAIL_WORKERS', 2))
+  app.config['MAIL_MAX_RETRIES'] = int(os.getenv('MAIL_MAX_RETRIES', 5))
+  app.config['MAIL_RETRY_BACKOFF'] = float(os.getenv('MAIL_RETRY_BACKOFF', 1.0))
+  app.config['MAIL_TIMEOUT'] = float(os.getenv('MAIL_TIMEOUT', 10))
+  app.config['MAIL_IDLE_TIMEOUT'] = float(os.getenv('MAIL_IDLE_TIMEOUT', 30))
   
+  # JSON table of platform detection rules; edit or replace it to add platforms
+  app.config['PLATFORM_RULES_PATH'] = os.getenv('PLATFORM_RULES_PATH')
+  app.config['PLATFORM_CACHE_SIZE'] = int(os.getenv('PLATFORM_CACHE_SIZE', 4096))
+
+  # Logged-in user snapshot cache (Flask-Login user_loader)
+  app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 1024))
+  app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 300))
+  # Compiled survey schema cache (respond / fetch-questions / submit)
+  # each lookup re-checks surveys.updated_at, so edits and publishes reach every worker at
+  # once; the TTL only drops idle entries
+  app.config['SCHEMA_CACHE_SIZE'] = int(os.getenv('SCHEMA_CACHE_SIZE', 512))
+  app.config['SCHEMA_CACHE_TTL'] = int(os.getenv('SCHEMA_CACHE_TTL', 300))
+  # Optional rendered-HTML cache for public survey pages
+  app.config['SURVEY_HTML_CACHE'] = os.getenv('SURVEY_HTML_CACHE') == 'true'
+  app.config['SURVEY_HTML_CACHE_SIZE'] = int(os.getenv('SURVEY_HTML_CACHE_SIZE', 256))
+  # File uploads: staged locally, pushed to storage by background workers
+  app.config['UPLOAD_STAGING_DIR'] = os.getenv('UPLOAD_STAGING_DIR', os.path.join(app.instance_path, 'staging'))
+  app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', 4))
+  app.config['UPLOAD_MAX_RETRIES'] = int(os.getenv('UPLOAD_MAX_RETRIES', 5))
+  app.config['UPLOAD_RETRY_BACKOFF'] = float(os.getenv('UPLOAD_RETRY_BACKOFF', 1.0))
+  app.config['FILE_STORAGE_BACKEND'] = os.getenv('FILE_STORAGE_BACKEND', 'cloudinary')
+  app.config['LOCAL_STORAGE_DIR'] = os.getenv('LOCAL_STORAGE_DIR', os.path.join(app.instance_path, 'files'))
+  app.config['LOCAL_STORAGE_URL'] = os.getenv('LOCAL_STORAGE_URL', '/survey/files')
+  app.config['ANALYTICS_CUBE_CACHE_SIZE'] = int(os.getenv('ANALYTICS_CUBE_CACHE_SIZE', 32))
+  app.config['ANALYTICS_CUBE_CACHE_TTL'] = int(os.getenv('ANALYTICS_CUBE_CACHE_TTL', 600))
+  # 'memory' serves one process; 'file' shares updates between worker processes on one host
+  app.config['LIVE_BROKER'] = os.getenv('LIVE_BROKER', 'memory')
+  app.config['LIVE_BROKER_DIR'] = os.getenv('LIVE_BROKER_DIR', os.path.join(app.instance_path, 'live'))
+  app.config['LIVE_POLL_INTERVAL'] = float(os.getenv('LIVE_POLL_INTERVAL', 0.2))
+  app.config['LIVE_QUEUE_SIZE'] = int(os.getenv('LIVE_QUEUE_SIZE', 256))
+  app.config['LIVE_KEEPALIVE'] = int(os.getenv('LIVE_KEEPALIVE', 15))
+  app.config['LIVE_RESYNC_INTERVAL'] = int(os.getenv('LIVE_RESYNC_INTERVAL', 60))
+  # surveys per /survey/import request or /survey/<id>/clone call
+  app.config['SURVEY_IMPORT_MAX_SURVEYS'] = int(os.getenv('SURVEY_IMPORT_MAX_SURVEYS', 1000))
+  # 'direct' writes each submission in the request; 'spool' appends it to a local log drained in batches
+  app.config['SUBMISSION_MODE'] = os.getenv('SUBMISSION_MODE', 'direct')
+  app.config['SUBMISSION_SPOOL_DIR'] = os.getenv('SUBMISSION_SPOOL_DIR', os.path.join(app.instance_path, 'spool'))
+  app.config['SUBMISSION_SPOOL_FSYNC_INTERVAL'] = float(os.getenv('SUBMISSION_SPOOL_FSYNC_INTERVAL', 0.005))
+  app.config['SUBMISSION_SPOOL_FLUSH_INTERVAL'] = float(os.getenv('SUBMISSION_SPOOL_FLUSH_INTERVAL', 1.0))
+  app.config['SUBMISSION_SPOOL_SEGMENT_RECORDS'] = int(os.getenv('SUBMISSION_SPOOL_SEGMENT_RECORDS', 500))
+  # Opt-in request profiling served at /metrics (Prometheus text format)
+  app.config['INSTRUMENTATION_ENABLED'] = os.getenv('INSTRUMENTATION_ENABLED') == 'true'
+  app.config['INSTRUMENTATION_N_PLUS_ONE_THRESHOLD'] = int(os.getenv('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10))
+  # bearer token required to scrape /metrics, if set
+  app.config['INSTRUMENTATION_METRICS_TOKEN'] = os.getenv('INSTRUMENTATION_METRICS_TOKEN')
+
   cloudinary.config(
     cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
     api_key=os.getenv('CLOUDINARY_API_KEY'),
@@ -43,22 +135,43 @@ def create_app():
 
   
   
+  # under gevent workers, database waits yield to other requests
+  make_psycopg_cooperative()
+  replica_router.init_app(app)
   db.init_app(app)
   migrate.init_app(app, db)
+  instrumentation.init_app(app)
   mail.init_app(app)
+  from app.blueprints.mailer import mail_queue
+  mail_queue.init_app(app)
   
   login_manager = LoginManager()
   login_manager.init_app(app)
-  # rate_limit_tracker = {}
 
   @login_manager.user_loader
   def load_user(user_id):
-      from app.blueprints.people.models import User
-      return User.query.get(int(user_id))
+      from app.blueprints.people.identity import load_user_snapshot
+      return load_user_snapshot(user_id)
   
   
   from app.blueprints.people.route import auth
   from app.blueprints.survey.route import survey
+  from app.blueprints.people.identity import user_cache
+  user_cache.configure(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+  from app.blueprints.survey import platforms
+  platforms.configure(app.config['PLATFORM_RULES_PATH'], app.config['PLATFORM_CACHE_SIZE'])
+  from app.blueprints.survey.schema import schema_cache
+  schema_cache.configure(maxsize=app.config['SCHEMA_CACHE_SIZE'], ttl=app.config['SCHEMA_CACHE_TTL'])
+  from app.blueprints.survey.conditional import html_cache
+  html_cache.configure(maxsize=app.config['SURVEY_HTML_CACHE_SIZE'])
+  from app.blueprints.survey.cube import cube_cache
+  cube_cache.configure(maxsize=app.config['ANALYTICS_CUBE_CACHE_SIZE'], ttl=app.config['ANALYTICS_CUBE_CACHE_TTL'])
+  from app.blueprints.survey.uploads import upload_worker
+  upload_worker.init_app(app)
+  from app.blueprints.survey.live import live_updates
+  live_updates.init_app(app)
+  from app.blueprints.survey.spool import submission_spool
+  submission_spool.init_app(app)
   app.register_blueprint(auth, url_prefix='/auth')
   app.register_blueprint(survey, url_prefix='/survey')
   
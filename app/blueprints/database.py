@@ -0,0 +1,219 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+# endpoints that only read; their queries go to a replica when one is configured and fresh
+READ_ONLY_ENDPOINTS = (
+    "survey.dashboard",
+    "survey.results",
+    "survey.respond",
+    "survey.fetch_questions",
+    "survey.survey_summary",
+    "survey.survey_crosstab",
+    "survey.export_responses",
+)
+# replication delay in seconds, by dialect; 0 when the replica has replayed
+# everything it received (an idle primary would otherwise look lagged)
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+        "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+# other dialects are only checked for reachability
+DEFAULT_LAG_QUERY = "SELECT 0"
+# session key holding the time until which a client that just wrote reads from the primary
+STICKY_KEY = "_db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_primary_only = ContextVar("primary_only", default=False)
+
+
+def engine_options(uri, pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the primary and every replica. Pool
+    sizing is left out for in-memory SQLite, whose single shared
+    connection has no pool to size.
+    """
+    options = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+    url = make_url(uri) if uri else None
+    if url is None or url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    return options
+
+
+def make_psycopg_cooperative():
+    """
+    Make psycopg2 wait for the server through gevent, so a query in flight
+    yields to other greenlets instead of blocking the worker process. Only
+    acts when gevent has patched the socket module (gevent workers).
+    :return: True if the wait callback was installed
+    """
+    try:
+        from gevent import monkey
+        from gevent.socket import wait_read, wait_write
+        from psycopg2 import OperationalError, extensions
+    except ImportError:
+        return False
+    if not monkey.is_module_patched("socket"):
+        return False
+
+    def wait(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                return
+            if state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise OperationalError(f"Bad result from poll: {state!r}")
+
+    extensions.set_wait_callback(wait)
+    return True
+
+
+@contextmanager
+def primary():
+    """
+    Send the enclosed queries to the primary even in a read-only request,
+    e.g. to fill a cache that outlives the request.
+    """
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Picks the database a read-only request reads from. Replicas are
+    configured as SQLAlchemy binds ("replica_0", ...) and probed at most
+    every ``check_interval`` seconds; one that is unreachable or more than
+    ``max_lag`` seconds behind is skipped until a later probe finds it
+    healthy, and with none left requests read from the primary. A client
+    that just wrote reads from the primary for ``sticky_seconds`` so it
+    sees its own changes.
+    """
+
+    def __init__(self):
+        self.keys = ()
+        self.max_lag = 5.0
+        self.check_interval = 5.0
+        self.sticky_seconds = 10.0
+        self.lag_query = None
+        self.reads = {}
+        self.fallbacks = 0
+        self._state = {}
+        self._locks = {}
+        self._next = 0
+
+    def init_app(self, app):
+        """
+        Register the replica binds and request hooks; call before
+        db.init_app so the binds get engines.
+        """
+        uris = app.config.get("DATABASE_REPLICA_URIS") or []
+        self.keys = tuple(f"replica_{i}" for i in range(len(uris)))
+        self.max_lag = app.config.get("DATABASE_REPLICA_MAX_LAG", 5.0)
+        self.check_interval = app.config.get("DATABASE_REPLICA_CHECK_INTERVAL", 5.0)
+        self.sticky_seconds = app.config.get("DATABASE_PRIMARY_STICKY_SECONDS", 10.0)
+        self.lag_query = app.config.get("DATABASE_REPLICA_LAG_QUERY")
+        self.reads = {key: 0 for key in self.keys}
+        self._state = {}
+        self._locks = {key: threading.Lock() for key in self.keys}
+        if not self.keys:
+            return
+
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds.update(zip(self.keys, uris))
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+        @app.before_request
+        def _route_reads():
+            if request.endpoint in READ_ONLY_ENDPOINTS and session.get(STICKY_KEY, 0) < time.time():
+                g._db_read_only = True
+
+        @app.after_request
+        def _stick_to_primary(response):
+            if self.sticky_seconds > 0 and request.method not in SAFE_METHODS and response.status_code < 400:
+                session[STICKY_KEY] = time.time() + self.sticky_seconds
+            return response
+
+    def engine_for(self, engines):
+        """
+        Replica engine for the current request, or None for the primary.
+        The choice is made once per request so all its reads see one database.
+        """
+        if not self.keys or _primary_only.get() or not has_app_context() or not g.get("_db_read_only"):
+            return None
+        key = g.get("_db_replica")
+        if key is None:
+            key = g._db_replica = self._choose(engines) or ""
+        return engines[key] if key else None
+
+    def _choose(self, engines):
+        now = time.monotonic()
+        fresh = [key for key in self.keys if self._is_fresh(key, engines[key], now)]
+        if not fresh:
+            self.fallbacks += 1
+            return None
+        self._next += 1
+        key = fresh[self._next % len(fresh)]
+        self.reads[key] += 1
+        return key
+
+    def _is_fresh(self, key, engine, now):
+        checked_at, lag = self._state.get(key, (None, None))
+        # one request re-probes a stale replica; the others use the last result
+        if (checked_at is None or now - checked_at >= self.check_interval) and self._locks[key].acquire(blocking=False):
+            try:
+                lag = self._probe(key, engine, lag)
+                self._state[key] = (now, lag)
+            finally:
+                self._locks[key].release()
+        return lag is not None and lag <= self.max_lag
+
+    def _probe(self, key, engine, previous):
+        query = self.lag_query or LAG_QUERIES.get(engine.dialect.name, DEFAULT_LAG_QUERY)
+        try:
+            with engine.connect() as conn:
+                return float(conn.execute(text(query)).scalar() or 0)
+        except Exception as e:
+            if previous is not None:
+                print(f"Replica {key} unavailable, reading from the primary: {e}")
+            return None
+
+    def stats(self):
+        """
+        {key: {"lag", "reads"}} per replica; lag is None while unavailable.
+        """
+        return {
+            key: {"lag": self._state.get(key, (None, None))[1], "reads": self.reads.get(key, 0)}
+            for key in self.keys
+        }
+
+
+class RoutingSession(Session):
+    """
+    Session whose reads in a read-only request go to a replica; flushes
+    and INSERT/UPDATE/DELETE statements always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            engine = replica_router.engine_for(self._db.engines)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+replica_router = ReplicaRouter()
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_mail import Mail
+from app.blueprints.database import RoutingSession
 
-db = SQLAlchemy()
+# reads of read-only endpoints may go to a replica (see database.replica_router)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 mail = Mail()
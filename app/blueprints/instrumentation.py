@@ -0,0 +1,326 @@
+import hmac
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# request duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# endpoints not recorded (the scrape itself, static files)
+SKIP_ENDPOINTS = ("metrics", "static")
+
+# bound-parameter lists such as "IN (?, ?, ?)" or "(%(id_1_1)s, %(id_1_2)s)"
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s)(?:\s*,\s*(?:\?|%\(\w+\)s))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current = ContextVar("request_stats", default=None)
+
+
+def statement_shape(statement):
+    """
+    SQL text with whitespace and expanded parameter lists collapsed, so the
+    same query issued with different arguments has the same shape.
+    """
+    return _PARAM_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestStats:
+    """
+    Time and statement counts collected while one request is handled.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.external = Counter()
+        self.shapes = Counter()
+        self._templates = []
+
+    def repeated_statements(self, threshold):
+        """
+        (count, shape) of statements issued at least ``threshold`` times.
+        """
+        return [(count, shape) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class Metrics:
+    """
+    Process-wide aggregates, rendered in the Prometheus text format. Each
+    worker process keeps its own, so scrape every worker (or run one).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.sql_count = Counter()
+            self.sql_time = Counter()
+            self.template_time = Counter()
+            self.request_external = Counter()
+            self.n_plus_one = Counter()
+            self.external_calls = Counter()
+            self.external_errors = Counter()
+            self.external_time = Counter()
+
+    def observe_request(self, endpoint, method, stats, duration):
+        key = (endpoint, method, str(stats.status))
+        with self._lock:
+            entry = self.requests.get(key)
+            if entry is None:
+                entry = self.requests[key] = [[0] * len(BUCKETS), 0, 0.0]
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    entry[0][i] += 1
+            entry[1] += 1
+            entry[2] += duration
+            self.sql_count[endpoint] += stats.sql_count
+            self.sql_time[endpoint] += stats.sql_time
+            self.template_time[endpoint] += stats.template_time
+            for service, seconds in stats.external.items():
+                self.request_external[(endpoint, service)] += seconds
+
+    def observe_n_plus_one(self, endpoint):
+        with self._lock:
+            self.n_plus_one[endpoint] += 1
+
+    def observe_external(self, service, seconds, failed):
+        with self._lock:
+            self.external_calls[service] += 1
+            self.external_time[service] += seconds
+            if failed:
+                self.external_errors[service] += 1
+
+    def render(self, extra=()):
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Request wall time.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (endpoint, method, status), (buckets, count, total) in sorted(self.requests.items()):
+                labels = {"endpoint": endpoint, "method": method, "status": status}
+                for bound, cumulative in zip(BUCKETS, buckets):
+                    lines.append(f"http_request_duration_seconds_bucket{_labels(dict(labels, le=_number(bound)))} {cumulative}")
+                lines.append(f"http_request_duration_seconds_bucket{_labels(dict(labels, le='+Inf'))} {count}")
+                lines.append(f"http_request_duration_seconds_count{_labels(labels)} {count}")
+                lines.append(f"http_request_duration_seconds_sum{_labels(labels)} {_number(total)}")
+            family("http_request_sql_queries_total", "counter", "SQL statements executed while handling requests.",
+                   [({"endpoint": e}, v) for e, v in sorted(self.sql_count.items())])
+            family("http_request_sql_seconds_total", "counter", "Time spent in SQL statements while handling requests.",
+                   [({"endpoint": e}, v) for e, v in sorted(self.sql_time.items())])
+            family("http_request_template_seconds_total", "counter", "Time spent rendering templates.",
+                   [({"endpoint": e}, v) for e, v in sorted(self.template_time.items())])
+            family("http_request_external_seconds_total", "counter", "Time spent calling external services while handling requests.",
+                   [({"endpoint": e, "service": s}, v) for (e, s), v in sorted(self.request_external.items())])
+            family("http_request_n_plus_one_total", "counter", "Requests that repeated one SQL statement past the N+1 threshold.",
+                   [({"endpoint": e}, v) for e, v in sorted(self.n_plus_one.items())])
+            family("external_calls_total", "counter", "Calls to external services, from requests and background workers.",
+                   [({"service": s}, v) for s, v in sorted(self.external_calls.items())])
+            family("external_call_errors_total", "counter", "External service calls that raised.",
+                   [({"service": s}, v) for s, v in sorted(self.external_errors.items())])
+            family("external_call_seconds_total", "counter", "Time spent in external service calls.",
+                   [({"service": s}, v) for s, v in sorted(self.external_time.items())])
+        for name, kind, help_text, samples in extra:
+            family(name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def track_external(service):
+    """
+    Time a call to an external service (Cloudinary, SMTP). Always counted in
+    the process totals; also charged to the current request, if any.
+    """
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe_external(service, elapsed, failed)
+        stats = _current.get()
+        if stats is not None:
+            stats.external[service] += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or not conn.info.get("query_start"):
+        return
+    stats.sql_time += time.perf_counter() - conn.info["query_start"].pop()
+    stats.sql_count += 1
+    stats.shapes[statement_shape(statement)] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None:
+        stats._templates.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _current.get()
+    if stats is not None and stats._templates:
+        start = stats._templates.pop()
+        # nested renders are already part of the outer one
+        if not stats._templates:
+            stats.template_time += time.perf_counter() - start
+
+
+class Instrumentation:
+    """
+    Opt-in (INSTRUMENTATION_ENABLED) per-request profiling: wall time, SQL
+    statement count and time, template render time and external call time
+    per endpoint, served in the Prometheus text format at /metrics. A
+    request that runs the same statement INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+    times or more is reported as a likely N+1 query. Responses carry a
+    Server-Timing header so the numbers show up in browser dev tools.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 10
+        self.token = None
+        self._listening = False
+
+    def init_app(self, app):
+        self.enabled = app.config["INSTRUMENTATION_ENABLED"]
+        self.threshold = app.config["INSTRUMENTATION_N_PLUS_ONE_THRESHOLD"]
+        self.token = app.config["INSTRUMENTATION_METRICS_TOKEN"]
+        app.extensions["instrumentation"] = self
+        if not self.enabled:
+            return
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            self._listening = True
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_rendered, app)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_response)
+        app.teardown_request(self.end_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def start_request(self):
+        if request.endpoint not in SKIP_ENDPOINTS:
+            g.instrumentation_token = _current.set(RequestStats())
+
+    def finish_response(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        stats.status = response.status_code
+        timing = [f"db;dur={stats.sql_time * 1000:.1f};desc=\"{stats.sql_count} queries\"",
+                  f"tpl;dur={stats.template_time * 1000:.1f}"]
+        timing += [f"{service};dur={seconds * 1000:.1f}" for service, seconds in stats.external.items()]
+        # streamed bodies are still running, so this is time to first byte
+        timing.append(f"app;dur={(time.perf_counter() - stats.start) * 1000:.1f}")
+        response.headers.add("Server-Timing", ", ".join(timing))
+        return response
+
+    def end_request(self, exc):
+        token = g.pop("instrumentation_token", None)
+        stats = _current.get()
+        if token is None or stats is None:
+            return
+        _current.reset(token)
+        endpoint = request.endpoint or "unmatched"
+        metrics.observe_request(endpoint, request.method, stats, time.perf_counter() - stats.start)
+        repeated = stats.repeated_statements(self.threshold)
+        if repeated:
+            metrics.observe_n_plus_one(endpoint)
+            count, shape = repeated[0]
+            print(f"Possible N+1 in {endpoint}: {count} x {shape[:200]}")
+
+    def metrics_view(self):
+        if self.token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, self.token):
+                return "Unauthorized\n", 401, {"Content-Type": "text/plain"}
+        return metrics.render(_component_metrics()), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def _component_metrics():
+    """
+    Gauges and counters of the caches and queues, read at scrape time.
+    """
+    from app.blueprints.people.identity import user_cache
+    from app.blueprints.survey.schema import schema_cache
+    from app.blueprints.survey.conditional import html_cache
+    from app.blueprints.survey.cube import cube_cache
+    from app.blueprints.survey import platforms
+    from app.blueprints.mailer import mail_queue
+    from app.blueprints.database import replica_router
+
+    caches = {"user": user_cache.stats(), "schema": schema_cache.stats(),
+              "survey_html": html_cache.stats(), "analytics_cube": cube_cache.stats()}
+    if platforms._classifier is not None:
+        info = platforms._classifier.cache_info()
+        caches["platform"] = {"size": info.currsize, "hits": info.hits, "misses": info.misses}
+    families = [
+        ("cache_entries", "gauge", "Entries currently cached.",
+         [({"cache": name}, s["size"]) for name, s in caches.items()]),
+        ("cache_hits_total", "counter", "Cache lookups that found an entry.",
+         [({"cache": name}, s["hits"]) for name, s in caches.items()]),
+        ("cache_misses_total", "counter", "Cache lookups that found nothing.",
+         [({"cache": name}, s["misses"]) for name, s in caches.items()]),
+        ("mail_sent_total", "counter", "Mails delivered by the background queue.", [({}, mail_queue.sent)]),
+        ("mail_failed_total", "counter", "Mails given up on by the background queue.", [({}, mail_queue.failed)]),
+    ]
+    if mail_queue.queue is not None:
+        families.append(("mail_queue_depth", "gauge", "Mails waiting to be sent.", [({}, mail_queue.queue.qsize())]))
+    if replica_router.keys:
+        replicas = replica_router.stats()
+        families += [
+            ("db_replica_lag_seconds", "gauge", "Replication delay at the last probe (absent while unreachable).",
+             [({"replica": key}, s["lag"]) for key, s in replicas.items() if s["lag"] is not None]),
+            ("db_replica_reads_total", "counter", "Read-only requests served by the replica.",
+             [({"replica": key}, s["reads"]) for key, s in replicas.items()]),
+            ("db_replica_fallbacks_total", "counter", "Read-only requests sent to the primary for want of a fresh replica.",
+             [({}, replica_router.fallbacks)]),
+        ]
+    return families
+
+
+instrumentation = Instrumentation()
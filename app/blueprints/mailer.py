@@ -0,0 +1,224 @@
+import os
+import queue
+import smtplib
+import socketserver
+import threading
+import time
+import click
+from flask import current_app
+from flask_mail import Connection
+from app.blueprints.instrumentation import track_external
+
+# SMTP errors that will not go away by trying again
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPNotSupportedError)
+
+
+class MailQueueFull(Exception):
+    """
+    Raised when the mail queue is full and the message was not accepted.
+    """
+
+
+class PersistentConnection(Connection):
+    """
+    Flask-Mail connection that applies a socket timeout, so a stalled mail
+    server ties up a worker for at most MAIL_TIMEOUT seconds per attempt.
+    """
+
+    def __init__(self, mail_state, timeout):
+        super().__init__(mail_state)
+        self.timeout = timeout
+
+    def configure_host(self):
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+    def close(self):
+        if self.host is not None:
+            try:
+                self.host.quit()
+            except (smtplib.SMTPException, OSError):
+                self.host.close()
+            self.host = None
+
+
+class MailQueue:
+    """
+    Background mail delivery: messages go into a bounded queue and a pool of
+    worker threads sends them, each keeping its SMTP connection open across
+    messages (closed after MAIL_IDLE_TIMEOUT seconds without mail). Failed
+    sends reconnect and retry with exponential backoff. With MAIL_ASYNC
+    false, messages are sent inline instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["MAIL_ASYNC"]
+        self.workers = app.config["MAIL_WORKERS"]
+        self.max_retries = app.config["MAIL_MAX_RETRIES"]
+        self.backoff = app.config["MAIL_RETRY_BACKOFF"]
+        self.idle_timeout = app.config["MAIL_IDLE_TIMEOUT"]
+        self.timeout = app.config["MAIL_TIMEOUT"]
+        self.queue = queue.Queue(app.config["MAIL_QUEUE_SIZE"])
+        app.extensions["mail_queue"] = self
+        app.cli.add_command(mail_sink_command)
+
+    def send(self, message):
+        """
+        Queue a Flask-Mail Message for delivery and return immediately.
+        :raises MailQueueFull: when the queue is at capacity
+        """
+        if not self.enabled:
+            with track_external("smtp"), PersistentConnection(current_app.extensions["mail"], self.timeout) as connection:
+                connection.send(message)
+            return
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            raise MailQueueFull("Mail queue is full")
+
+    def _ensure_started(self):
+        # threads do not survive fork, so start them lazily in each worker
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"mail-{i}", daemon=True).start()
+
+    def _run(self):
+        with self.app.app_context():
+            connection = None
+            while True:
+                try:
+                    message = self.queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    if connection is not None:
+                        connection.close()
+                        connection = None
+                    continue
+                connection = self._deliver(connection, message)
+                self.queue.task_done()
+
+    def _deliver(self, connection, message):
+        """
+        Send one message, reconnecting and retrying on transient errors.
+        :return: the connection to reuse for the next message (or None)
+        """
+        for attempt in range(self.max_retries):
+            try:
+                with track_external("smtp"):
+                    if connection is None or connection.host is None:
+                        connection = PersistentConnection(current_app.extensions["mail"], self.timeout).__enter__()
+                    connection.send(message)
+                self.sent += 1
+                return connection
+            except PERMANENT_ERRORS as e:
+                print(f"Mail to {message.recipients} rejected: {e}")
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Mail send attempt {attempt + 1} failed: {e}")
+                if connection is not None:
+                    connection.close()
+                connection = None
+                if attempt == self.max_retries - 1:
+                    break
+                time.sleep(self.backoff * (2 ** attempt))
+        self.failed += 1
+        return connection
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP dialogue: accepts every message and hands it to the server.
+    """
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        server = self.server
+        self.reply("220 localhost debugging SMTP sink")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                for data in iter(self.rfile.readline, b""):
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    body.append(data[1:] if data.startswith(b"..") else data)
+                if server.delay:
+                    time.sleep(server.delay)
+                server.received.append((sender, recipients, b"".join(body).decode("utf-8", "replace")))
+                if server.echo:
+                    print(f"---------- mail from {sender} to {', '.join(recipients)}")
+                    print(b"".join(body).decode("utf-8", "replace"))
+                self.reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for a real mail server: accepts everything, keeps the
+    messages in ``received`` and optionally waits ``delay`` seconds per
+    message to mimic a slow server. Point MAIL_SERVER/MAIL_PORT at it.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 2525), delay=0.0, echo=False):
+        super().__init__(address, _SinkHandler)
+        self.delay = delay
+        self.echo = echo
+        self.received = []
+
+
+@click.command("mail-sink")
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=2525, type=int)
+@click.option("--delay", default=0.0, type=float, help="Seconds to stall before accepting each message.")
+def mail_sink_command(host, port, delay):
+    """Run a local SMTP server that prints every message it receives."""
+    server = DebugSMTPServer((host, port), delay=delay, echo=True)
+    click.echo(f"Debugging SMTP sink listening on {host}:{port}")
+    server.serve_forever()
+
+
+mail_queue = MailQueue()
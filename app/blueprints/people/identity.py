@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from flask_login import UserMixin
+from sqlalchemy import event
+from app.blueprints.cache import TTLCache
+from app.blueprints.database import primary
+from app.blueprints.extensions import db
+from app.blueprints.people.models import User
+
+user_cache = TTLCache(maxsize=1024, ttl=300)
+
+
+@dataclass(frozen=True, eq=False)
+class UserSnapshot(UserMixin):
+    """
+    Read-only copy of the User fields requests need, used as current_user
+    so resolving identity does not cost a query. The password hash is
+    deliberately not part of it.
+    """
+    uid: int
+    username: str
+    email: str
+
+    def get_id(self):
+        return self.uid
+
+
+def _load(uid):
+    # cached past the request, so read from the primary rather than a lagging replica
+    with primary():
+        row = db.session.query(User.uid, User.username, User.email).filter(User.uid == uid).first()
+    if row is None:
+        return None
+    return UserSnapshot(uid=row.uid, username=row.username, email=row.email)
+
+
+def load_user_snapshot(user_id):
+    """
+    Flask-Login user loader: cached snapshot of the user, or None if the
+    user does not exist.
+    """
+    try:
+        uid = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return user_cache.get_or_load(uid, lambda: _load(uid))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    # other processes see the change once their entry's TTL runs out
+    user_cache.pop(target.uid)
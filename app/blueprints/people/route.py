@@ -3,7 +3,8 @@ import random
 import time
 from flask_mail import Message
 from werkzeug.security import generate_password_hash, check_password_hash
-from app.blueprints.extensions import db, mail
+from app.blueprints.extensions import db
+from app.blueprints.mailer import mail_queue
 from app.blueprints.people.models import User
 # from app.blueprints.survey.route import survey
 from flask_login import login_user, login_required, logout_user
@@ -48,8 +49,8 @@ def register():
             msg = Message("Your OTP Code", recipients=[email])
             msg.body = f"Your OTP is {otp}. It expires in 5 minutes."
             try:
-                mail.send(msg)
-                print("OTP email sent to:", email)
+                mail_queue.send(msg)
+                print("OTP email queued for:", email)
                 flash("OTP sent to your email. Please verify to complete registration.", "info")
                 return redirect(url_for('auth.verify_otp_form'))
             except Exception as e:
@@ -147,7 +148,7 @@ def resend_otp():
     msg = Message("Your New OTP Code", recipients=[temp_user['email']])
     msg.body = f"Your new OTP is {new_otp}. It expires in 5 minutes."
     try:
-        mail.send(msg)
+        mail_queue.send(msg)
         return jsonify({"success": True, "message": "New OTP sent to your email."}), 200
     except Exception as e:
         import traceback
@@ -0,0 +1,236 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from flask import request, jsonify
+from werkzeug.exceptions import TooManyRequests
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# accepted spellings of each period unit
+PERIOD_UNITS = {
+    **{unit: "second" for unit in ("s", "sec", "secs", "second", "seconds")},
+    **{unit: "minute" for unit in ("m", "min", "mins", "minute", "minutes")},
+    **{unit: "hour" for unit in ("h", "hr", "hrs", "hour", "hours")},
+    **{unit: "day" for unit in ("d", "day", "days")},
+}
+
+# endpoint -> "count/period"; each client IP gets a bucket of ``count`` tokens
+# refilled evenly over the period. Clients behind one NAT (a campus network,
+# a lecture hall) share an address and so share these limits.
+DEFAULT_POLICIES = {
+    "auth.login": "10/minute",
+    "auth.register": "5/minute",
+    "auth.verify_otp_form": "10/minute",
+    "auth.resend_otp": "3/minute",
+    # per client IP and survey
+    "survey.submit_survey": "30/minute",
+}
+# endpoints answered with JSON, so their 429 is JSON too
+JSON_ENDPOINTS = ("auth.resend_otp",)
+# view args that get their own bucket (a busy survey does not throttle others)
+SCOPED_VIEW_ARGS = ("survey_id",)
+
+
+@dataclass(frozen=True)
+class Policy:
+    limit: int
+    period: float
+    methods: tuple = ("POST",)
+
+    @property
+    def rate(self):
+        return self.limit / self.period
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parse "10/minute", "10/s" (see PERIOD_UNITS) or "10/60" seconds into
+        a Policy; the period defaults to a minute.
+        :raises ValueError: on a count below 1, an unknown unit or a
+                            non-positive period
+        """
+        count, _, period = spec.partition("/")
+        period = period.strip().lower() or "minute"
+        if period in PERIOD_UNITS:
+            seconds = PERIODS[PERIOD_UNITS[period]]
+        else:
+            try:
+                seconds = float(period)
+            except ValueError:
+                raise ValueError(f"Unknown rate limit period {period!r} in {spec!r}") from None
+        if not seconds > 0:
+            raise ValueError(f"Rate limit period must be positive in {spec!r}")
+        limit = int(count)
+        if limit < 1:
+            raise ValueError(f"Rate limit count must be at least 1 in {spec!r}")
+        return cls(limit=limit, period=float(seconds))
+
+
+class MemoryBucketStore:
+    """
+    Token buckets for one process, O(1) per check. Buckets are kept in LRU
+    order and the least recently used are evicted beyond ``max_keys``; an
+    idle bucket has refilled anyway, so evicting it loses nothing.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take one token from ``key``'s bucket.
+        :return: (allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets shared by every worker process on a host through a small
+    SQLite file: local stand-in for a shared store such as Redis. Each check
+    is one short write transaction; buckets idle for ``idle_ttl`` seconds
+    are pruned.
+    """
+
+    def __init__(self, path, idle_ttl=3600):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._checks = 0
+
+    def _connection(self):
+        # connections must not cross fork() or threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            self._checks += 1
+            if self._checks % 1000 == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_ttl,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class RateLimiter:
+    """
+    Per-client token-bucket limits for selected endpoints, checked in a
+    before_request hook registered ahead of CSRF protection, so rejected
+    requests never reach form parsing, password hashing or the database.
+    """
+
+    def __init__(self):
+        self.store = MemoryBucketStore()
+        self.policies = {}
+        self.enabled = False
+
+    def init_app(self, app):
+        self.enabled = app.config["RATELIMIT_ENABLED"]
+        specs = dict(DEFAULT_POLICIES)
+        specs.update(app.config["RATELIMIT_POLICIES"])
+        self.policies = {endpoint: Policy.parse(spec) for endpoint, spec in specs.items() if spec}
+        if app.config["RATELIMIT_BACKEND"] == "sqlite":
+            self.store = SQLiteBucketStore(app.config["RATELIMIT_STORAGE_PATH"])
+        else:
+            self.store = MemoryBucketStore(app.config["RATELIMIT_MAX_KEYS"])
+        app.extensions["rate_limiter"] = self
+        app.before_request(self.check)
+        if self.enabled and not app.config.get("PROXY_FIX_X_FOR"):
+            app.logger.warning(
+                "Rate limiting is keyed on the client IP but PROXY_FIX_X_FOR is not set; "
+                "behind a reverse proxy every client shares the proxy's limits"
+            )
+
+    def key(self, endpoint):
+        parts = [endpoint]
+        for arg in SCOPED_VIEW_ARGS:
+            if request.view_args and arg in request.view_args:
+                parts.append(str(request.view_args[arg]))
+        parts.append(request.remote_addr or "-")
+        return ":".join(parts)
+
+    def check(self):
+        if not self.enabled:
+            return None
+        policy = self.policies.get(request.endpoint)
+        if policy is None or request.method not in policy.methods:
+            return None
+        try:
+            allowed, retry_after = self.store.take(self.key(request.endpoint), policy.rate, policy.limit)
+        except Exception as e:
+            # never lock everyone out because the limiter store is unavailable
+            print(f"Rate limiter check failed: {e}")
+            return None
+        if allowed:
+            return None
+
+        retry_after = max(1, math.ceil(retry_after))
+        message = "Too many requests. Please try again later."
+        if request.endpoint in JSON_ENDPOINTS:
+            response = jsonify({"success": False, "message": message})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+        raise TooManyRequests(message, retry_after=retry_after)
+
+
+def parse_policies(value):
+    """
+    "auth.login=20/minute,survey.submit_survey=60/minute" as a dict; an
+    empty limit ("auth.login=") disables that endpoint's policy.
+    """
+    policies = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        endpoint, _, spec = item.partition("=")
+        policies[endpoint.strip()] = spec.strip()
+    return policies
+
+
+rate_limiter = RateLimiter()
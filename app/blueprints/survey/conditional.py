@@ -0,0 +1,84 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from flask import current_app, request, session, make_response
+from app.blueprints.cache import TTLCache
+
+CSRF_PLACEHOLDER = "__SURVEY_CSRF_TOKEN__"
+
+html_cache = TTLCache(maxsize=256, ttl=600)
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _csrf_window():
+    """
+    Seconds after which a page embedding a CSRF token must be re-rendered,
+    or None when pages do not embed one.
+    """
+    if not current_app.config.get("WTF_CSRF_ENABLED", True):
+        return None
+    limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    if not limit:
+        return None
+    return max(int(limit) // 2, 1)
+
+
+def survey_version(survey, csrf_bound=False):
+    """
+    Last-Modified timestamp of a survey page. Pages embedding a CSRF token
+    are rolled forward every half token lifetime so a revalidated copy never
+    carries an expired token.
+    """
+    version = _as_utc(survey.updated_at)
+    window = _csrf_window() if csrf_bound else None
+    if window:
+        bucket = datetime.fromtimestamp(int(time.time()) // window * window, timezone.utc)
+        version = max(version, bucket)
+    return version
+
+
+def make_etag(*parts):
+    return hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def session_token_key():
+    """
+    Fingerprint of the session's raw CSRF token, so a 304 is only sent to a
+    client whose cached page carries a token that is valid for its session.
+    Returns None when the session has no token yet.
+    """
+    field = current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token")
+    raw = session.get(field)
+    if not raw:
+        return None
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def is_not_modified(etag, last_modified, allow_date=True):
+    """
+    Evaluate If-None-Match (preferred) or If-Modified-Since for the current
+    request.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if allow_date and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_response(body, etag, last_modified, status=200):
+    response = make_response(body, status)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+
+def not_modified(etag, last_modified):
+    return conditional_response("", etag, last_modified, status=304)
@@ -0,0 +1,340 @@
+import numpy as np
+from sqlalchemy import func, select
+from app.blueprints.cache import TTLCache
+from .models import db, Answer, AnswerSelection, Response, PlatformTally
+from app.blueprints.survey.tallies import (
+    CHOICE_TYPES, MULTI_SELECT_TYPES, NUMERIC_TYPES, DATE_TYPES, UNKNOWN_PLATFORM
+)
+
+PLATFORM = "platform"
+
+cube_cache = TTLCache(maxsize=32, ttl=600)
+
+
+class CubeError(ValueError):
+    """
+    Raised for a dimension, measure or filter the cube cannot serve.
+    """
+
+
+class Dimension:
+    """
+    A categorical column aligned with the cube's responses: either one
+    category code per response (-1 when unanswered) or, for multi-select
+    questions, a response x option boolean matrix.
+    """
+
+    def __init__(self, labels, codes=None, indicators=None):
+        self.labels = labels
+        self.codes = codes
+        self.indicators = indicators
+
+    @property
+    def multi(self):
+        return self.indicators is not None
+
+    def onehot(self, mask):
+        """
+        Float indicator matrix of the responses selected by ``mask``.
+        """
+        if self.multi:
+            return self.indicators[mask].astype(np.float64)
+        codes = self.codes[mask]
+        matrix = np.zeros((len(codes), len(self.labels)))
+        answered = codes >= 0
+        matrix[np.flatnonzero(answered), codes[answered]] = 1.0
+        return matrix
+
+    def select(self, values):
+        """
+        Mask of responses whose answer is one of ``values`` (any of them,
+        for multi-select questions).
+        """
+        lookup = {str(label): i for i, label in enumerate(self.labels)}
+        wanted = []
+        for value in values:
+            key = str(value)
+            if key not in lookup:
+                try:
+                    key = str(float(value))
+                except (TypeError, ValueError):
+                    continue
+            if key in lookup:
+                wanted.append(lookup[key])
+        if self.multi:
+            return self.indicators[:, wanted].any(axis=1)
+        return np.isin(self.codes, wanted)
+
+
+def _categorical(labels, response_index, values):
+    """
+    Category-code column for values answered by the responses at
+    ``response_index``; ``labels`` seeds the category order (declared
+    options first) and unseen values are appended.
+    :return: (codes, labels)
+    """
+    lookup = {label: i for i, label in enumerate(labels)}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+    labels = list(lookup)
+    column = np.full(response_index.size, -1, dtype=np.int32)
+    column[response_index] = codes
+    return column, labels
+
+
+class SurveyCube:
+    """
+    Columnar, response-aligned copy of a survey's answers: the response ids,
+    a category code column (or option matrix) per choice/date question and
+    the platform, and a float column (NaN when unanswered) per numeric
+    question. Filters, group-bys and cross-tabs are vectorized over these
+    arrays.
+    """
+
+    def __init__(self, survey, response_ids, dimensions, measures):
+        self.survey = survey
+        self.response_ids = response_ids
+        self.dimensions = dimensions
+        self.measures = measures
+
+    def __len__(self):
+        return self.response_ids.size
+
+    @classmethod
+    def from_rows(cls, survey, responses, answers, selections=()):
+        """
+        :param survey: compiled survey
+        :param responses: iterable of (response_id, platform)
+        :param answers: iterable of (response_id, question_id, answer_text, answer_number)
+        :param selections: iterable of (response_id, question_id, option_id)
+                           for multi-select questions
+        """
+        responses = list(responses)
+        response_ids = np.fromiter((r[0] for r in responses), dtype=np.int64, count=len(responses))
+        order = np.argsort(response_ids, kind="stable")
+        response_ids = response_ids[order]
+        platforms = [responses[i][1] or UNKNOWN_PLATFORM for i in order]
+
+        dimensions = {}
+        codes, labels = _categorical([], np.arange(len(platforms)), platforms)
+        dimensions[PLATFORM] = Dimension(labels, codes=codes)
+
+        by_question = {}
+        for response_id, question_id, text, number in answers:
+            by_question.setdefault(question_id, []).append((response_id, text, number))
+        selected = {}
+        for response_id, question_id, option_id in selections:
+            selected.setdefault(question_id, []).append((response_id, option_id))
+
+        measures = {}
+        for q in survey.questions:
+            rows = by_question.get(q.id, [])
+            ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            index = np.searchsorted(response_ids, ids)
+            index = np.minimum(index, max(response_ids.size - 1, 0))
+            known = response_ids[index] == ids if ids.size else np.zeros(0, dtype=bool)
+
+            if q.qtype in NUMERIC_TYPES:
+                values = np.fromiter(
+                    (np.nan if r[2] is None else r[2] for r in rows), dtype=np.float64, count=len(rows)
+                )
+                column = np.full(response_ids.size, np.nan)
+                column[index[known]] = values[known]
+                measures[q.id] = column
+                # numeric questions can also be grouped by their distinct values
+                answered = ~np.isnan(column)
+                uniques, inverse = np.unique(column[answered], return_inverse=True)
+                codes = np.full(response_ids.size, -1, dtype=np.int32)
+                codes[answered] = inverse
+                dimensions[q.id] = Dimension([float(u) for u in uniques], codes=codes)
+
+            elif q.qtype in MULTI_SELECT_TYPES:
+                pairs = selected.get(q.id, [])
+                column = {option_id: i for i, option_id in enumerate(q.option_ids)}
+                ids = np.fromiter((p[0] for p in pairs), dtype=np.int64, count=len(pairs))
+                cols = np.fromiter((column.get(p[1], -1) for p in pairs), dtype=np.int64, count=len(pairs))
+                index = np.minimum(np.searchsorted(response_ids, ids), max(response_ids.size - 1, 0))
+                keep = (cols >= 0) & (response_ids[index] == ids) if ids.size else np.zeros(0, dtype=bool)
+                indicators = np.zeros((response_ids.size, len(q.options)), dtype=bool)
+                indicators[index[keep], cols[keep]] = True
+                dimensions[q.id] = Dimension([str(opt) for opt in q.options], indicators=indicators)
+
+            elif q.qtype in CHOICE_TYPES + DATE_TYPES:
+                keep = [i for i in np.flatnonzero(known) if rows[i][1]]
+                codes, labels = _categorical(
+                    [str(opt) for opt in q.options], index[keep], [rows[i][1] for i in keep]
+                )
+                dimensions[q.id] = Dimension(labels, codes=codes)
+
+        return cls(survey, response_ids, dimensions, measures)
+
+    def dimension(self, key):
+        if key not in self.dimensions:
+            raise CubeError(f"'{key}' cannot be grouped by")
+        return self.dimensions[key]
+
+    def measure(self, key):
+        if key not in self.measures:
+            raise CubeError(f"'{key}' is not a numeric question")
+        return self.measures[key]
+
+    def mask(self, filters=None):
+        """
+        Boolean mask of responses matching every ``{dimension: [values]}`` filter.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, values in (filters or {}).items():
+            mask &= self.dimension(key).select(values)
+        return mask
+
+    def group_by(self, key, filters=None, measure=None):
+        """
+        Response counts per category of ``key``, plus mean and sum of the
+        ``measure`` question per category when given.
+        """
+        dim = self.dimension(key)
+        mask = self.mask(filters)
+        result = {"labels": dim.labels}
+        if dim.multi:
+            onehot = dim.onehot(mask)
+            result["counts"] = onehot.sum(axis=0).astype(np.int64).tolist()
+            if measure is not None:
+                values = self.measure(measure)[mask]
+                answered = ~np.isnan(values)
+                counts = onehot[answered].sum(axis=0)
+                sums = onehot[answered].T @ values[answered]
+                result.update(_measure_result(counts, sums))
+            return result
+
+        codes = dim.codes[mask]
+        answered = codes >= 0
+        size = len(dim.labels)
+        result["counts"] = np.bincount(codes[answered], minlength=size).tolist()
+        if measure is not None:
+            values = self.measure(measure)[mask]
+            answered &= ~np.isnan(values)
+            counts = np.bincount(codes[answered], minlength=size)
+            sums = np.bincount(codes[answered], weights=values[answered], minlength=size)
+            result.update(_measure_result(counts, sums))
+        return result
+
+    def crosstab(self, rows, cols, filters=None, measure=None):
+        """
+        Response counts for every (rows category, cols category) pair, plus
+        the count, sum and mean of the ``measure`` question per cell over the
+        responses that answered it, when given.
+        """
+        row_dim, col_dim = self.dimension(rows), self.dimension(cols)
+        mask = self.mask(filters)
+        result = {
+            "rows": row_dim.labels,
+            "cols": col_dim.labels,
+            "counts": np.rint(_cell_totals(row_dim, col_dim, mask)).astype(np.int64).tolist(),
+        }
+        if measure is not None:
+            values = self.measure(measure)
+            answered = mask & ~np.isnan(values)
+            counts = _cell_totals(row_dim, col_dim, answered)
+            sums = _cell_totals(row_dim, col_dim, answered, values[answered])
+            result.update(_measure_result(counts, sums))
+        return result
+
+
+def _cell_totals(row_dim, col_dim, mask, weights=None):
+    """
+    (rows x cols) matrix of masked responses per pair of categories, or of
+    their ``weights`` (one per masked response) when given.
+    """
+    nr, nc = len(row_dim.labels), len(col_dim.labels)
+    if not row_dim.multi and not col_dim.multi:
+        # both single-valued: one bincount over combined cell codes
+        rc, cc = row_dim.codes[mask], col_dim.codes[mask]
+        both = (rc >= 0) & (cc >= 0)
+        cells = rc[both].astype(np.int64) * nc + cc[both]
+        return np.bincount(cells, weights=None if weights is None else weights[both],
+                           minlength=nr * nc).reshape(nr, nc)
+    left, right = row_dim.onehot(mask), col_dim.onehot(mask)
+    return left.T @ (right if weights is None else right * weights[:, None])
+
+
+def _means(counts, sums):
+    """
+    Per-cell means as nested lists, None where a cell is empty.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return np.where(np.isnan(means), None, means.round(6)).tolist()
+
+
+def _measure_result(counts, sums):
+    return {
+        "measure_counts": np.rint(counts).astype(np.int64).tolist(),
+        "sums": np.asarray(sums, dtype=np.float64).tolist(),
+        "means": _means(counts, sums),
+    }
+
+
+def _load(survey):
+    responses = db.session.execute(
+        select(Response.id, Response.platform).where(Response.survey_id == survey.id)
+    ).all()
+    answers = db.session.execute(
+        select(Answer.response_id, Answer.question_id, Answer.answer_text, Answer.answer_number)
+        .join(Response, Response.id == Answer.response_id)
+        .where(Response.survey_id == survey.id)
+        .execution_options(yield_per=10000)
+    )
+    multi_ids = [q.id for q in survey.questions if q.qtype in MULTI_SELECT_TYPES]
+    selections = db.session.execute(
+        select(AnswerSelection.response_id, AnswerSelection.question_id, AnswerSelection.option_id)
+        .where(AnswerSelection.question_id.in_(multi_ids))
+        .execution_options(yield_per=10000)
+    ) if multi_ids else ()
+    return SurveyCube.from_rows(survey, responses, answers, selections)
+
+
+def _stamp(survey):
+    # tallies change in the same transaction as every new response, so their
+    # total is a cheap version number that also sees other processes' writes
+    count = db.session.query(func.coalesce(func.sum(PlatformTally.count), 0)).filter(
+        PlatformTally.survey_id == survey.id
+    ).scalar()
+    return survey.updated_at, count
+
+
+def get_cube(survey):
+    """
+    Cached cube for a compiled survey, rebuilt when the survey changes or
+    new responses arrive.
+    """
+    stamp = _stamp(survey)
+    entry = cube_cache.get(survey.id)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    cube = _load(survey)
+    cube_cache.set(survey.id, (stamp, cube))
+    return cube
+
+
+def parse_key(value):
+    """
+    Dimension or measure key from a request argument: 'platform' or a question id.
+    """
+    if value == PLATFORM:
+        return PLATFORM
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CubeError(f"Unknown dimension '{value}'")
+
+
+def parse_filters(args):
+    """
+    ``filter=<key>:<value>`` arguments (repeatable) as {key: [values]}.
+    """
+    filters = {}
+    for item in args:
+        key, sep, value = item.partition(":")
+        if not sep:
+            raise CubeError(f"Filter '{item}' must look like <key>:<value>")
+        filters.setdefault(parse_key(key), []).append(value)
+    return filters
@@ -0,0 +1,233 @@
+import csv
+import io
+import json
+from itertools import groupby
+from sqlalchemy import select
+from .models import db, Answer, AnswerSelection, Response
+from app.blueprints.survey.tallies import MULTI_SELECT_TYPES, NUMERIC_TYPES
+from app.blueprints.survey.uploads import is_pending
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_BATCH_SIZE = 1000
+BASE_COLUMNS = ("response_id", "submitted_at", "platform")
+
+
+class ExportColumn:
+    """
+    One output column: a whole question, or one option of a multi-select
+    question (then the value says whether that option was chosen).
+    """
+
+    def __init__(self, name, question, option_id=None):
+        self.name = name
+        self.question = question
+        self.option_id = option_id
+
+    @property
+    def kind(self):
+        if self.option_id is not None:
+            return "bool"
+        if self.question.qtype in NUMERIC_TYPES:
+            return "float"
+        return "string"
+
+    def value(self, answer, selected):
+        """
+        :param answer: (answer_text, answer_number, file_path) or None
+        :param selected: set of option ids chosen in the response
+        """
+        if answer is None:
+            return None
+        text, number, file_path = answer
+        if self.option_id is not None:
+            if text is None:
+                return None
+            return self.option_id in selected
+        if self.question.qtype in NUMERIC_TYPES:
+            return number
+        if self.question.qtype == "File Upload":
+            # staged files have no public URL yet
+            return None if is_pending(file_path) else file_path
+        return text
+
+
+def export_columns(survey):
+    """
+    Column layout of the wide export for a compiled survey.
+    """
+    columns = []
+    seen = set(BASE_COLUMNS)
+
+    def add(name, question, option_id=None):
+        if name in seen:
+            name = f"{name} #{question.id}"
+        seen.add(name)
+        columns.append(ExportColumn(name, question, option_id))
+
+    for q in survey.questions:
+        if q.qtype in MULTI_SELECT_TYPES and q.options:
+            for option, option_id in zip(q.options, q.option_ids):
+                add(f"{q.text} [{option}]", q, option_id)
+        else:
+            add(q.text, q)
+    return columns
+
+
+def iter_responses(survey, columns):
+    """
+    Yield one row tuple per response (base columns, then ``columns``),
+    oldest first. Rows are streamed from a server-side cursor in batches,
+    so memory use does not grow with the number of responses.
+    """
+    stmt = (
+        select(
+            Response.id, Response.submitted_at, Response.platform,
+            Answer.question_id, Answer.answer_text, Answer.answer_number, Answer.file_path
+        )
+        .outerjoin(Answer, Answer.response_id == Response.id)
+        .where(Response.survey_id == survey.id)
+        .order_by(Response.submitted_at, Response.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    result = db.session.execute(stmt)
+    selections = _iter_selections(survey, columns)
+    pending = next(selections, None)
+    for (response_id, submitted_at, platform), rows in groupby(result, key=lambda r: r[:3]):
+        answers = {row.question_id: row[4:] for row in rows if row.question_id is not None}
+        selected = ()
+        # both streams follow the same response order
+        if pending is not None and pending[0] == response_id:
+            selected = pending[1]
+            pending = next(selections, None)
+        yield (response_id, submitted_at, platform) + tuple(
+            col.value(answers.get(col.question.id), selected) for col in columns
+        )
+
+
+def _iter_selections(survey, columns):
+    """
+    (response_id, set of chosen option ids) for responses with a selection
+    in an exported multi-select question, in export order, from a second
+    server-side cursor.
+    """
+    question_ids = sorted({col.question.id for col in columns if col.option_id is not None})
+    if not question_ids:
+        return
+    stmt = (
+        select(AnswerSelection.response_id, AnswerSelection.option_id)
+        .join(Response, Response.id == AnswerSelection.response_id)
+        .where(Response.survey_id == survey.id, AnswerSelection.question_id.in_(question_ids))
+        .order_by(Response.submitted_at, Response.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for response_id, rows in groupby(db.session.execute(stmt), key=lambda r: r[0]):
+        yield response_id, {row[1] for row in rows}
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(survey):
+    columns = export_columns(survey)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BASE_COLUMNS + tuple(col.name for col in columns))
+    yield buffer.getvalue()
+    for batch in _batches(iter_responses(survey, columns)):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow(
+                "" if value is None else int(value) if isinstance(value, bool) else value
+                for value in row
+            )
+        yield buffer.getvalue()
+
+
+def stream_jsonl(survey):
+    columns = export_columns(survey)
+    names = BASE_COLUMNS + tuple(col.name for col in columns)
+    for batch in _batches(iter_responses(survey, columns)):
+        lines = []
+        for row in batch:
+            record = dict(zip(names, row))
+            if record["submitted_at"] is not None:
+                record["submitted_at"] = record["submitted_at"].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object handed to the Parquet writer; whatever it has
+    written since the last call is collected with ``drain``.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(survey):
+    """
+    Parquet export, one row group per batch. Requires pyarrow, which is an
+    optional dependency: raises ImportError when it is not installed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = export_columns(survey)
+    types = {"bool": pa.bool_(), "float": pa.float64(), "string": pa.string()}
+    schema = pa.schema(
+        [("response_id", pa.int64()), ("submitted_at", pa.timestamp("us")), ("platform", pa.string())]
+        + [(col.name, types[col.kind]) for col in columns]
+    )
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in _batches(iter_responses(survey, columns)):
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "jsonl": stream_jsonl,
+    "parquet": stream_parquet,
+}
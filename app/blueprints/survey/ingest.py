@@ -0,0 +1,117 @@
+from datetime import datetime
+from sqlalchemy import insert
+from .models import db, Answer, AnswerSelection, Response
+from app.blueprints.survey.tallies import tally_answer, apply_tallies, apply_tally_batch
+from app.blueprints.survey.uploads import is_pending, discard_staged
+
+ANSWER_COLUMNS = ("answer_text", "answer_number", "file_path")
+
+
+def parse_submission(survey, form, files):
+    """
+    Validate a submitted form against a compiled survey.
+    :return: (answers, increments) where answers are plain row dicts keyed by
+             question_id plus the Answer value columns and the chosen
+             "option_ids", and increments are the tally increments for the
+             submission
+    """
+    answers = []
+    increments = []
+    try:
+        for question in survey.questions:
+            answer_data, selected_values = question.parse(form, files)
+            row = {"question_id": question.id}
+            for column in ANSWER_COLUMNS:
+                row[column] = answer_data.get(column)
+            row["option_ids"] = answer_data.get("option_ids", [])
+            answers.append(row)
+            increments.extend(tally_answer(question, answer_data, selected_values))
+    except Exception:
+        # a later question rejected the submission: files staged for the
+        # earlier ones belong to no answer
+        discard_staged(ref for _question_id, ref in pending_uploads(answers))
+        raise
+    return answers, increments
+
+
+def _insert_answers(rows):
+    """
+    Insert answer rows (dicts with response_id) and the option selections
+    they carry, each with a single executemany INSERT.
+    """
+    answers, selections = [], []
+    for row in rows:
+        for option_id in row.pop("option_ids", None) or ():
+            selections.append({
+                "response_id": row["response_id"], "question_id": row["question_id"], "option_id": option_id
+            })
+        answers.append(row)
+    if answers:
+        db.session.execute(Answer.__table__.insert(), answers)
+    if selections:
+        db.session.execute(AnswerSelection.__table__.insert(), selections)
+
+
+def save_submission(survey_id, user_id, platform, answers, increments, submitted_at=None):
+    """
+    Write one response, its answers and its tallies in the current
+    transaction: one flush for the response id, then a single executemany
+    INSERT for all answers and one for their option selections (no
+    RETURNING, no per-answer ORM objects).
+    :return: the new response id
+    """
+    new_response = Response(survey_id=survey_id, user_id=user_id, platform=platform)
+    if submitted_at is not None:
+        new_response.submitted_at = submitted_at
+    db.session.add(new_response)
+    db.session.flush()
+
+    _insert_answers(dict(row, response_id=new_response.id) for row in answers)
+    apply_tallies(survey_id, platform, increments)
+    return new_response.id
+
+
+def save_submissions(records):
+    """
+    Write a batch of spooled submissions in the current transaction: one
+    executemany INSERT for the responses (ids returned in order), one each
+    for all their answers and option selections, and one tally upsert per
+    survey.
+    :param records: dicts with survey_id, user_id, platform, submitted_at
+                    (ISO string), answers and increments
+    :return: list of new response ids, in record order
+    """
+    if not records:
+        return []
+    response_ids = db.session.execute(
+        insert(Response).returning(Response.id, sort_by_parameter_order=True),
+        [{
+            "survey_id": rec["survey_id"],
+            "user_id": rec["user_id"],
+            "platform": rec["platform"],
+            "submitted_at": datetime.fromisoformat(rec["submitted_at"])
+        } for rec in records]
+    ).scalars().all()
+
+    _insert_answers(
+        dict(row, response_id=response_id)
+        for response_id, rec in zip(response_ids, records)
+        for row in rec["answers"]
+    )
+
+    by_survey = {}
+    for rec in records:
+        platforms, increments = by_survey.setdefault(rec["survey_id"], ({}, []))
+        platforms[rec["platform"]] = platforms.get(rec["platform"], 0) + 1
+        increments.extend(tuple(inc) for inc in rec["increments"])
+    for survey_id in sorted(by_survey):
+        platforms, increments = by_survey[survey_id]
+        apply_tally_batch(survey_id, platforms, increments)
+    return response_ids
+
+
+def pending_uploads(answers):
+    """
+    (question_id, pending reference) pairs for staged file answers.
+    """
+    return [(row["question_id"], row["file_path"]) for row in answers if is_pending(row["file_path"])]
@@ -0,0 +1,305 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from sqlalchemy import func
+from .models import db, Response
+from app.blueprints.survey.tallies import load_tallies, UNKNOWN_PLATFORM
+
+LAGGED = object()
+# response ids below a snapshot's highest id that may still commit after it:
+# ids are taken when a response is inserted, so concurrent submissions can
+# commit out of order. The ids in this window that the snapshot counted are
+# read with it; a delta for any other id in the window is still applied.
+ID_WINDOW = 10000
+
+
+class Subscription:
+    """
+    One listener's queue of messages for a survey. When the listener falls
+    too far behind, further messages are dropped and the next ``get``
+    returns LAGGED so it can resynchronize from a snapshot.
+    """
+
+    def __init__(self, broker, survey_id, maxsize):
+        self.broker = broker
+        self.survey_id = survey_id
+        self.queue = queue.Queue(maxsize)
+        self.lagged = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.lagged = True
+
+    def get(self, timeout):
+        """
+        Next message, LAGGED after an overflow, or None on timeout.
+        """
+        if self.lagged:
+            self.lagged = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return LAGGED
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Pub/sub between request threads of a single process.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, survey_id):
+        subscription = Subscription(self, survey_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(survey_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscribers.get(subscription.survey_id)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscribers[subscription.survey_id]
+
+    def publish(self, survey_id, message):
+        self._dispatch(survey_id, message)
+
+    def _dispatch(self, survey_id, message):
+        with self._lock:
+            listeners = list(self._subscribers.get(survey_id, ()))
+        for subscription in listeners:
+            subscription.put(message)
+
+
+class FileBroker(InProcessBroker):
+    """
+    Local stand-in for a shared broker when several worker processes serve
+    one host: messages are appended as JSON lines to per-minute segment
+    files in a shared directory, and each process tails them and dispatches
+    to its own subscribers. Old segments are removed after ``retention``
+    seconds.
+    """
+
+    def __init__(self, directory, queue_size=256, poll_interval=0.2, retention=300):
+        super().__init__(queue_size)
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._pid = None
+        self._last_cleanup = 0.0
+
+    def _segment(self, minute):
+        return os.path.join(self.directory, f"events-{minute:012d}.log")
+
+    def publish(self, survey_id, message):
+        os.makedirs(self.directory, exist_ok=True)
+        line = (json.dumps({"survey_id": survey_id, "message": message}, separators=(",", ":")) + "\n").encode("utf-8")
+        # a single O_APPEND write, so lines from different processes never interleave
+        fd = os.open(self._segment(int(time.time() // 60)), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._cleanup()
+
+    def subscribe(self, survey_id):
+        self._ensure_tailing()
+        return super().subscribe(survey_id)
+
+    def _ensure_tailing(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._tail, name="live-broker", daemon=True).start()
+
+    def _tail(self):
+        minute = int(time.time() // 60)
+        path = self._segment(minute)
+        position = os.path.getsize(path) if os.path.exists(path) else 0
+        pending = b""
+        while True:
+            try:
+                if os.path.exists(path):
+                    with open(path, "rb") as fh:
+                        fh.seek(position)
+                        data = fh.read()
+                    position += len(data)
+                    pending += data
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        if line:
+                            event = json.loads(line)
+                            self._dispatch(event["survey_id"], event["message"])
+                # move on once the writers have switched to a newer segment
+                newer = [p for p in glob.glob(os.path.join(self.directory, "events-*.log")) if p > path]
+                if newer and not pending:
+                    path, position = min(newer), 0
+                    continue
+            except (OSError, ValueError) as e:
+                print(f"Live broker read failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        oldest = self._segment(int((now - self.retention) // 60))
+        for path in glob.glob(os.path.join(self.directory, "events-*.log")):
+            if path < oldest:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def snapshot(survey_id):
+    """
+    Current totals of a survey as sent when a listener (re)connects.
+    """
+    questions, platforms = load_tallies(survey_id)
+    return {
+        "total_responses": sum(platforms.values()),
+        "platforms": platforms,
+        "questions": {
+            qid: {
+                "answered": options.get("", (0, 0, 0))[0],
+                "options": {opt: counts[0] for opt, counts in options.items() if opt != ""}
+            }
+            for qid, options in questions.items()
+        }
+    }
+
+
+def consistent_snapshot(survey_id):
+    """
+    The snapshot of a survey, the highest response id it counts and the
+    ids it counts within ID_WINDOW below that, read in one transaction that
+    sees a single database snapshot.
+    :return: (snapshot, highest response id, frozenset of counted ids)
+    """
+    # PostgreSQL's default READ COMMITTED takes a new snapshot per statement
+    options = {"isolation_level": "REPEATABLE READ"} if db.engine.dialect.name == "postgresql" else {}
+    db.session.close()
+    db.session.connection(execution_options=options)
+    try:
+        state = snapshot(survey_id)
+        seen_up_to = _max_response_id(survey_id)
+        counted = frozenset(rid for rid, in db.session.query(Response.id).filter(
+            Response.survey_id == survey_id, Response.id > seen_up_to - ID_WINDOW
+        ))
+        return state, seen_up_to, counted
+    finally:
+        db.session.close()
+
+
+def is_counted(response_id, seen_up_to, counted):
+    """
+    Whether a snapshot already includes a response, so its delta is skipped.
+    """
+    if response_id > seen_up_to:
+        return False
+    return response_id <= seen_up_to - ID_WINDOW or response_id in counted
+
+
+def submission_delta(response_id, platform, increments):
+    """
+    Incremental update for one new response, from its tally increments.
+    """
+    questions = {}
+    for qid, option, count, _total, _total_sq in increments:
+        entry = questions.setdefault(qid, {"answered": 0, "options": {}})
+        if option == "":
+            entry["answered"] += count
+        else:
+            entry["options"][option] = entry["options"].get(option, 0) + count
+    return {"response_id": response_id, "platform": platform or UNKNOWN_PLATFORM, "questions": questions}
+
+
+def _event(name, data, event_id=None):
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+class LiveUpdates:
+    """
+    Pushes result updates to owners over Server-Sent Events. Submissions
+    publish a delta per response; each listener first gets a snapshot of
+    the tallies, then deltas, plus a fresh snapshot after falling behind
+    and every LIVE_RESYNC_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.broker = InProcessBroker()
+        self.keepalive = 15
+        self.resync_interval = 60
+
+    def init_app(self, app):
+        queue_size = app.config["LIVE_QUEUE_SIZE"]
+        if app.config["LIVE_BROKER"] == "file":
+            self.broker = FileBroker(app.config["LIVE_BROKER_DIR"], queue_size, app.config["LIVE_POLL_INTERVAL"])
+        else:
+            self.broker = InProcessBroker(queue_size)
+        self.keepalive = app.config["LIVE_KEEPALIVE"]
+        self.resync_interval = app.config["LIVE_RESYNC_INTERVAL"]
+        app.extensions["live_updates"] = self
+
+    def publish_submission(self, survey_id, response_id, platform, increments):
+        try:
+            self.broker.publish(survey_id, submission_delta(response_id, platform, increments))
+        except Exception as e:
+            # live updates are best effort; never fail a submission over them
+            print(f"Live update publish failed: {e}")
+
+    def stream(self, survey_id):
+        """
+        SSE body generator; must run with a request/app context.
+        """
+        subscription = self.broker.subscribe(survey_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                # subscribe first, then snapshot: deltas already counted in
+                # the snapshot are skipped by response id
+                state, seen_up_to, counted = consistent_snapshot(survey_id)
+                db.session.remove()
+                yield _event("snapshot", state, seen_up_to)
+                resync_at = time.monotonic() + self.resync_interval
+                while time.monotonic() < resync_at:
+                    message = subscription.get(timeout=self.keepalive)
+                    if message is LAGGED:
+                        break
+                    if message is None:
+                        yield ": keepalive\n\n"
+                    elif not is_counted(message["response_id"], seen_up_to, counted):
+                        yield _event("response", message, message["response_id"])
+        finally:
+            subscription.close()
+
+
+def _max_response_id(survey_id):
+    return db.session.query(func.coalesce(func.max(Response.id), 0)).filter(Response.survey_id == survey_id).scalar()
+
+
+live_updates = LiveUpdates()
@@ -35,6 +35,11 @@ class Survey(db.Model):
    
     questions = db.relationship('Question', backref='survey', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # dashboard: a user's surveys in id order
+        db.Index("ix_surveys_user_id", "user_id", "id"),
+    )
+
 class Question(db.Model):
     __tablename__ = 'questions'
     id = db.Column(db.Integer, primary_key=True)
@@ -42,9 +47,36 @@ class Question(db.Model):
     text = db.Column(db.Text, nullable=False)
     qtype = db.Column(db.String(50), nullable=False)
     required = db.Column(db.Boolean, default=False)
-    allowed_types = db.Column(db.String(255), nullable=True)
     max_size_mb = db.Column(db.Integer, nullable=True)
-    
+
+    # choice options, or allowed file extensions for File Upload questions
+    options = db.relationship(
+        'QuestionOption',
+        order_by='QuestionOption.position',
+        cascade='all, delete-orphan'
+    )
+
+    __table_args__ = (
+        db.Index("ix_questions_survey_id", "survey_id"),
+    )
+
+
+class QuestionOption(db.Model):
+    """
+    One option of a question, with a stable id that choice answers refer
+    to. For File Upload questions the options are the allowed extensions.
+    """
+    __tablename__ = "question_options"
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("question_id", "position", name="uq_question_options_question_position"),
+    )
+
+
 class Response(db.Model):
     __tablename__ = "responses"
     id = db.Column(db.Integer, primary_key=True)
@@ -55,6 +87,13 @@ class Response(db.Model):
 
     survey = db.relationship("Survey", backref=db.backref("responses", lazy=True))
     answers = db.relationship("Answer", backref="response", cascade="all, delete-orphan")
+    selections = db.relationship("AnswerSelection", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # results pages: keyset pagination newest first within a survey
+        db.Index("ix_responses_survey_id_submitted_at", "survey_id", "submitted_at", "id"),
+        db.Index("ix_responses_survey_id_platform", "survey_id", "platform"),
+    )
 
 class Answer(db.Model):
     __tablename__ = "answers"
@@ -65,4 +104,87 @@ class Answer(db.Model):
     answer_number = db.Column(db.Float, nullable=True)
     file_path = db.Column(db.String(255), nullable=True)
 
-    question = db.relationship("Question")
\ No newline at end of file
+    question = db.relationship("Question")
+
+    __table_args__ = (
+        db.Index("ix_answers_response_id", "response_id"),
+    )
+
+# tally rebuilds group date answers by (question_id, answer_text prefix).
+# Free-text answers can exceed PostgreSQL's btree entry size, so only a prefix
+# of the text is indexed; tally options are capped at 255 characters anyway.
+# Queries must use this exact expression (literal, not bound, arguments) for
+# the planner to match it to the index.
+answer_text_prefix = db.func.substr(Answer.answer_text, db.literal_column("1"), db.literal_column("255"))
+db.Index("ix_answers_question_id_answer_text", Answer.question_id, answer_text_prefix)
+
+class AnswerSelection(db.Model):
+    """
+    An option chosen in a response's answer to a choice question (one row
+    per checked box), so option counts are integer group-bys.
+    """
+    __tablename__ = "answer_selections"
+    response_id = db.Column(db.Integer, db.ForeignKey("responses.id"), primary_key=True)
+    option_id = db.Column(db.Integer, db.ForeignKey("question_options.id"), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_answer_selections_question_id_option_id", "question_id", "option_id"),
+    )
+
+class QuestionTally(db.Model):
+    """
+    Running per-question counters maintained on every submission.
+    The row with an empty option holds the question totals (answered count,
+    sum and sum of squares for numeric answers); other rows count a single
+    option, numeric value or date.
+    """
+    __tablename__ = "question_tallies"
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey("surveys.id"), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), nullable=False)
+    option = db.Column(db.String(255), nullable=False, default="")
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    total_sq = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("question_id", "option", name="uq_question_tallies_question_option"),
+    )
+
+class PlatformTally(db.Model):
+    __tablename__ = "platform_tallies"
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey("surveys.id"), nullable=False)
+    platform = db.Column(db.String(255), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("survey_id", "platform", name="uq_platform_tallies_survey_platform"),
+    )
+
+
+class StoredFile(db.Model):
+    """
+    One stored upload, keyed by content hash. Identical uploads share the
+    record and bump its reference count instead of being stored again.
+    """
+    __tablename__ = "stored_files"
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    extension = db.Column(db.String(16), nullable=True)
+    url = db.Column(db.String(255), nullable=False, index=True)
+    backend = db.Column(db.String(20), nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SpoolAck(db.Model):
+    """
+    A submission spool segment that has been written to the database, so a
+    replay after a crash skips it instead of inserting it twice.
+    """
+    __tablename__ = "spool_acks"
+    segment = db.Column(db.String(255), primary_key=True)
+    records = db.Column(db.Integer, nullable=False)
+    acked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+from app.blueprints.survey.tallies import UNKNOWN_PLATFORM
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "platforms.json")
+
+
+class PlatformClassifier:
+    """
+    Table-driven platform detection. Rules are an ordered list of
+    {"platform", "ua": [...], "referrer": [...]} entries; the first rule
+    with a token found in the lower-cased User-Agent, or a domain matching
+    the referrer host (itself or a subdomain), wins. All UA tokens are
+    compiled into one alternation with a named group per rule, and the
+    referrer domains into a dict of the first rule naming each. Results are
+    memoized in a bounded LRU keyed by (User-Agent, referrer host).
+    """
+
+    def __init__(self, rules, cache_size=4096):
+        self.rules = rules
+        self._platforms = tuple(rule["platform"] for rule in rules)
+        tokens = [(i, token.lower()) for i, rule in enumerate(rules) for token in rule.get("ua", ()) if token]
+        groups = [
+            f"(?P<r{i}>{'|'.join(re.escape(token) for j, token in tokens if j == i)})"
+            for i in dict.fromkeys(i for i, _ in tokens)
+        ]
+        # a zero-width lookahead tries every position, so a token overlapping
+        # an earlier match is still seen; at one position the lowest rule
+        # wins. The leading character class skips positions no token starts at.
+        first = "".join(sorted({token[0] for _, token in tokens}))
+        self._ua_pattern = re.compile(f"(?=[{re.escape(first)}])(?=(?:{'|'.join(groups)}))") if groups else None
+        self._domains = {}
+        for i, rule in enumerate(rules):
+            for domain in rule.get("referrer", ()):
+                self._domains.setdefault(domain.lower(), i)
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_file(cls, path, cache_size=4096):
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh), cache_size)
+
+    def _classify(self, ua, ref_host):
+        best = len(self._platforms)
+        if self._ua_pattern is not None:
+            for match in self._ua_pattern.finditer(ua.lower()):
+                best = min(best, int(match.lastgroup[1:]))
+                if best == 0:
+                    break
+        # the host itself, then each parent domain
+        while ref_host:
+            best = min(best, self._domains.get(ref_host, best))
+            ref_host = ref_host.partition(".")[2]
+        return self._platforms[best] if best < len(self._platforms) else UNKNOWN_PLATFORM
+
+    def detect(self, ua, referrer=None):
+        """
+        :param ua: User-Agent header value
+        :param referrer: full referrer URL (only its host is used)
+        :return: platform name, or "Unknown"
+        """
+        return self.classify(ua or "", referrer_host(referrer))
+
+    def cache_info(self):
+        return self.classify.cache_info()
+
+
+def referrer_host(referrer):
+    if not referrer:
+        return ""
+    try:
+        return (urlsplit(referrer).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+_classifier = None
+
+
+def configure(rules_path=None, cache_size=4096):
+    global _classifier
+    _classifier = PlatformClassifier.from_file(rules_path or DEFAULT_RULES_PATH, cache_size)
+    return _classifier
+
+
+def detect_platform(ua, referrer=None):
+    """
+    Platform of a request from its User-Agent and referrer.
+    """
+    if _classifier is None:
+        configure()
+    return _classifier.detect(ua, referrer)
@@ -0,0 +1,225 @@
+import json
+import re
+from .models import db, Survey, Question, QuestionOption
+from app.blueprints.survey.tallies import CHOICE_TYPES, OPTION_MAX_LEN
+from app.blueprints.survey.schema import VALIDATORS
+
+FILE_TYPE_PATTERN = re.compile(r'^\.[a-zA-Z0-9]+$')
+TITLE_MAX_LEN = 255
+DESCRIPTION_MAX_LEN = 2000
+YAML_MIMETYPES = ("application/yaml", "application/x-yaml", "text/yaml", "text/x-yaml")
+
+
+class ProvisionError(ValueError):
+    """
+    Raised when surveys in a batch fail validation; ``errors`` lists
+    {"index", "error"} for every rejected survey, so one request reports
+    all of them. Nothing of the batch is written.
+    """
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} survey(s) failed validation")
+        self.errors = errors
+
+
+def validate_survey(data):
+    """
+    Validate one survey in the create-page payload shape
+    ({"info": {...}, "questions": [...]}).
+    :return: normalized spec dict (title, description, publish, questions)
+    :raises ValueError: with the message save_survey answers 400 with
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Survey must be an object with "info" and "questions"')
+    info = data.get('info') or {}
+    questions = data.get('questions', [])
+
+    title = str(info.get('title') or '').strip()
+    if not title or len(title) > TITLE_MAX_LEN:
+        raise ValueError('Title is required (≤255 chars)')
+
+    description = str(info.get('description') or '').strip()
+    if len(description) > DESCRIPTION_MAX_LEN:
+        raise ValueError('Description must be ≤2000 chars')
+
+    publish = bool(info.get('publish', False))
+
+    if not isinstance(questions, list) or len(questions) == 0:
+        raise ValueError('At least one question required')
+
+    specs = []
+    for idx, q in enumerate(questions, start=1):
+        if not isinstance(q, dict):
+            raise ValueError(f'Question {idx}: must be an object')
+        text = str(q.get('text') or '').strip()
+        if not text:
+            raise ValueError(f'Question {idx}: text required')
+
+        qtype = q.get('type')
+        if qtype not in VALIDATORS:
+            raise ValueError(f'Question {idx}: type must be one of {", ".join(VALIDATORS)}')
+        required = bool(q.get('required', False))
+
+        allowed = []
+        max_mb = None
+
+        if qtype == 'File Upload':
+            allowed = [str(ft).strip() for ft in q.get('allowed_types') or [] if str(ft).strip()]
+            if not all(FILE_TYPE_PATTERN.match(ft) for ft in allowed):
+                raise ValueError(f'Question {idx}: invalid file types')
+
+            max_mb = q.get('max_size_mb')
+            if not isinstance(max_mb, int) or max_mb < 1 or max_mb > 100:
+                raise ValueError(f'Question {idx}: max_size_mb must be 1–100')
+
+        elif qtype in CHOICE_TYPES:
+            allowed = [str(opt).strip() for opt in q.get('allowed_types') or [] if str(opt).strip()]
+            if len(allowed) == 0:
+                raise ValueError(f'Question {idx}: multiple-choice questions require at least one option')
+            # tallies key options by their text, capped at this length
+            if any(len(opt) > OPTION_MAX_LEN for opt in allowed):
+                raise ValueError(f'Question {idx}: options must be ≤{OPTION_MAX_LEN} chars')
+
+        specs.append({
+            "text": text,
+            "qtype": qtype,
+            "required": required,
+            "max_size_mb": max_mb,
+            "options": list(dict.fromkeys(allowed))
+        })
+
+    return {"title": title, "description": description, "publish": publish, "questions": specs}
+
+
+def validate_surveys(items):
+    """
+    Validate a batch of surveys, collecting every failure.
+    :return: list of specs, in order
+    :raises ProvisionError: when any survey is invalid
+    """
+    specs, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            specs.append(validate_survey(item))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        raise ProvisionError(errors)
+    return specs
+
+
+def create_surveys(specs, user_id):
+    """
+    Insert validated surveys with their questions and options in the
+    current transaction: one executemany INSERT per table, survey and
+    question ids returned in order.
+    :param specs: dicts from validate_survey
+    :return: list of new survey ids, in spec order
+    """
+    if not specs:
+        return []
+    survey_ids = db.session.execute(
+        Survey.__table__.insert().returning(Survey.__table__.c.id, sort_by_parameter_order=True),
+        [{
+            "title": spec["title"],
+            "description": spec["description"],
+            "publish": spec["publish"],
+            "user_id": user_id
+        } for spec in specs]
+    ).scalars().all()
+
+    questions = [
+        (survey_id, q) for survey_id, spec in zip(survey_ids, specs) for q in spec["questions"]
+    ]
+    question_ids = db.session.execute(
+        Question.__table__.insert().returning(Question.__table__.c.id, sort_by_parameter_order=True),
+        [{
+            "survey_id": survey_id,
+            "text": q["text"],
+            "qtype": q["qtype"],
+            "required": q["required"],
+            "max_size_mb": q["max_size_mb"]
+        } for survey_id, q in questions]
+    ).scalars().all()
+
+    options = [
+        {"question_id": question_id, "position": position, "value": value}
+        for question_id, (_, q) in zip(question_ids, questions)
+        for position, value in enumerate(q["options"])
+    ]
+    if options:
+        db.session.execute(QuestionOption.__table__.insert(), options)
+    return survey_ids
+
+
+def import_surveys(items, user_id):
+    """
+    Validate and insert a batch of surveys for one owner; all or nothing.
+    :return: list of new survey ids
+    """
+    return create_surveys(validate_surveys(items), user_id)
+
+
+def survey_payload(survey):
+    """
+    A stored (compiled) survey in the create-page payload shape, which
+    import_surveys accepts back.
+    """
+    return {
+        "info": {"title": survey.title, "description": survey.description or "", "publish": survey.publish},
+        "questions": [{
+            "text": q.text,
+            "type": q.qtype,
+            "required": q.required,
+            "allowed_types": list(q.options),
+            "max_size_mb": q.max_size_mb
+        } for q in survey.questions]
+    }
+
+
+def clone_survey(survey, user_id, titles, publish=None):
+    """
+    Copy a survey and its questions once per title, validated like an
+    import. Responses are not copied.
+    :param survey: compiled survey to copy
+    :param titles: title of each copy
+    :param publish: publish flag of the copies (default: the source's)
+    :return: list of new survey ids
+    """
+    payload = survey_payload(survey)
+    if publish is not None:
+        payload["info"]["publish"] = publish
+    items = [dict(payload, info=dict(payload["info"], title=title)) for title in titles]
+    return import_surveys(items, user_id)
+
+
+def clone_titles(title, count):
+    """
+    Default titles for ``count`` copies of a survey: "Title (1)", "Title (2)", ...
+    """
+    return [f"{title} ({n})" for n in range(1, count + 1)]
+
+
+def load_surveys(text, fmt="json"):
+    """
+    Parse an import document: a list of surveys, or {"surveys": [...]}.
+    YAML needs PyYAML, which is an optional dependency: raises ImportError
+    when it is not installed.
+    :raises ValueError: on a malformed document
+    """
+    if fmt == "yaml":
+        import yaml
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML: {e}")
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(data, dict) and "surveys" in data:
+        data = data["surveys"]
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of surveys or {"surveys": [...]}')
+    return data
@@ -0,0 +1,147 @@
+from datetime import datetime
+from sqlalchemy import and_, or_, func
+from .models import db, Answer, AnswerSelection, Response
+from app.blueprints.survey.schema import get_compiled_survey
+
+RESULTS_PAGE_SIZE = 25
+UNKNOWN_PLATFORM = "Unknown"
+
+
+def encode_cursor(submitted_at, response_id):
+    """
+    Build the keyset cursor pointing just after the given response.
+    """
+    return f"{submitted_at.isoformat()}~{response_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor.
+    :return: (submitted_at, response_id) tuple or None if the cursor is invalid
+    """
+    if not cursor:
+        return None
+    try:
+        ts, rid = cursor.rsplit("~", 1)
+        return datetime.fromisoformat(ts), int(rid)
+    except ValueError:
+        return None
+
+
+def _platform_label():
+    return func.coalesce(Response.platform, UNKNOWN_PLATFORM)
+
+
+def _platform_filter(platform):
+    if platform == UNKNOWN_PLATFORM:
+        return or_(Response.platform.is_(None), Response.platform == UNKNOWN_PLATFORM)
+    return Response.platform == platform
+
+
+def platform_counts(survey_id):
+    """
+    Number of responses per platform, largest group first.
+    """
+    label = _platform_label()
+    total = func.count(Response.id)
+    rows = (
+        db.session.query(label, total)
+        .filter(Response.survey_id == survey_id)
+        .group_by(label)
+        .order_by(total.desc(), label)
+        .all()
+    )
+    return [(platform, count) for platform, count in rows]
+
+
+def fetch_response_page(survey_id, platform, cursor=None, limit=RESULTS_PAGE_SIZE):
+    """
+    Fetch one keyset-paginated page of responses for a platform group,
+    newest first.
+    :return: (rows, next_cursor) where rows are (id, submitted_at) tuples
+    """
+    query = db.session.query(Response.id, Response.submitted_at).filter(
+        Response.survey_id == survey_id,
+        _platform_filter(platform)
+    )
+    position = decode_cursor(cursor)
+    if position:
+        ts, rid = position
+        query = query.filter(or_(
+            Response.submitted_at < ts,
+            and_(Response.submitted_at == ts, Response.id < rid)
+        ))
+    rows = query.order_by(Response.submitted_at.desc(), Response.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_ts = rows[-1]
+        if last_ts is not None:
+            next_cursor = encode_cursor(last_ts, last_id)
+    return rows, next_cursor
+
+
+def load_results(survey_id, platform=None, cursor=None, limit=RESULTS_PAGE_SIZE):
+    """
+    Load a page of results for every platform group (or a single group when
+    ``platform`` is given) using a fixed number of set-based queries.
+    :return: dict platform -> {"total", "responses", "next_cursor"}
+    """
+    survey = get_compiled_survey(survey_id)
+    questions = {q.id: q for q in survey.questions} if survey else {}
+    option_labels = {
+        option_id: label for q in questions.values() for option_id, label in zip(q.option_ids, q.options)
+    }
+
+    grouped = {}
+    page_rows = []
+    for name, total in platform_counts(survey_id):
+        if platform and name != platform:
+            continue
+        rows, next_cursor = fetch_response_page(
+            survey_id, name, cursor if platform else None, limit
+        )
+        grouped[name] = {"total": total, "responses": [], "next_cursor": next_cursor}
+        page_rows.extend((name, rid, submitted_at) for rid, submitted_at in rows)
+
+    answers_by_response = {}
+    selected = {}
+    if page_rows:
+        page_ids = [rid for _, rid, _ in page_rows]
+        selection_rows = (
+            db.session.query(AnswerSelection.response_id, AnswerSelection.question_id, AnswerSelection.option_id)
+            .filter(AnswerSelection.response_id.in_(page_ids))
+            .all()
+        )
+        for response_id, question_id, option_id in selection_rows:
+            selected.setdefault((response_id, question_id), set()).add(option_labels.get(option_id))
+        answer_rows = (
+            db.session.query(
+                Answer.response_id,
+                Answer.question_id,
+                Answer.answer_text,
+                Answer.answer_number,
+                Answer.file_path
+            )
+            .filter(Answer.response_id.in_(page_ids))
+            .order_by(Answer.response_id, Answer.id)
+            .all()
+        )
+        for response_id, question_id, text, number, file_path in answer_rows:
+            question = questions[question_id]
+            answers_by_response.setdefault(response_id, []).append({
+                "question": question,
+                "answer_text": text,
+                "answer_number": number,
+                "file_path": file_path,
+                "options": question.options,
+                "selected": selected.get((response_id, question_id), ())
+            })
+
+    for name, rid, submitted_at in page_rows:
+        grouped[name]["responses"].append({
+            "submitted_at": submitted_at,
+            "answers": answers_by_response.get(rid, [])
+        })
+    return grouped
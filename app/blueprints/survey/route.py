@@ -1,56 +1,126 @@
 # routes.py
-import json
-from flask import Blueprint, render_template, request, url_for, abort, jsonify, flash, redirect
+import os
+import click
+from sqlalchemy import func
+from flask import Blueprint, render_template, request, url_for, abort, jsonify, flash, redirect, current_app, send_file, stream_with_context
+from flask_wtf.csrf import generate_csrf
 from flask_login import login_required, current_user
+from datetime import datetime
 from .models import db, Survey, Question, Answer, Response
-from app.blueprints.survey.utils import upload_to_cloudinary
-import re
+from app.blueprints.people.models import User
+from app.blueprints.survey.schema import get_compiled_survey, invalidate_survey
+from app.blueprints.survey.uploads import upload_worker, PENDING_PREFIX
+from app.blueprints.survey.storage import resolve_blob, collect_garbage
+from app.blueprints.survey.conditional import (
+    CSRF_PLACEHOLDER, html_cache, survey_version, make_etag, session_token_key,
+    is_not_modified, conditional_response, not_modified
+)
+from app.blueprints.survey.results import load_results
+from app.blueprints.survey.summary import build_summary
+from app.blueprints.survey.tallies import rebuild_tallies
+from app.blueprints.survey.ingest import parse_submission, save_submission, pending_uploads
+from app.blueprints.survey.spool import submission_spool
+from app.blueprints.survey.export import EXPORT_FORMATS, STREAMERS
+from app.blueprints.survey.live import live_updates
+from app.blueprints.survey.platforms import detect_platform
+from app.blueprints.survey.cube import get_cube, parse_key, parse_filters, CubeError
+from app.blueprints.survey.provision import (
+    YAML_MIMETYPES, ProvisionError, validate_survey, create_surveys, import_surveys,
+    clone_survey, clone_titles, load_surveys
+)
 
 survey = Blueprint('survey', __name__, template_folder='templates', url_prefix='/survey')
 
 
-def parse_platform_from_ua(ua: str, ref: str = "") -> str:
-    ua = (ua or "").lower()
-    ref = (ref or "").lower()
-    if "fbav" in ua or "fban" in ua or "facebook" in ua or "m.facebook" in ref:
-        return "Facebook"
-    if "whatsapp" in ua or "whatsapp" in ref:
-        return "WhatsApp"
-    if "instagram" in ua or "instagram" in ref:
-        return "Instagram"
-    if "linkedin" in ua or "linkedin" in ref:
-        return "LinkedIn"
-    if "twitter" in ua or "x-ios" in ua or "tweet" in ref:
-        return "Twitter"
-    if "crios" in ua:
-        return "Chrome (iOS)"
-    if "edg" in ua or "edge" in ua:
-        return "Edge"
-    if "firefox" in ua:
-        return "Firefox"
-    if "chrome" in ua:
-        return "Chrome"
-    if "safari" in ua:
-        return "Safari"
-    if "iphone" in ua or "ipad" in ua:
-        return "iOS Browser"
-    if "android" in ua:
-        return "Android Browser"
-    return "Unknown"
+@survey.cli.command("rebuild-tallies")
+@click.option("--survey-id", type=int, default=None, help="Only rebuild this survey.")
+def rebuild_tallies_command(survey_id):
+    """Recompute question and platform tallies from stored answers."""
+    count = rebuild_tallies(survey_id)
+    click.echo(f"Rebuilt tallies for {count} survey(s).")
 
 
+@survey.cli.command("retry-uploads")
+def retry_uploads_command():
+    """Upload files still pending after a crash or exhausted retries."""
+    pending = (
+        db.session.query(Answer.response_id, Answer.question_id, Answer.file_path)
+        .filter(Answer.file_path.like(PENDING_PREFIX + "%"))
+        .all()
+    )
+    done = sum(1 for args in pending if upload_worker.process(*args))
+    click.echo(f"Uploaded {done} of {len(pending)} pending file(s).")
+
+
+@survey.cli.command("gc-files")
+def gc_files_command():
+    """Recount stored file references and delete unreferenced local blobs."""
+    removed = collect_garbage()
+    click.echo(f"Removed {removed} unreferenced file(s).")
+
+
+@survey.cli.command("drain-spool")
+def drain_spool_command():
+    """Write spooled submissions to the database (including crashed segments)."""
+    os.makedirs(submission_spool.directory, exist_ok=True)
+    submission_spool.recover()
+    written = submission_spool.drain()
+    click.echo(f"Wrote {written} spooled submission(s).")
+
+
+@survey.cli.command("replay-spool-failures")
+def replay_spool_failures_command():
+    """Write spooled submissions the database rejected earlier, e.g. after fixing the cause."""
+    os.makedirs(submission_spool.directory, exist_ok=True)
+    queued = submission_spool.replay_failed()
+    written = submission_spool.drain()
+    click.echo(f"Replayed {queued} failed submission(s); wrote {written} spooled submission(s).")
 
 
 @survey.route('/dashboard')
 @login_required
 def dashboard():
-    surveys = Survey.query.filter_by(user_id=current_user.uid).all()
-    total_responses = db.session.query(Response).join(Survey).filter(
-        Survey.user_id == current_user.uid
-    ).count()
-    responses = Survey.query.filter_by(user_id=current_user.uid, publish=True).all()
-    for s in surveys:
-        s.questions_length = len(s.questions)
+    uid = current_user.uid
+    question_counts = (
+        db.session.query(Question.survey_id, func.count(Question.id).label("question_count"))
+        .join(Survey, Survey.id == Question.survey_id)
+        .filter(Survey.user_id == uid)
+        .group_by(Question.survey_id)
+        .subquery()
+    )
+    response_stats = (
+        db.session.query(
+            Response.survey_id,
+            func.count(Response.id).label("response_count"),
+            func.max(Response.submitted_at).label("last_response_at")
+        )
+        .join(Survey, Survey.id == Response.survey_id)
+        .filter(Survey.user_id == uid)
+        .group_by(Response.survey_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(
+            Survey,
+            func.coalesce(question_counts.c.question_count, 0),
+            func.coalesce(response_stats.c.response_count, 0),
+            response_stats.c.last_response_at
+        )
+        .outerjoin(question_counts, question_counts.c.survey_id == Survey.id)
+        .outerjoin(response_stats, response_stats.c.survey_id == Survey.id)
+        .filter(Survey.user_id == uid)
+        .order_by(Survey.id)
+        .all()
+    )
+
+    surveys = []
+    for s, question_count, response_count, last_response_at in rows:
+        s.questions_length = question_count
+        s.response_count = response_count
+        s.last_response_at = last_response_at
+        surveys.append(s)
+    responses = [s for s in surveys if s.publish]
+    total_responses = sum(s.response_count for s in surveys)
     total_surveys = len(surveys)
     total_published = len(responses)
     return render_template(
@@ -64,6 +134,55 @@ def dashboard():
     )
 
 
+@survey.cli.command("import-surveys")
+@click.argument("source", type=click.File("r"))
+@click.option("--user-id", type=int, required=True, help="Owner of the imported surveys.")
+@click.option("--format", "fmt", type=click.Choice(["json", "yaml"]), default=None,
+              help="Document format (default: from the file extension).")
+def import_surveys_command(source, user_id, fmt):
+    """Create surveys from a JSON or YAML file in one transaction."""
+    if db.session.get(User, user_id) is None:
+        raise click.ClickException(f"No user with id {user_id}.")
+    fmt = fmt or ("yaml" if source.name.endswith((".yaml", ".yml")) else "json")
+    try:
+        survey_ids = import_surveys(load_surveys(source.read(), fmt), user_id)
+    except ImportError:
+        raise click.ClickException("YAML import needs PyYAML (pip install pyyaml).")
+    except ProvisionError as e:
+        for error in e.errors:
+            click.echo(f"survey {error['index']}: {error['error']}", err=True)
+        raise click.ClickException(str(e))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f"Imported {len(survey_ids)} survey(s).")
+
+
+@survey.cli.command("clone-survey")
+@click.argument("survey_id", type=int)
+@click.option("--count", type=int, default=1, show_default=True, help="Number of copies.")
+@click.option("--title", "titles", multiple=True, help="Title of a copy (repeatable; overrides --count).")
+@click.option("--user-id", type=int, default=None, help="Owner of the copies (default: the source's owner).")
+@click.option("--publish/--no-publish", default=None, help="Publish flag of the copies (default: the source's).")
+def clone_survey_command(survey_id, count, titles, user_id, publish):
+    """Copy a survey and its questions in one transaction."""
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        raise click.ClickException(f"No survey with id {survey_id}.")
+    if user_id is not None and db.session.get(User, user_id) is None:
+        raise click.ClickException(f"No user with id {user_id}.")
+    try:
+        survey_ids = clone_survey(
+            survey_obj, user_id or survey_obj.user_id, list(titles) or clone_titles(survey_obj.title, count), publish
+        )
+    except ProvisionError as e:
+        for error in e.errors:
+            click.echo(f"copy {error['index']}: {error['error']}", err=True)
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f"Cloned survey {survey_id} into {len(survey_ids)} new survey(s).")
+
+
 @survey.route('/publish', methods=['POST'])
 @login_required
 def publish_survey():
@@ -83,6 +202,7 @@ def publish_survey():
         
         survey_obj.publish = True
         db.session.commit()
+        invalidate_survey(survey_obj.id)
         
         return jsonify({'success': True, 'message': 'Survey published successfully'}), 200
         
@@ -104,126 +224,134 @@ def save_survey():
     Receives JSON payload from frontend, validates, and stores Survey + Questions.
     """
     data = request.get_json() or {}
-    info = data.get('info', {})
-    questions = data.get('questions', [])
-
-    title = info.get('title', '').strip()
-    if not title or len(title) > 255:
-        abort(400, 'Title is required (≤255 chars)')
-
-    description = info.get('description', '').strip()
-    if len(description) > 2000:
-        abort(400, 'Description must be ≤2000 chars')
-
-    publish = bool(info.get('publish', False))
-
-    if not isinstance(questions, list) or len(questions) == 0:
-        abort(400, 'At least one question required')
+    try:
+        spec = validate_survey(data)
+    except ValueError as e:
+        abort(400, str(e))
 
-    file_type_pattern = re.compile(r'^\.[a-zA-Z0-9]+$')
-    q_objs = []
-    for idx, q in enumerate(questions, start=1):
-        text = q.get('text', '').strip()
-        if not text:
-            abort(400, f'Question {idx}: text required')
+    survey_id, = create_surveys([spec], current_user.uid)
+    db.session.commit()
+    invalidate_survey(survey_id)
+    return jsonify({
+        'status': 'success',
+        'survey_id': survey_id,
+        'redirect': url_for('survey.dashboard')
+    }), 201
 
-        qtype = q.get('type')
-        required = bool(q.get('required', False))
 
-        allowed = None
-        max_mb = None
+@survey.route('/import', methods=['POST'])
+@login_required
+def bulk_import():
+    """
+    Creates many surveys in one transaction from a JSON or YAML document:
+    a list of create-page payloads, or {"surveys": [...]}. Every survey is
+    validated first; any failure rejects the whole batch.
+    """
+    fmt = 'yaml' if request.mimetype in YAML_MIMETYPES else 'json'
+    try:
+        items = load_surveys(request.get_data(as_text=True), fmt)
+    except ImportError:
+        return jsonify({"error": "YAML import is not available on this server"}), 501
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        if qtype == 'File Upload':
-            allowed_list = [ft.strip() for ft in q.get('allowed_types', []) if ft.strip()]
-            if not all(file_type_pattern.match(ft) for ft in allowed_list):
-                abort(400, f'Question {idx}: invalid file types')
+    limit = current_app.config['SURVEY_IMPORT_MAX_SURVEYS']
+    if not items or len(items) > limit:
+        return jsonify({"error": f"Import between 1 and {limit} surveys at a time"}), 400
 
-            max_mb = q.get('max_size_mb')
-            if not isinstance(max_mb, int) or max_mb < 1 or max_mb > 100:
-                abort(400, f'Question {idx}: max_size_mb must be 1–100')
+    try:
+        survey_ids = import_surveys(items, current_user.uid)
+    except ProvisionError as e:
+        return jsonify({"error": str(e), "errors": e.errors}), 400
 
-            allowed = json.dumps(allowed_list)
+    db.session.commit()
+    return jsonify({'status': 'success', 'survey_ids': survey_ids}), 201
 
-        elif qtype in ('Multiple Choice', 'Checkboxes', 'Multiple Selection'):
-            opts = [str(opt).strip() for opt in q.get('allowed_types', []) if str(opt).strip()]
-            if len(opts) == 0:
-                abort(400, f'Question {idx}: multiple-choice questions require at least one option')
-            allowed = json.dumps(opts)
 
-        q_objs.append(Question(
-            text=text,
-            qtype=qtype,
-            required=required,
-            allowed_types=allowed,
-            max_size_mb=max_mb
-        ))
+@survey.route('/<int:survey_id>/clone', methods=['POST'])
+@login_required
+def clone(survey_id):
+    """
+    Copies a survey and its questions: {"titles": [...]} for one copy per
+    title, or {"count": n} for "Title (1)".."Title (n)"; optional "publish".
+    """
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        return jsonify({"error": "Survey not found"}), 404
 
-    survey_obj = Survey(title=title, description=description, publish=publish, user_id=current_user.uid)
-    db.session.add(survey_obj)
-    db.session.flush()
+    if survey_obj.user_id != current_user.uid:
+        return jsonify({"error": "Survey not available"}), 403
 
-    for qobj in q_objs:
-        qobj.survey_id = survey_obj.id
-        db.session.add(qobj)
+    data = request.get_json(silent=True) or {}
+    titles = data.get('titles')
+    if titles is None:
+        count = data.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            return jsonify({"error": "count must be a positive integer"}), 400
+        titles = clone_titles(survey_obj.title, count)
+    elif not isinstance(titles, list) or not titles:
+        return jsonify({"error": "titles must be a non-empty list"}), 400
+
+    limit = current_app.config['SURVEY_IMPORT_MAX_SURVEYS']
+    if len(titles) > limit:
+        return jsonify({"error": f"At most {limit} copies at a time"}), 400
+
+    publish = data.get('publish')
+    try:
+        survey_ids = clone_survey(survey_obj, current_user.uid, titles, None if publish is None else bool(publish))
+    except ProvisionError as e:
+        return jsonify({"error": str(e), "errors": e.errors}), 400
 
     db.session.commit()
-    return jsonify({
-        'status': 'success',
-        'survey_id': survey_obj.id,
-        'redirect': url_for('survey.dashboard')
-    }), 201
+    return jsonify({'status': 'success', 'survey_ids': survey_ids}), 201
 
 
-@survey.route('/fetch-questions', methods=['POST'])
+@survey.route('/fetch-questions', methods=['GET', 'POST'])
 @login_required
 def fetch_questions():
-    data = request.get_json() or {}
-    sid = data.get('survey_id')
+    if request.method == 'GET':
+        sid = request.args.get('survey_id')
+    else:
+        data = request.get_json() or {}
+        sid = data.get('survey_id')
 
-    survey_obj = Survey.query.filter_by(id=sid).first()
+    survey_obj = get_compiled_survey(sid)
     if not survey_obj:
         return jsonify({"error": "Survey not found"}), 404
 
     if survey_obj.user_id != current_user.uid and not survey_obj.publish:
         return jsonify({"error": "Survey not available"}), 403
 
-    questions_data = []
-    for q in survey_obj.questions:
-        q_info = {
-            "id": q.id,
-            "text": q.text,
-            "type": q.qtype,
-            "required": q.required,
-            "options": []
-        }
-
-        if q.allowed_types:
-            try:
-                opts = json.loads(q.allowed_types)
-                if isinstance(opts, list):
-                    q_info["options"] = opts
-                else:
-                    q_info["options"] = [str(opts)]
-            except Exception:
-                q_info["options"] = [opt.strip() for opt in q.allowed_types.split(",") if opt.strip()]
-
-        questions_data.append(q_info)
+    version = survey_version(survey_obj)
+    etag = make_etag(survey_obj.id, version.isoformat())
+    if request.method == 'GET' and is_not_modified(etag, version):
+        return not_modified(etag, version)
 
-    return jsonify({
+    questions_data = [{
+        "id": q.id,
+        "text": q.text,
+        "type": q.qtype,
+        "required": q.required,
+        "options": list(q.options)
+    } for q in survey_obj.questions]
+
+    return conditional_response(jsonify({
         "survey": {
             "id": survey_obj.id,
             "title": survey_obj.title,
             "description": survey_obj.description
         },
         "questions": questions_data
-    }), 200
+    }), etag, version)
 
 
 @survey.route('/submit/<int:survey_id>', methods=['POST'])
 def submit_survey(survey_id):
-    survey_obj = Survey.query.get_or_404(survey_id)
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        abort(404)
 
-    new_response = Response(survey_id=survey_id, user_id=current_user.uid if current_user.is_authenticated else None)
+    user_id = current_user.uid if current_user.is_authenticated else None
 
     # capture client-sent platform first
     platform_from_form = request.form.get("platform")
@@ -234,88 +362,45 @@ def submit_survey(survey_id):
     elif platform_from_qs:
         platform = platform_from_qs
     else:
-        platform = parse_platform_from_ua(request.headers.get("User-Agent", ""), request.referrer)
-
-    new_response.platform = platform
-
-    db.session.add(new_response)
-    db.session.flush()
-    # ... continue saving answers ...
-
-    
-    
-    db.session.add(new_response)
-    db.session.flush()
-
-    for question in survey_obj.questions:
-        field_name = f"q{question.id}"
-        answer_data = {}
-
-        if question.qtype == "File Upload":
-            file = request.files.get(field_name)
-            if file and file.filename:
-                # Upload to Cloudinary
-                url = upload_to_cloudinary(file, folder="survey_files")
-                if not url:
-                    abort(500, f"Failed to upload file for '{question.text}'")
-                answer_data["file_path"] = url
-
-        elif question.qtype == "Text Response":
-            answer_data["answer_text"] = request.form.get(field_name, "").strip()
-
-        elif question.qtype == "Multiple Choice":
-            selected_option = request.form.get(field_name)
-            if question.required and not selected_option:
-                abort(400, f"Question '{question.text}' is required")
-            answer_data["answer_text"] = selected_option
-
-        elif question.qtype == "Rating (1–5)":
-            rating = request.form.get(field_name)
-            if rating and rating.isdigit():
-                rating_val = int(rating)
-                if 1 <= rating_val <= 5:
-                    answer_data["answer_number"] = rating_val
-                else:
-                    abort(400, f"Invalid rating for question '{question.text}'")
-            elif question.required:
-                abort(400, f"Question '{question.text}' is required")
-
-        elif question.qtype == "Slider/Range":
-            slider_value = request.form.get(field_name)
-            try:
-                if slider_value:
-                    answer_data["answer_number"] = float(slider_value)
-                elif question.required:
-                    abort(400, f"Question '{question.text}' is required")
-            except ValueError:
-                abort(400, f"Invalid slider value for question '{question.text}'")
-
-        elif question.qtype == "Checkboxes":
-            selected_values = request.form.getlist(field_name)
-            if question.required and not selected_values:
-                abort(400, f"Question '{question.text}' is required")
-            answer_data["answer_text"] = ",".join(selected_values)
-
-        elif question.qtype == "Date Picker":
-            date_val = request.form.get(field_name)
-            if question.required and not date_val:
-                abort(400, f"Question '{question.text}' is required")
-            answer_data["answer_text"] = date_val
-
-        else:
-            answer_data["answer_text"] = request.form.get(field_name, "").strip()
-
-        answer_entry = Answer(
-            response_id=new_response.id,
-            question_id=question.id,
-            **answer_data
-        )
-        db.session.add(answer_entry)
+        platform = detect_platform(request.headers.get("User-Agent", ""), request.referrer)
+    # client-supplied, so cut to the column width before it is stored or spooled
+    platform = platform.strip()[:Response.platform.type.length] or None
+
+    # validate everything before touching the database
+    answers, increments = parse_submission(survey_obj, request.form, request.files)
+
+    if submission_spool.enabled:
+        # acknowledged once durable on local disk; the flusher writes it to the database
+        submission_spool.append({
+            "survey_id": survey_id,
+            "user_id": user_id,
+            "platform": platform,
+            "submitted_at": datetime.utcnow().isoformat(),
+            "answers": answers,
+            "increments": increments
+        })
+        return render_template("survey/thanks.html", survey=survey_obj)
 
+    response_id = save_submission(survey_id, user_id, platform, answers, increments)
     db.session.commit()
+    for question_id, ref in pending_uploads(answers):
+        upload_worker.enqueue(response_id, question_id, ref)
+    live_updates.publish_submission(survey_id, response_id, platform, increments)
     return render_template("survey/thanks.html", survey=survey_obj)
 
 
+@survey.route("/files/<name>")
+def stored_file(name):
+    path = resolve_blob(name)
+    if path is None:
+        abort(404)
+    # blobs are content-addressed, so they never change: cache them for a year
+    response = send_file(path, conditional=True, etag=name.split(".")[0], max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 @survey.route("/share/<int:survey_id>")
 @login_required
 def share_survey(survey_id):
@@ -328,23 +413,35 @@ def share_survey(survey_id):
 
 @survey.route("/respond/<int:survey_id>", methods=["GET"])
 def respond(survey_id):
-    survey = Survey.query.get_or_404(survey_id)
-
-    # Build questions list with parsed options (so template can use q.options)
-    questions = []
-    for q in survey.questions:
-        opts = []
-        if q.allowed_types:
-            try:
-                opts = json.loads(q.allowed_types)
-            except Exception:
-                # fallback if stored as comma-separated string
-                opts = [opt.strip() for opt in q.allowed_types.split(",") if opt.strip()]
-        # attach parsed options to object for template convenience
-        q.options = opts
-        questions.append(q)
+    survey = get_compiled_survey(survey_id)
+    if survey is None:
+        abort(404)
+
+    variant = "owner" if current_user.is_authenticated and current_user.uid == survey.user_id else "public"
+    version = survey_version(survey, csrf_bound=True)
+    token_key = session_token_key()
+    etag = make_etag(survey.id, version.isoformat(), variant, token_key)
+    if token_key and is_not_modified(etag, version, allow_date=False):
+        return not_modified(etag, version)
+
+    use_cache = current_app.config['SURVEY_HTML_CACHE']
+    cache_key = (survey.id, version, variant)
+    html = html_cache.get(cache_key) if use_cache else None
+    if html is None:
+        # compiled questions already carry parsed options (so template can use q.options)
+        html = render_template(
+            "survey/response.html",
+            survey=survey,
+            questions=survey.questions,
+            csrf_token=lambda: CSRF_PLACEHOLDER
+        )
+        if use_cache:
+            html_cache.set(cache_key, html)
 
-    return render_template("survey/response.html", survey=survey, questions=questions)
+    body = html.replace(CSRF_PLACEHOLDER, generate_csrf())
+    # generate_csrf() may have just stored a new token in the session
+    etag = make_etag(survey.id, version.isoformat(), variant, session_token_key())
+    return conditional_response(body, etag, version)
 
 
 # @survey.route("/thanks/<int:survey_id>")
@@ -356,29 +453,104 @@ def respond(survey_id):
 @survey.route("/results/<int:survey_id>")
 def results(survey_id):
     survey = Survey.query.get_or_404(survey_id)
-    responses = Response.query.filter_by(survey_id=survey_id).all()
-    grouped = {}
-
-    for r in responses:
-        platform = r.platform or "Unknown"
-        parsed_answers = []
-        for ans in r.answers:
-            opts = []
-            if ans.question.allowed_types:
-                try:
-                    opts = json.loads(ans.question.allowed_types)
-                except Exception:
-                    opts = []
-            parsed_answers.append({
-                "question": ans.question,
-                "answer_text": ans.answer_text,
-                "answer_number": ans.answer_number,
-                "file_path": ans.file_path,
-                "options": opts  
-            })
-        grouped.setdefault(platform, []).append({
-            "submitted_at": r.submitted_at,
-            "answers": parsed_answers
-        })
+    platform = request.args.get("platform")
+    cursor = request.args.get("cursor")
+    grouped = load_results(survey_id, platform=platform, cursor=cursor)
 
-    return render_template("survey/result.html", survey=survey, grouped=grouped)
+    return render_template("survey/result.html", survey=survey, grouped=grouped, platform=platform)
+
+
+@survey.route("/<int:survey_id>/summary")
+@login_required
+def survey_summary(survey_id):
+    survey_obj = Survey.query.filter_by(id=survey_id).first()
+    if not survey_obj:
+        return jsonify({"error": "Survey not found"}), 404
+
+    if survey_obj.user_id != current_user.uid:
+        return jsonify({"error": "Survey not available"}), 403
+
+    return jsonify(build_summary(survey_obj)), 200
+
+
+@survey.route("/<int:survey_id>/live")
+@login_required
+def live_results(survey_id):
+    """
+    Server-Sent Events stream of a survey's totals: a snapshot, then one
+    event per new response.
+    """
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        return jsonify({"error": "Survey not found"}), 404
+
+    if survey_obj.user_id != current_user.uid:
+        return jsonify({"error": "Survey not available"}), 403
+
+    response = current_app.response_class(
+        stream_with_context(live_updates.stream(survey_id)), mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@survey.route("/<int:survey_id>/crosstab")
+@login_required
+def survey_crosstab(survey_id):
+    """
+    Cross-tab of two dimensions (?rows=&cols=), or counts per category of
+    one (?rows= only). Dimensions are 'platform' or a question id; an
+    optional numeric ?measure= adds its count, sum and mean over the
+    responses that answered it, and ?filter=<key>:<value> (repeatable)
+    restricts the responses.
+    """
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        return jsonify({"error": "Survey not found"}), 404
+
+    if survey_obj.user_id != current_user.uid:
+        return jsonify({"error": "Survey not available"}), 403
+
+    try:
+        rows = parse_key(request.args.get("rows", "platform"))
+        cols = request.args.get("cols")
+        measure = request.args.get("measure")
+        measure = parse_key(measure) if measure else None
+        filters = parse_filters(request.args.getlist("filter"))
+        cube = get_cube(survey_obj)
+        if cols:
+            result = cube.crosstab(rows, parse_key(cols), filters=filters, measure=measure)
+        else:
+            result = cube.group_by(rows, filters=filters, measure=measure)
+    except CubeError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result["responses"] = len(cube)
+    return jsonify(result), 200
+
+
+@survey.route("/<int:survey_id>/export")
+@login_required
+def export_responses(survey_id):
+    survey_obj = get_compiled_survey(survey_id)
+    if survey_obj is None:
+        return jsonify({"error": "Survey not found"}), 404
+
+    if survey_obj.user_id != current_user.uid:
+        return jsonify({"error": "Survey not available"}), 403
+
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format '{fmt}'", "formats": list(EXPORT_FORMATS)}), 400
+
+    try:
+        body = STREAMERS[fmt](survey_obj)
+    except ImportError:
+        return jsonify({"error": f"{fmt} export is not available on this server"}), 501
+
+    # rows are generated while the response is being sent
+    response = current_app.response_class(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="survey-{survey_id}.{fmt}"'
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
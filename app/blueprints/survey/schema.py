@@ -0,0 +1,213 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from flask import abort
+from sqlalchemy.orm import selectinload
+from app.blueprints.cache import TTLCache
+from app.blueprints.database import primary
+from .models import db, Survey, Question
+from app.blueprints.survey.uploads import stage_upload
+
+schema_cache = TTLCache(maxsize=512, ttl=300)
+
+
+def _file_upload(question, form, files):
+    answer_data = {}
+    file = files.get(question.field_name)
+    if file and file.filename:
+        # Stage locally; the upload worker moves it to storage after commit
+        try:
+            answer_data["file_path"] = stage_upload(file)
+        except OSError as e:
+            print(f"Staging upload failed: {e}")
+            abort(500, f"Failed to upload file for '{question.text}'")
+    return answer_data, None
+
+
+def _text_response(question, form, files):
+    return {"answer_text": form.get(question.field_name, "").strip()}, None
+
+
+def _multiple_choice(question, form, files):
+    selected_option = form.get(question.field_name)
+    if question.required and not selected_option:
+        abort(400, f"Question '{question.text}' is required")
+    if not selected_option:
+        return {"answer_text": selected_option}, None
+    option_id = question.option_id(selected_option)
+    if option_id is None:
+        abort(400, f"Invalid option for question '{question.text}'")
+    return {"answer_text": selected_option, "option_ids": [option_id]}, None
+
+
+def _rating(question, form, files):
+    answer_data = {}
+    rating = form.get(question.field_name)
+    if rating and rating.isdigit():
+        rating_val = int(rating)
+        if 1 <= rating_val <= 5:
+            answer_data["answer_number"] = rating_val
+        else:
+            abort(400, f"Invalid rating for question '{question.text}'")
+    elif question.required:
+        abort(400, f"Question '{question.text}' is required")
+    return answer_data, None
+
+
+def _slider(question, form, files):
+    answer_data = {}
+    slider_value = form.get(question.field_name)
+    try:
+        if slider_value:
+            value = float(slider_value)
+            # "nan" and "inf" parse, but would poison the running sums
+            if not math.isfinite(value):
+                raise ValueError(slider_value)
+            answer_data["answer_number"] = value
+        elif question.required:
+            abort(400, f"Question '{question.text}' is required")
+    except ValueError:
+        abort(400, f"Invalid slider value for question '{question.text}'")
+    return answer_data, None
+
+
+def _checkboxes(question, form, files):
+    selected_values = list(dict.fromkeys(v for v in form.getlist(question.field_name) if v))
+    if question.required and not selected_values:
+        abort(400, f"Question '{question.text}' is required")
+    option_ids = [question.option_id(value) for value in selected_values]
+    if None in option_ids:
+        abort(400, f"Invalid option for question '{question.text}'")
+    # answer_text keeps a readable copy; counts come from the option ids
+    return {"answer_text": ",".join(selected_values), "option_ids": option_ids}, selected_values
+
+
+def _date_picker(question, form, files):
+    date_val = form.get(question.field_name)
+    if question.required and not date_val:
+        abort(400, f"Question '{question.text}' is required")
+    return {"answer_text": date_val}, None
+
+
+VALIDATORS = {
+    "File Upload": _file_upload,
+    "Text Response": _text_response,
+    "Multiple Choice": _multiple_choice,
+    "Rating (1–5)": _rating,
+    "Slider/Range": _slider,
+    "Checkboxes": _checkboxes,
+    "Date Picker": _date_picker,
+}
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    id: int
+    text: str
+    qtype: str
+    required: bool
+    options: tuple
+    option_ids: tuple
+    max_size_mb: int
+    field_name: str
+
+    @cached_property
+    def _option_lookup(self):
+        return {str(value): oid for value, oid in zip(self.options, self.option_ids)}
+
+    def option_id(self, value):
+        """
+        Id of the option whose text is ``value``, or None.
+        """
+        return self._option_lookup.get(value)
+
+    def parse(self, form, files):
+        """
+        Validate this question's submitted value.
+        :return: (answer_data, selected) where answer_data holds Answer column
+                 values (plus "option_ids" chosen in choice questions) and
+                 selected lists chosen options for multi-selects
+        """
+        validator = VALIDATORS.get(self.qtype, _text_response)
+        return validator(self, form, files)
+
+
+@dataclass(frozen=True)
+class CompiledSurvey:
+    id: int
+    title: str
+    description: str
+    publish: bool
+    user_id: int
+    updated_at: datetime
+    questions: tuple
+
+
+def compile_survey(survey_obj):
+    questions = sorted(survey_obj.questions, key=lambda q: q.id)
+    return CompiledSurvey(
+        id=survey_obj.id,
+        title=survey_obj.title,
+        description=survey_obj.description,
+        publish=bool(survey_obj.publish),
+        user_id=survey_obj.user_id,
+        updated_at=survey_obj.updated_at,
+        questions=tuple(
+            CompiledQuestion(
+                id=q.id,
+                text=q.text,
+                qtype=q.qtype,
+                required=bool(q.required),
+                options=tuple(opt.value for opt in q.options),
+                option_ids=tuple(opt.id for opt in q.options),
+                max_size_mb=q.max_size_mb,
+                field_name=f"q{q.id}"
+            )
+            for q in questions
+        )
+    )
+
+
+def _load(survey_id):
+    # cached past the request, so read from the primary rather than a lagging replica
+    with primary():
+        survey_obj = Survey.query.options(
+            selectinload(Survey.questions).selectinload(Question.options)
+        ).filter_by(id=survey_id).first()
+    if survey_obj is None:
+        return None
+    return compile_survey(survey_obj)
+
+
+def get_compiled_survey(survey_id):
+    """
+    Return the immutable compiled form of a survey, loading and caching it
+    on a miss. A cached survey is checked against the row's updated_at on
+    every lookup, so a change committed by another worker process is seen
+    on its next lookup. Returns None when the survey does not exist.
+    """
+    try:
+        survey_id = int(survey_id)
+    except (TypeError, ValueError):
+        return None
+    compiled = schema_cache.get(survey_id)
+    if compiled is not None and compiled.updated_at == _updated_at(survey_id):
+        return compiled
+    compiled = _load(survey_id)
+    if compiled is None:
+        schema_cache.pop(survey_id)
+    else:
+        schema_cache.set(survey_id, compiled)
+    return compiled
+
+
+def _updated_at(survey_id):
+    # one primary-key lookup; the primary, as a lagging replica would look stale
+    with primary():
+        return db.session.query(Survey.updated_at).filter(Survey.id == survey_id).scalar()
+
+
+def invalidate_survey(survey_id):
+    # this process only; other workers notice the new updated_at on lookup
+    schema_cache.pop(int(survey_id))
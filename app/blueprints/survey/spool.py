@@ -0,0 +1,269 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from flask import current_app
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, StatementError
+from .models import db, SpoolAck
+from app.blueprints.survey.ingest import save_submissions, pending_uploads
+from app.blueprints.survey.uploads import upload_worker
+from app.blueprints.survey.live import live_updates
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".sealed"
+FAILED_SUFFIX = ".failed"
+# connection-level errors: the segment is retried later instead of set aside
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_segment(path):
+    """
+    Records of a segment file. A trailing line without a newline is a torn
+    write from a crash and was never acknowledged, so it is dropped.
+    """
+    records = []
+    with open(path, "rb") as fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break
+            records.append(json.loads(line))
+    return records
+
+
+class SubmissionSpool:
+    """
+    Write-behind ingestion for traffic spikes (SUBMISSION_MODE=spool).
+
+    Validated submissions are appended as JSON lines to an append-only
+    segment file and acknowledged once fsynced; appends arriving together
+    share one fsync (group commit). A background flusher seals segments and
+    drains each one into responses/answers in a single transaction, recording
+    the segment in spool_acks so a replay after a crash never inserts it
+    twice. Segments left open by a dead process are sealed and replayed.
+    Records the database rejects are moved to a ``.failed`` segment, which
+    replay_failed queues again once the cause is fixed.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._synced_cond = threading.Condition(self._lock)
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["SUBMISSION_MODE"] == "spool"
+        self.directory = app.config["SUBMISSION_SPOOL_DIR"]
+        self.fsync_interval = app.config["SUBMISSION_SPOOL_FSYNC_INTERVAL"]
+        self.flush_interval = app.config["SUBMISSION_SPOOL_FLUSH_INTERVAL"]
+        self.segment_records = app.config["SUBMISSION_SPOOL_SEGMENT_RECORDS"]
+        app.extensions["submission_spool"] = self
+        if self.enabled:
+            # segments left by a crash are recovered and drained even if
+            # this process never spools a submission itself
+            self._ensure_started()
+
+    def _ensure_started(self):
+        # threads do not survive fork; a worker that inherited a started
+        # spool starts its own on first use
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._fh = None
+        self._segment = None
+        self._segment_count = 0
+        self._written = 0
+        self._synced = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.recover()
+        threading.Thread(target=self._sync_loop, name="spool-sync", daemon=True).start()
+        threading.Thread(target=self._flush_loop, name="spool-flush", daemon=True).start()
+
+    def append(self, record):
+        """
+        Durably append one submission; returns once it has been fsynced.
+        """
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._ensure_started()
+            if self._fh is None:
+                self._open_segment()
+            self._fh.write(line)
+            self._fh.flush()
+            self._segment_count += 1
+            self._written += 1
+            seq = self._written
+            self._synced_cond.notify_all()
+            while self._synced < seq:
+                self._synced_cond.wait()
+            if self._segment_count >= self.segment_records:
+                self._seal()
+
+    def _open_segment(self):
+        name = f"seg-{time.time_ns():020d}-{os.getpid()}"
+        self._segment = os.path.join(self.directory, name)
+        self._fh = open(self._segment + OPEN_SUFFIX, "ab")
+        self._segment_count = 0
+
+    def _seal(self):
+        # caller holds the lock
+        if self._fh is None:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self._synced = self._written
+        os.replace(self._segment + OPEN_SUFFIX, self._segment + SEALED_SUFFIX)
+        self._fh = None
+        self._segment = None
+
+    def _sync_loop(self):
+        while True:
+            with self._lock:
+                while self._synced >= self._written:
+                    self._synced_cond.wait()
+            # let concurrent appends pile up so one fsync covers them all
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._fh is not None and self._synced < self._written:
+                    os.fsync(self._fh.fileno())
+                    self._synced = self._written
+                self._synced_cond.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                with self._lock:
+                    if self._segment_count:
+                        self._seal()
+                self.drain()
+            except Exception:
+                self.app.logger.exception("Spool flush failed")
+
+    def recover(self):
+        """
+        Seal segments left open by processes that no longer exist.
+        """
+        for path in glob.glob(os.path.join(self.directory, "seg-*" + OPEN_SUFFIX)):
+            pid = int(os.path.basename(path)[:-len(OPEN_SUFFIX)].rsplit("-", 1)[1])
+            if pid != os.getpid() and not _pid_alive(pid):
+                os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+
+    def drain(self):
+        """
+        Load every sealed segment into the database.
+        :return: number of submissions written
+        """
+        written = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "seg-*" + SEALED_SUFFIX))):
+            try:
+                fh = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with fh:
+                try:
+                    # another worker process may be draining this segment
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                try:
+                    written += self._drain_segment(path)
+                except Exception:
+                    # left sealed for the next drain; later segments still go in
+                    self.app.logger.exception("Spool segment %s could not be drained", os.path.basename(path))
+        return written
+
+    def replay_failed(self):
+        """
+        Queue every ``.failed`` segment to be drained again. Each gets a new
+        segment name, since the segment it came from is already acknowledged.
+        :return: number of records queued
+        """
+        queued = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "seg-*" + FAILED_SUFFIX))):
+            queued += len(read_segment(path))
+            name = f"seg-{time.time_ns():020d}-{os.getpid()}"
+            os.replace(path, os.path.join(self.directory, name + SEALED_SUFFIX))
+        return queued
+
+    def _drain_segment(self, path):
+        name = os.path.basename(path)
+        with self.app.app_context():
+            try:
+                if db.session.get(SpoolAck, name) is not None:
+                    os.remove(path)
+                    return 0
+                records = read_segment(path)
+                try:
+                    with db.session.begin_nested():
+                        response_ids = save_submissions(records)
+                    saved, rejected = list(zip(response_ids, records)), []
+                except (DBAPIError, StatementError) as e:
+                    if isinstance(e, TRANSIENT_ERRORS):
+                        raise
+                    saved, rejected = self._save_each(name, records)
+                if rejected:
+                    self._write_failed(path, rejected)
+                db.session.add(SpoolAck(segment=name, records=len(saved)))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+        if os.path.exists(path):
+            os.remove(path)
+        for response_id, rec in saved:
+            for question_id, ref in pending_uploads(rec["answers"]):
+                upload_worker.enqueue(response_id, question_id, ref)
+            live_updates.publish_submission(rec["survey_id"], response_id, rec["platform"], rec["increments"])
+        return len(saved)
+
+    def _save_each(self, name, records):
+        """
+        Retry a rejected segment one record at a time, each under its own
+        savepoint, so only the records the database refuses are left out.
+        :return: ([(response id, record)] written, [record] rejected)
+        """
+        saved, rejected = [], []
+        for i, rec in enumerate(records):
+            try:
+                with db.session.begin_nested():
+                    response_id, = save_submissions([rec])
+                saved.append((response_id, rec))
+            except (DBAPIError, StatementError) as e:
+                if isinstance(e, TRANSIENT_ERRORS):
+                    raise
+                rejected.append(rec)
+                current_app.logger.warning("Spool segment %s record %d rejected: %s", name, i, getattr(e, "orig", e))
+        return saved, rejected
+
+    def _write_failed(self, path, records):
+        # written before the segment is acknowledged, so a crash in between
+        # replays the segment and rewrites this file instead of losing records
+        failed = path[:-len(SEALED_SUFFIX)] + FAILED_SUFFIX
+        with open(failed, "wb") as fh:
+            for rec in records:
+                fh.write((json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8"))
+            fh.flush()
+            os.fsync(fh.fileno())
+        current_app.logger.error("Spool segment %s: %d record(s) moved to %s", os.path.basename(path),
+                                 len(records), os.path.basename(failed))
+
+
+submission_spool = SubmissionSpool()
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from .models import db, Answer, StoredFile
+from app.blueprints.survey.utils import upload_to_cloudinary
+
+BLOB_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,15})?$")
+
+
+def file_digest(path):
+    """
+    SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CloudinaryStorage:
+    """
+    Stores files on Cloudinary.
+    """
+    name = "cloudinary"
+
+    def store(self, path, digest, ext):
+        """
+        :param path: local path of the file to store
+        :param digest: SHA-256 of the file
+        :param ext: lower-case file extension including the dot (may be empty)
+        :return: public URL string or None if failed
+        """
+        with open(path, "rb") as fh:
+            return upload_to_cloudinary(fh, folder="survey_files")
+
+    def delete(self, record):
+        # Cloudinary assets are kept; only the local bookkeeping is dropped
+        return True
+
+
+class ContentAddressedStorage:
+    """
+    Local disk store keyed by SHA-256: blobs live at <root>/ab/cd/<sha256><ext>,
+    so identical uploads share one file. Stand-in for Cloudinary that works
+    fully offline; files are served by the survey.stored_file route.
+    """
+    name = "local"
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url
+
+    def blob_path(self, digest, ext=""):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext)
+
+    def store(self, path, digest, ext):
+        destination = self.blob_path(digest, ext)
+        if not os.path.exists(destination):
+            directory = os.path.dirname(destination)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                # copy then rename so readers never see a partial blob
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+                with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+                    shutil.copyfileobj(src, out)
+                os.replace(tmp_path, destination)
+            except OSError as e:
+                print(f"Local file store failed: {e}")
+                return None
+        return f"{self.base_url.rstrip('/')}/{digest}{ext}"
+
+    def delete(self, record):
+        try:
+            os.remove(self.blob_path(record.sha256, record.extension or ""))
+        except FileNotFoundError:
+            pass
+        return True
+
+
+def get_storage():
+    """
+    Storage backend selected by FILE_STORAGE_BACKEND ('cloudinary' or 'local').
+    """
+    backend = current_app.config.get("FILE_STORAGE_BACKEND", "cloudinary")
+    if backend == "local":
+        return ContentAddressedStorage(current_app.config["LOCAL_STORAGE_DIR"], current_app.config["LOCAL_STORAGE_URL"])
+    return CloudinaryStorage()
+
+
+def acquire(digest):
+    """
+    Take a reference on an already stored blob.
+    :return: its URL, or None when the content has not been stored yet
+    """
+    updated = StoredFile.query.filter_by(sha256=digest).update(
+        {"refcount": StoredFile.refcount + 1}, synchronize_session=False
+    )
+    if not updated:
+        return None
+    return db.session.query(StoredFile.url).filter_by(sha256=digest).scalar()
+
+
+def register(digest, size, ext, url, backend):
+    """
+    Record a newly stored blob with one reference. If another worker stored
+    the same content concurrently, take a reference on its record instead.
+    :return: URL to use for the answer
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredFile(
+                sha256=digest, size=size, extension=ext, url=url, backend=backend, refcount=1
+            ))
+    except IntegrityError:
+        return acquire(digest) or url
+    return url
+
+
+def collect_garbage():
+    """
+    Recount references from Answer.file_path and delete blobs that are no
+    longer referenced. The records are locked before the answers are
+    counted, and records an upload is taking a reference on right now are
+    skipped: such a reference is either committed before the count or
+    waits for this pass (and re-stores the blob if it was deleted).
+    :return: number of blobs removed
+    """
+    storage = get_storage()
+    records = StoredFile.query.with_for_update(skip_locked=True).all()
+    refs = dict(
+        db.session.query(Answer.file_path, func.count(Answer.id))
+        .filter(Answer.file_path.in_([r.url for r in records]))
+        .group_by(Answer.file_path)
+        .all()
+    ) if records else {}
+
+    removed = 0
+    for record in records:
+        count = refs.get(record.url, 0)
+        if record.refcount != count:
+            record.refcount = count
+        if count == 0 and record.backend == storage.name and storage.delete(record):
+            db.session.delete(record)
+            removed += 1
+    db.session.commit()
+    return removed
+
+
+def resolve_blob(name):
+    """
+    Local path of a content-addressed blob from its public name, or None.
+    """
+    match = BLOB_NAME.match(name)
+    if not match:
+        return None
+    storage = ContentAddressedStorage(current_app.config["LOCAL_STORAGE_DIR"], current_app.config["LOCAL_STORAGE_URL"])
+    path = storage.blob_path(match.group(1), (match.group(2) or "").lower())
+    return path if os.path.exists(path) else None
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+from flask import Request, current_app
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.formparser import FormDataParser, MultiPartParser
+from app.blueprints.survey.schema import get_compiled_survey
+
+DEFAULT_MAX_SIZE_MB = 10
+MB = 1024 * 1024
+
+
+class GuardedFile:
+    """
+    Writable container for one uploaded file. Streams parts straight to a
+    temporary file in the staging directory, hashing as it goes, and aborts
+    the request as soon as the size limit is exceeded.
+    """
+
+    def __init__(self, directory, field_name, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self.field_name = field_name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._fh = tempfile.NamedTemporaryFile(dir=directory, prefix="incoming-", delete=False)
+        self.path = self._fh.name
+        self._claimed = False
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(
+                f"File for '{self.field_name}' exceeds {self.max_bytes // MB} MB"
+            )
+        self._hash.update(data)
+        return self._fh.write(data)
+
+    def claim(self, destination):
+        """
+        Move the received file to ``destination`` instead of copying it.
+        """
+        self._fh.close()
+        os.replace(self.path, destination)
+        self._claimed = True
+
+    def discard(self):
+        self._fh.close()
+        if not self._claimed and os.path.exists(self.path):
+            os.remove(self.path)
+        self._claimed = True
+
+    def close(self):
+        # files nobody claimed (e.g. the submission was rejected) are removed
+        self.discard()
+
+    def __getattr__(self, name):
+        return getattr(self._fh, name)
+
+
+class UploadMultiPartParser(MultiPartParser):
+    """
+    Multipart parser that applies a per-field upload policy while streaming.
+    """
+
+    def __init__(self, policy, staging_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.policy = policy
+        self.staging_dir = staging_dir
+        self.containers = []
+
+    def start_file_streaming(self, event, total_content_length):
+        if event.name not in self.policy:
+            raise BadRequest(f"Unexpected file field '{event.name}'")
+        max_bytes, allowed = self.policy[event.name]
+        if event.filename and allowed:
+            _, ext = os.path.splitext(event.filename)
+            if ext.lower() not in allowed:
+                raise UnsupportedMediaType(f"File type '{ext}' is not allowed for '{event.name}'")
+        container = GuardedFile(self.staging_dir, event.name, max_bytes)
+        self.containers.append(container)
+        return container
+
+    def parse(self, stream, boundary, content_length):
+        try:
+            return super().parse(stream, boundary, content_length)
+        except Exception:
+            for container in self.containers:
+                container.discard()
+            raise
+
+
+class UploadFormDataParser(FormDataParser):
+    upload_policy = None
+    staging_dir = None
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        if self.upload_policy is None:
+            return super()._parse_multipart(stream, mimetype, content_length, options)
+        parser = UploadMultiPartParser(
+            self.upload_policy,
+            self.staging_dir,
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls
+        )
+        boundary = options.get("boundary", "").encode("ascii")
+        if not boundary:
+            raise ValueError("Missing boundary")
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+def upload_policy(survey):
+    """
+    Map of file field name to (max bytes, allowed extensions) for a
+    compiled survey's File Upload questions.
+    """
+    policy = {}
+    for q in survey.questions:
+        if q.qtype == "File Upload":
+            allowed = tuple(str(ext).lower() for ext in q.options)
+            policy[q.field_name] = ((q.max_size_mb or DEFAULT_MAX_SIZE_MB) * MB, allowed)
+    return policy
+
+
+class SurveyRequest(Request):
+    """
+    Request class that enforces File Upload limits while the multipart body
+    of a survey submission is being parsed, before any view code runs.
+    """
+    form_data_parser_class = UploadFormDataParser
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+        if self.endpoint == "survey.submit_survey" and self.view_args:
+            survey = get_compiled_survey(self.view_args.get("survey_id"))
+            parser.upload_policy = upload_policy(survey) if survey else {}
+            parser.staging_dir = current_app.config["UPLOAD_STAGING_DIR"]
+        return parser
@@ -0,0 +1,108 @@
+import math
+from app.blueprints.survey.schema import get_compiled_survey
+from app.blueprints.survey.tallies import CHOICE_TYPES, NUMERIC_TYPES, DATE_TYPES, load_tallies
+
+SLIDER_BIN_WIDTH = 10
+
+
+def _weighted_median(values):
+    """
+    Median of a sorted list of (value, count) pairs.
+    """
+    total = sum(count for _, count in values)
+    if not total:
+        return None
+    lower, upper = (total - 1) // 2, total // 2
+    seen = 0
+    low_val = None
+    for value, count in values:
+        if low_val is None and seen + count > lower:
+            low_val = value
+        if seen + count > upper:
+            return (low_val + value) / 2
+        seen += count
+    return None
+
+
+def _histogram(qtype, values):
+    """
+    Bucket grouped numeric values: one bin per star for ratings,
+    fixed-width bins for sliders.
+    """
+    if qtype == "Rating (1–5)":
+        bins = {str(star): 0 for star in range(1, 6)}
+        for value, count in values:
+            key = str(int(value))
+            bins[key] = bins.get(key, 0) + count
+        return bins
+
+    bins = {}
+    for start in range(0, 100, SLIDER_BIN_WIDTH):
+        bins[f"{start}-{start + SLIDER_BIN_WIDTH}"] = 0
+    for value, count in values:
+        start = min(max(int(value // SLIDER_BIN_WIDTH) * SLIDER_BIN_WIDTH, 0), 100 - SLIDER_BIN_WIDTH)
+        bins[f"{start}-{start + SLIDER_BIN_WIDTH}"] += count
+    return bins
+
+
+def _numeric_stats(qtype, totals, values):
+    count, total, total_sq = totals
+    if not count:
+        return {"count": 0, "mean": None, "stddev": None, "median": None, "min": None, "max": None,
+                "histogram": _histogram(qtype, [])}
+    mean = total / count
+    return {
+        "count": count,
+        "mean": mean,
+        "stddev": math.sqrt(max(total_sq / count - mean * mean, 0.0)),
+        "median": _weighted_median(values),
+        "min": values[0][0] if values else None,
+        "max": values[-1][0] if values else None,
+        "histogram": _histogram(qtype, values)
+    }
+
+
+def build_summary(survey):
+    """
+    Build per-question aggregates for a survey from its tallies, so the
+    cost depends on the number of questions and distinct answers rather
+    than on the number of responses.
+    """
+    questions = get_compiled_survey(survey.id).questions
+    tallies, platforms = load_tallies(survey.id)
+
+    questions_data = []
+    for q in questions:
+        rows = tallies.get(q.id, {})
+        totals = rows.pop("", (0, 0.0, 0.0))
+        q_info = {
+            "id": q.id,
+            "text": q.text,
+            "type": q.qtype,
+            "answered": totals[0]
+        }
+
+        if q.qtype in CHOICE_TYPES:
+            counts = {opt: 0 for opt in q.options}
+            for opt, (count, _, _) in rows.items():
+                counts[opt] = counts.get(opt, 0) + count
+            q_info["options"] = counts
+
+        elif q.qtype in NUMERIC_TYPES:
+            values = sorted((float(key), count) for key, (count, _, _) in rows.items())
+            q_info.update(_numeric_stats(q.qtype, totals, values))
+
+        elif q.qtype in DATE_TYPES:
+            q_info["dates"] = {day: count for day, (count, _, _) in sorted(rows.items())}
+
+        questions_data.append(q_info)
+
+    return {
+        "survey": {
+            "id": survey.id,
+            "title": survey.title
+        },
+        "total_responses": sum(platforms.values()),
+        "platforms": platforms,
+        "questions": questions_data
+    }
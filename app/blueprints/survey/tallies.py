@@ -0,0 +1,265 @@
+from sqlalchemy import func, or_
+from .models import (
+    db, Survey, Question, QuestionOption, Answer, AnswerSelection, Response, QuestionTally, PlatformTally,
+    answer_text_prefix
+)
+
+CHOICE_TYPES = ("Multiple Choice", "Checkboxes", "Multiple Selection")
+MULTI_SELECT_TYPES = ("Checkboxes", "Multiple Selection")
+NUMERIC_TYPES = ("Rating (1–5)", "Slider/Range")
+DATE_TYPES = ("Date Picker",)
+UNKNOWN_PLATFORM = "Unknown"
+OPTION_MAX_LEN = 255
+
+
+def numeric_key(value):
+    """
+    Tally key for a numeric answer; float(key) gives the value back.
+    """
+    return repr(float(value))
+
+
+def tally_answer(question, answer_data, selected=None):
+    """
+    Build the tally increments for one answer.
+    :param question: Question (or compiled question) the answer belongs to
+    :param answer_data: dict of Answer column values
+    :param selected: list of chosen options for multi-select questions
+    :return: list of (question_id, option, count, total, total_sq) tuples
+    """
+    text = answer_data.get("answer_text")
+    number = answer_data.get("answer_number")
+    if not text and number is None and not answer_data.get("file_path"):
+        return []
+
+    if number is not None:
+        number = float(number)
+        rows = [(question.id, "", 1, number, number * number)]
+    else:
+        rows = [(question.id, "", 1, 0.0, 0.0)]
+
+    if question.qtype in CHOICE_TYPES:
+        if question.qtype in MULTI_SELECT_TYPES:
+            chosen = selected or ()
+        else:
+            chosen = [text]
+        for opt in dict.fromkeys(o.strip() for o in chosen if o and o.strip()):
+            rows.append((question.id, opt[:OPTION_MAX_LEN], 1, 0.0, 0.0))
+    elif question.qtype in NUMERIC_TYPES and number is not None:
+        rows.append((question.id, numeric_key(number), 1, number, number * number))
+    elif question.qtype in DATE_TYPES and text:
+        rows.append((question.id, text[:OPTION_MAX_LEN], 1, 0.0, 0.0))
+    return rows
+
+
+def _upsert_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _increment(model, key_columns, rows):
+    """
+    Add ``rows`` (dicts of key columns + counters) onto existing tally rows,
+    creating them when missing. Rows are sorted so concurrent submissions
+    lock tally rows in the same order.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    counters = [c for c in ("count", "total", "total_sq") if c in rows[0]]
+    rows = sorted(rows, key=lambda r: tuple(r[c] for c in key_columns))
+
+    insert = _upsert_insert()
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: table.c[c] + stmt.excluded[c] for c in counters}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        match = [table.c[c] == row[c] for c in key_columns]
+        result = db.session.execute(
+            table.update().where(*match).values({c: table.c[c] + row[c] for c in counters})
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(**row))
+
+
+def apply_tallies(survey_id, platform, increments):
+    """
+    Fold one submission into the tally tables. Must run inside the
+    submission transaction so tallies and answers commit together.
+    """
+    apply_tally_batch(survey_id, {platform: 1}, increments)
+
+
+def apply_tally_batch(survey_id, platform_counts, increments):
+    """
+    Fold any number of submissions to one survey into the tally tables.
+    :param platform_counts: dict platform -> number of responses
+    :param increments: tally increments of all the submissions
+    """
+    merged = {}
+    for question_id, option, count, total, total_sq in increments:
+        acc = merged.setdefault((question_id, option), [0, 0.0, 0.0])
+        acc[0] += count
+        acc[1] += total
+        acc[2] += total_sq
+
+    _increment(QuestionTally, ["question_id", "option"], [
+        {"survey_id": survey_id, "question_id": qid, "option": option,
+         "count": count, "total": total, "total_sq": total_sq}
+        for (qid, option), (count, total, total_sq) in merged.items()
+    ])
+
+    platforms = {}
+    for platform, count in platform_counts.items():
+        key = (platform or UNKNOWN_PLATFORM)[:OPTION_MAX_LEN]
+        platforms[key] = platforms.get(key, 0) + count
+    _increment(PlatformTally, ["survey_id", "platform"], [
+        {"survey_id": survey_id, "platform": platform, "count": count}
+        for platform, count in platforms.items()
+    ])
+
+
+def load_tallies(survey_id):
+    """
+    Read the tallies of a survey.
+    :return: (questions, platforms) where questions maps question_id to
+             {option: (count, total, total_sq)} and platforms maps name to count
+    """
+    questions = {}
+    rows = db.session.query(
+        QuestionTally.question_id,
+        QuestionTally.option,
+        QuestionTally.count,
+        QuestionTally.total,
+        QuestionTally.total_sq
+    ).filter(QuestionTally.survey_id == survey_id)
+    for qid, option, count, total, total_sq in rows:
+        questions.setdefault(qid, {})[option] = (count, total, total_sq)
+
+    platforms = dict(
+        db.session.query(PlatformTally.platform, PlatformTally.count)
+        .filter(PlatformTally.survey_id == survey_id)
+        .order_by(PlatformTally.count.desc(), PlatformTally.platform)
+        .all()
+    )
+    return questions, platforms
+
+
+def _answered_filter():
+    return or_(
+        Answer.answer_text.isnot(None) & (Answer.answer_text != ""),
+        Answer.answer_number.isnot(None),
+        Answer.file_path.isnot(None)
+    )
+
+
+def _rebuild_survey(survey_id):
+    QuestionTally.query.filter_by(survey_id=survey_id).delete(synchronize_session=False)
+    PlatformTally.query.filter_by(survey_id=survey_id).delete(synchronize_session=False)
+
+    questions = Question.query.filter_by(survey_id=survey_id).all()
+    if questions:
+        qtypes = {q.id: q.qtype for q in questions}
+        merged = {}
+
+        def add(qid, option, count, total=0.0, total_sq=0.0):
+            acc = merged.setdefault((qid, option[:OPTION_MAX_LEN]), [0, 0.0, 0.0])
+            acc[0] += count
+            acc[1] += total or 0.0
+            acc[2] += total_sq or 0.0
+
+        number = Answer.answer_number
+        totals = (
+            db.session.query(Answer.question_id, func.count(Answer.id), func.sum(number), func.sum(number * number))
+            .filter(Answer.question_id.in_(list(qtypes)), _answered_filter())
+            .group_by(Answer.question_id)
+        )
+        for qid, count, total, total_sq in totals:
+            add(qid, "", count, total, total_sq)
+
+        choice_ids = [qid for qid, qtype in qtypes.items() if qtype in CHOICE_TYPES]
+        if choice_ids:
+            labels = dict(
+                db.session.query(QuestionOption.id, QuestionOption.value)
+                .filter(QuestionOption.question_id.in_(choice_ids))
+            )
+            rows = (
+                db.session.query(AnswerSelection.question_id, AnswerSelection.option_id, func.count())
+                .filter(AnswerSelection.question_id.in_(choice_ids))
+                .group_by(AnswerSelection.question_id, AnswerSelection.option_id)
+            )
+            for qid, option_id, count in rows:
+                add(qid, labels[option_id], count)
+
+        date_ids = [qid for qid, qtype in qtypes.items() if qtype in DATE_TYPES]
+        if date_ids:
+            # grouped by the indexed prefix, which is also the tally option length
+            rows = (
+                db.session.query(Answer.question_id, answer_text_prefix, func.count())
+                .filter(Answer.question_id.in_(date_ids), answer_text_prefix.isnot(None), answer_text_prefix != "")
+                .group_by(Answer.question_id, answer_text_prefix)
+            )
+            for qid, text, count in rows:
+                add(qid, text.strip(), count)
+
+        numeric_ids = [qid for qid, qtype in qtypes.items() if qtype in NUMERIC_TYPES]
+        if numeric_ids:
+            rows = (
+                db.session.query(Answer.question_id, number, func.count(Answer.id))
+                .filter(Answer.question_id.in_(numeric_ids), number.isnot(None))
+                .group_by(Answer.question_id, number)
+            )
+            for qid, value, count in rows:
+                add(qid, numeric_key(value), count, value * count, value * value * count)
+
+        if merged:
+            db.session.execute(QuestionTally.__table__.insert(), [
+                {"survey_id": survey_id, "question_id": qid, "option": option,
+                 "count": count, "total": total, "total_sq": total_sq}
+                for (qid, option), (count, total, total_sq) in merged.items()
+            ])
+
+    label = func.coalesce(Response.platform, UNKNOWN_PLATFORM)
+    platform_rows = (
+        db.session.query(label, func.count(Response.id))
+        .filter(Response.survey_id == survey_id)
+        .group_by(label)
+        .all()
+    )
+    merged_platforms = {}
+    for platform, count in platform_rows:
+        key = platform[:OPTION_MAX_LEN]
+        merged_platforms[key] = merged_platforms.get(key, 0) + count
+    if merged_platforms:
+        db.session.execute(PlatformTally.__table__.insert(), [
+            {"survey_id": survey_id, "platform": platform, "count": count}
+            for platform, count in merged_platforms.items()
+        ])
+
+
+def rebuild_tallies(survey_id=None):
+    """
+    Recompute tallies from the answers table (backfill / repair).
+    :param survey_id: survey to rebuild, or None for every survey
+    :return: number of surveys rebuilt
+    """
+    if survey_id is not None:
+        survey_ids = [survey_id]
+    else:
+        survey_ids = [sid for (sid,) in db.session.query(Survey.id).order_by(Survey.id)]
+    for sid in survey_ids:
+        _rebuild_survey(sid)
+        db.session.commit()
+    return len(survey_ids)
@@ -0,0 +1,135 @@
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.utils import secure_filename
+from .models import db, Answer
+from app.blueprints.survey.storage import get_storage, file_digest, acquire, register
+
+PENDING_PREFIX = "pending:"
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_pending(file_path):
+    return bool(file_path) and file_path.startswith(PENDING_PREFIX)
+
+
+def staged_path(ref):
+    """
+    Local path of a staged upload from its pending reference.
+    """
+    name = ref[len(PENDING_PREFIX):]
+    return os.path.join(current_app.config["UPLOAD_STAGING_DIR"], os.path.basename(name))
+
+
+def stage_upload(file):
+    """
+    Save an uploaded file to the local staging directory.
+    :param file: FileStorage object (from request.files)
+    :return: pending reference to store in Answer.file_path
+    """
+    staging_dir = current_app.config["UPLOAD_STAGING_DIR"]
+    os.makedirs(staging_dir, exist_ok=True)
+    _, ext = os.path.splitext(secure_filename(file.filename or ""))
+    # keep the hash computed while streaming so the worker need not re-read the file
+    digest = getattr(file.stream, "sha256", None)
+    if digest:
+        name = f"{digest}-{uuid.uuid4().hex[:8]}{ext.lower()}"
+    else:
+        name = f"{uuid.uuid4().hex}{ext.lower()}"
+    destination = os.path.join(staging_dir, name)
+    if hasattr(file.stream, "claim"):
+        # already streamed to the staging directory by SurveyRequest
+        file.stream.claim(destination)
+    else:
+        file.save(destination)
+    return PENDING_PREFIX + name
+
+
+def discard_staged(refs):
+    """
+    Remove staged uploads that will never be committed.
+    :param refs: pending references returned by stage_upload
+    """
+    for ref in refs:
+        try:
+            os.remove(staged_path(ref))
+        except FileNotFoundError:
+            pass
+
+
+class UploadWorker:
+    """
+    Background pool that moves staged uploads to the storage backend and
+    swaps the final URL into Answer.file_path, retrying with exponential
+    backoff. Content already stored (same SHA-256) is not uploaded again.
+    With UPLOAD_WORKERS=0 uploads run inline after commit.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+
+    def init_app(self, app):
+        self.app = app
+        workers = app.config["UPLOAD_WORKERS"]
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        app.extensions["upload_worker"] = self
+
+    def enqueue(self, response_id, question_id, ref):
+        if self.executor is None:
+            self._run(response_id, question_id, ref)
+        else:
+            self.executor.submit(self._run, response_id, question_id, ref)
+
+    def _run(self, response_id, question_id, ref):
+        with self.app.app_context():
+            try:
+                self.process(response_id, question_id, ref)
+            finally:
+                db.session.remove()
+
+    def process(self, response_id, question_id, ref):
+        """
+        Upload one staged file. Must run inside an app context.
+        :return: final URL or None if every attempt failed
+        """
+        path = staged_path(ref)
+        if not os.path.exists(path):
+            print(f"Staged upload missing: {ref}")
+            return None
+
+        name = os.path.basename(path)
+        _, ext = os.path.splitext(name)
+        digest = name.split("-", 1)[0]
+        if not SHA256_HEX.match(digest):
+            digest = file_digest(path)
+
+        # identical content already stored: just take another reference
+        url = acquire(digest)
+        if url is None:
+            retries = self.app.config["UPLOAD_MAX_RETRIES"]
+            backoff = self.app.config["UPLOAD_RETRY_BACKOFF"]
+            storage = get_storage()
+            for attempt in range(retries):
+                url = storage.store(path, digest, ext)
+                if url or attempt == retries - 1:
+                    break
+                time.sleep(backoff * (2 ** attempt))
+            if not url:
+                print(f"Giving up on upload {ref} after {retries} attempts")
+                return None
+            url = register(digest, os.path.getsize(path), ext, url, storage.name)
+
+        Answer.query.filter_by(
+            response_id=response_id, question_id=question_id, file_path=ref
+        ).update({"file_path": url}, synchronize_session=False)
+        db.session.commit()
+        os.remove(path)
+        return url
+
+
+upload_worker = UploadWorker()
@@ -1,4 +1,5 @@
 import cloudinary.uploader
+from app.blueprints.instrumentation import track_external
 
 def upload_to_cloudinary(file, folder="uploads"):
     """
@@ -8,12 +9,14 @@ def upload_to_cloudinary(file, folder="uploads"):
     :return: URL string or None if failed
     """
     try:
-        result = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            resource_type="auto"  # auto detects images, pdfs, videos etc.
-        )
+        with track_external("cloudinary"):
+            result = cloudinary.uploader.upload(
+                file,
+                folder=folder,
+                resource_type="auto"  # auto detects images, pdfs, videos etc.
+            )
         return result.get("secure_url")
     except Exception as e:
         print(f"Cloudinary upload failed: {e}")
         return None
+
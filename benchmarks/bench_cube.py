@@ -0,0 +1,100 @@
+"""
+Analytics cube benchmark: builds a SurveyCube from synthetic answers
+(no database) and times group-by and cross-tab operations over it.
+
+    python -m benchmarks.bench_cube --responses 100000
+
+Every response answers every question, so answers = responses x 8.
+"""
+import argparse
+import random
+import time
+
+from app.blueprints.survey.schema import CompiledSurvey, CompiledQuestion
+
+QUESTIONS = (
+    ("Multiple Choice", ("A", "B", "C", "D")),
+    ("Multiple Choice", ("Yes", "No")),
+    ("Checkboxes", ("X", "Y", "Z", "W")),
+    ("Rating (1–5)", ()),
+    ("Rating (1–5)", ()),
+    ("Slider/Range", ()),
+    ("Date Picker", ()),
+    ("Multiple Choice", tuple(f"opt{i}" for i in range(12))),
+)
+PLATFORMS = ("WhatsApp", "Facebook", "Twitter", "LinkedIn", None)
+
+
+def synthetic_survey():
+    return CompiledSurvey(
+        id=1, title="Benchmark", description="", publish=True, user_id=1, updated_at=None,
+        questions=tuple(
+            CompiledQuestion(
+                id=i + 1, text=f"Q{i + 1}", qtype=qtype, required=False,
+                options=options, option_ids=tuple(range(100 * (i + 1), 100 * (i + 1) + len(options))),
+                max_size_mb=None, field_name=f"q{i + 1}"
+            )
+            for i, (qtype, options) in enumerate(QUESTIONS)
+        )
+    )
+
+
+def synthetic_rows(survey, responses, seed=7):
+    rng = random.Random(seed)
+    response_rows = [(rid, rng.choice(PLATFORMS)) for rid in range(1, responses + 1)]
+    answers, selections = [], []
+    for rid in range(1, responses + 1):
+        for q in survey.questions:
+            if q.qtype == "Rating (1–5)":
+                answers.append((rid, q.id, None, float(rng.randint(1, 5))))
+            elif q.qtype == "Slider/Range":
+                answers.append((rid, q.id, None, float(rng.randint(0, 100))))
+            elif q.qtype == "Checkboxes":
+                chosen = rng.sample(q.options, rng.randint(1, 3))
+                answers.append((rid, q.id, ",".join(chosen), None))
+                selections.extend((rid, q.id, q.option_id(opt)) for opt in chosen)
+            elif q.qtype == "Date Picker":
+                answers.append((rid, q.id, f"2025-01-{rng.randint(1, 28):02d}", None))
+            else:
+                answers.append((rid, q.id, rng.choice(q.options), None))
+    return response_rows, answers, selections
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    from app.blueprints.survey.cube import SurveyCube
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--responses", type=int, default=125000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    survey = synthetic_survey()
+    response_rows, answers, selections = synthetic_rows(survey, args.responses)
+    start = time.perf_counter()
+    cube = SurveyCube.from_rows(survey, response_rows, answers, selections)
+    build = time.perf_counter() - start
+
+    cases = (
+        ("group by platform", lambda: cube.group_by("platform")),
+        ("rating by platform", lambda: cube.crosstab(4, "platform")),
+        ("choice A vs choice B", lambda: cube.crosstab(1, 2)),
+        ("choice x platform, mean slider", lambda: cube.crosstab(8, "platform", measure=6)),
+        ("checkboxes x choice", lambda: cube.crosstab(3, 1)),
+        ("filtered crosstab", lambda: cube.crosstab(1, 4, filters={"platform": ["WhatsApp"], 3: ["X"]})),
+    )
+    print(f"{len(cube)} responses, {len(answers)} answers, cube built in {build:.2f}s")
+    for name, fn in cases:
+        print(f"  {name:<32} {timed(fn, args.repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
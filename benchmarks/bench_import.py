@@ -0,0 +1,97 @@
+"""
+Survey provisioning benchmark: the previous per-survey ORM save (one
+Survey flush, one Question and QuestionOption object per row, a commit per
+survey, as N calls to /survey/save would do) against the batched path in
+app.blueprints.survey.provision (one transaction, one executemany INSERT
+per table).
+
+    python -m benchmarks.bench_import --surveys 500 --questions 20
+
+Uses a throwaway SQLite file unless --database is given.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_submit import make_app
+
+QUESTION_TYPES = ("Multiple Choice", "Checkboxes", "Rating (1–5)", "Slider/Range", "Date Picker", "Text Response")
+
+
+def make_items(surveys, questions):
+    qtypes = [QUESTION_TYPES[i % len(QUESTION_TYPES)] for i in range(questions)]
+    return [{
+        "info": {"title": f"Cohort {s}", "description": "Provisioned survey", "publish": True},
+        "questions": [{
+            "text": f"Q{i}",
+            "type": qtype,
+            "allowed_types": ["A", "B", "C", "D"] if qtype in ("Multiple Choice", "Checkboxes") else []
+        } for i, qtype in enumerate(qtypes)]
+    } for s in range(surveys)]
+
+
+def legacy_import(items, user_id):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.models import Survey, Question, QuestionOption
+    from app.blueprints.survey.provision import validate_survey
+
+    for item in items:
+        spec = validate_survey(item)
+        survey = Survey(title=spec["title"], description=spec["description"], publish=spec["publish"], user_id=user_id)
+        db.session.add(survey)
+        db.session.flush()
+        for q in spec["questions"]:
+            db.session.add(Question(
+                survey_id=survey.id, text=q["text"], qtype=q["qtype"], required=q["required"],
+                max_size_mb=q["max_size_mb"],
+                options=[QuestionOption(position=p, value=v) for p, v in enumerate(q["options"])]
+            ))
+        db.session.commit()
+
+
+def bulk_import(items, user_id):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.provision import import_surveys
+
+    import_surveys(items, user_id)
+    db.session.commit()
+
+
+def measure(app, importer, items):
+    from app.blueprints.extensions import db
+    from app.blueprints.people.models import User
+
+    with app.app_context():
+        user = User(username="bench", email=f"bench-{time.time_ns()}@example.com", password="x")
+        db.session.add(user)
+        db.session.commit()
+        start = time.perf_counter()
+        importer(items, user.uid)
+        elapsed = time.perf_counter() - start
+        db.session.remove()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--surveys", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--database", help="Database URI to run against (default: a throwaway SQLite file).")
+    args = parser.parse_args()
+
+    items = make_items(args.surveys, args.questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = args.database or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = make_app(uri)
+        results = {name: measure(app, importer, items)
+                   for name, importer in (("orm-per-survey", legacy_import), ("bulk-import", bulk_import))}
+
+    print(f"{args.surveys} surveys x {args.questions} questions")
+    for name, elapsed in results.items():
+        print(f"  {name:<16} {elapsed:8.2f} s  {args.surveys / elapsed:8.1f} surveys/s")
+    print(f"  speedup          {results['orm-per-survey'] / results['bulk-import']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
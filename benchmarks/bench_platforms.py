@@ -0,0 +1,107 @@
+"""
+Platform detection micro-benchmark: the previous chain of substring checks
+against the table-driven classifier, uncached and memoized, over a corpus
+of real User-Agent strings.
+
+    python -m benchmarks.bench_platforms --iterations 200000
+"""
+import argparse
+import random
+import time
+
+from app.blueprints.survey.platforms import PlatformClassifier, DEFAULT_RULES_PATH, referrer_host
+
+# (User-Agent, referrer)
+CORPUS = [
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 [FBAN/FBIOS;FBAV/468.0.0.36.108;FBBV/612345678;FBDV/iPhone15,2;FBMD/iPhone;FBSN/iOS;FBSV/17.5;FBSS/3;FBID/phone;FBLC/en_US;FBOP/5]", None),
+    ("Mozilla/5.0 (Linux; Android 14; SM-S918B Build/UP1A.231005.007; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/125.0.6422.165 Mobile Safari/537.36 [FB_IAB/FB4A;FBAV/467.0.0.49.68;]", "https://m.facebook.com/"),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_4_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Instagram 330.0.3.12.235 (iPhone14,5; iOS 17_4_1; en_US; en; scale=3.00; 1170x2532; 598770523)", None),
+    ("Mozilla/5.0 (Linux; Android 13; Pixel 7 Build/TQ3A.230901.001; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/124.0.6367.179 Mobile Safari/537.36 Instagram 329.0.0.41.93 Android (33/13; 420dpi; 1080x2400; Google/google; Pixel 7; panther; panther; en_US; 590453456)", None),
+    ("WhatsApp/2.24.10.79 A", None),
+    ("Mozilla/5.0 (Linux; Android 12; SM-A525F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36", "https://web.whatsapp.com/"),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 LinkedInApp/9.29.6937", None),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36", "https://www.linkedin.com/feed/"),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Twitter for iPhone/10.44", None),
+    ("Mozilla/5.0 (Linux; Android 14; SM-G998B Build/UP1A.231005.007; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/125.0.6422.147 Mobile Safari/537.36 trill_350402 JsSdk/1.0 NetType/WIFI Channel/googleplay AppName/musical_ly app_version/35.4.2 ByteLocale/en ByteFullLocale/en Region/US BytedanceWebview/d8a21c6", None),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Snapchat/12.85.0.40 (like Safari/8617.2.4.10.8, panda)", None),
+    ("Mozilla/5.0 (Linux; Android 13; M2101K6G) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.6367.113 Mobile Safari/537.36 Telegram-Android/10.12.0 (Xiaomi M2101K6G; Android 13; SDK 33; AVERAGE)", None),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1", "https://t.me/"),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/125.0.6422.80 Mobile/15E148 Safari/604.1", None),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36 Edg/125.0.2535.67", None),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:126.0) Gecko/20100101 Firefox/126.0", None),
+    ("Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0", "https://www.google.com/"),
+    ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36", None),
+    ("Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Mobile Safari/537.36", None),
+    ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.1.15", None),
+    ("Mozilla/5.0 (iPad; CPU OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1", None),
+    ("Mozilla/5.0 (iPhone; CPU iPhone OS 15_8 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148", None),
+    ("Mozilla/5.0 (Linux; U; Android 4.4.2; en-us; GT-I9505 Build/KOT49H) AppleWebKit/534.30 (KHTML, like Gecko) Version/4.0 Mobile", None),
+    ("curl/8.6.0", None),
+    ("python-requests/2.32.3", None),
+]
+
+
+def legacy_parse(ua, ref=""):
+    ua = (ua or "").lower()
+    ref = (ref or "").lower()
+    if "fbav" in ua or "fban" in ua or "facebook" in ua or "m.facebook" in ref:
+        return "Facebook"
+    if "whatsapp" in ua or "whatsapp" in ref:
+        return "WhatsApp"
+    if "instagram" in ua or "instagram" in ref:
+        return "Instagram"
+    if "linkedin" in ua or "linkedin" in ref:
+        return "LinkedIn"
+    if "twitter" in ua or "x-ios" in ua or "tweet" in ref:
+        return "Twitter"
+    if "crios" in ua:
+        return "Chrome (iOS)"
+    if "edg" in ua or "edge" in ua:
+        return "Edge"
+    if "firefox" in ua:
+        return "Firefox"
+    if "chrome" in ua:
+        return "Chrome"
+    if "safari" in ua:
+        return "Safari"
+    if "iphone" in ua or "ipad" in ua:
+        return "iOS Browser"
+    if "android" in ua:
+        return "Android Browser"
+    return "Unknown"
+
+
+def run(fn, workload):
+    start = time.perf_counter()
+    for ua, ref in workload:
+        fn(ua, ref)
+    return (time.perf_counter() - start) / len(workload) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    classifier = PlatformClassifier.from_file(DEFAULT_RULES_PATH)
+    rng = random.Random(3)
+    workload = [rng.choice(CORPUS) for _ in range(args.iterations)]
+
+    def uncached(ua, ref):
+        return classifier._classify(ua or "", referrer_host(ref))
+
+    print(f"{len(CORPUS)} distinct User-Agents, {args.iterations} lookups")
+    for name, fn in (("legacy substring chain", legacy_parse),
+                     ("classifier, uncached", uncached),
+                     ("classifier, memoized", classifier.detect)):
+        print(f"  {name:<24} {run(fn, workload):8.0f} ns/lookup")
+
+    changed = [(ua[:60], legacy_parse(ua, ref), classifier.detect(ua, ref))
+               for ua, ref in CORPUS if legacy_parse(ua, ref) != classifier.detect(ua, ref)]
+    print(f"  {len(changed)} corpus entries classified differently (new rules):")
+    for ua, old, new in changed:
+        print(f"    {old:>16} -> {new:<10} {ua}")
+
+
+if __name__ == "__main__":
+    main()
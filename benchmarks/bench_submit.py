@@ -0,0 +1,145 @@
+"""
+Submission write-path benchmark: the previous per-answer ORM writes
+(Response flushed twice, one Answer object per question) against the bulk
+path in app.blueprints.survey.ingest (one flush, one executemany INSERT).
+
+    python -m benchmarks.bench_submit --questions 50 --submissions 500
+
+Uses a throwaway SQLite file unless --database is given.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def make_app(database_uri):
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("MAIL_PORT", "25")
+    os.environ["DATABASE_URI"] = database_uri
+    from app.blueprints.app import create_app
+    from app.blueprints.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_survey(num_questions):
+    from app.blueprints.extensions import db
+    from app.blueprints.people.models import User
+    from app.blueprints.survey.models import Survey, Question, QuestionOption
+
+    user = User(username="bench", email=f"bench-{time.time_ns()}@example.com", password="x")
+    db.session.add(user)
+    db.session.flush()
+    survey = Survey(title="Benchmark", description="", publish=True, user_id=user.uid)
+    db.session.add(survey)
+    db.session.flush()
+    qtypes = ["Text Response", "Multiple Choice", "Rating (1–5)", "Slider/Range", "Checkboxes", "Date Picker"]
+    for i in range(num_questions):
+        qtype = qtypes[i % len(qtypes)]
+        options = [QuestionOption(position=p, value=v) for p, v in enumerate("ABC")] \
+            if qtype in ("Multiple Choice", "Checkboxes") else []
+        db.session.add(Question(survey_id=survey.id, text=f"Q{i}", qtype=qtype, options=options))
+    db.session.commit()
+    return survey.id
+
+
+def build_rows(survey, seq):
+    """
+    Answer rows and tally increments equivalent to a parsed submission.
+    """
+    from app.blueprints.survey.tallies import tally_answer
+
+    answers, increments = [], []
+    for q in survey.questions:
+        data = {"answer_text": None, "answer_number": None, "file_path": None, "option_ids": []}
+        selected = None
+        if q.qtype == "Rating (1–5)":
+            data["answer_number"] = seq % 5 + 1
+        elif q.qtype == "Slider/Range":
+            data["answer_number"] = float(seq % 101)
+        elif q.qtype == "Multiple Choice":
+            data["answer_text"] = "ABC"[seq % 3]
+            data["option_ids"] = [q.option_id(data["answer_text"])]
+        elif q.qtype == "Checkboxes":
+            selected = ["A", "C"][: seq % 2 + 1]
+            data["answer_text"] = ",".join(selected)
+            data["option_ids"] = [q.option_id(value) for value in selected]
+        elif q.qtype == "Date Picker":
+            data["answer_text"] = f"2025-01-{seq % 28 + 1:02d}"
+        else:
+            data["answer_text"] = f"answer {seq}"
+        answers.append(dict(data, question_id=q.id))
+        increments.extend(tally_answer(q, data, selected))
+    return answers, increments
+
+
+def legacy_save(survey_id, answers, increments):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.models import Answer, AnswerSelection, Response
+    from app.blueprints.survey.tallies import apply_tallies
+
+    new_response = Response(survey_id=survey_id, user_id=None, platform="Benchmark")
+    db.session.add(new_response)
+    db.session.flush()
+    db.session.add(new_response)
+    db.session.flush()
+    for row in answers:
+        row = dict(row)
+        for option_id in row.pop("option_ids"):
+            db.session.add(AnswerSelection(response_id=new_response.id, question_id=row["question_id"], option_id=option_id))
+        db.session.add(Answer(response_id=new_response.id, **row))
+    apply_tallies(survey_id, "Benchmark", increments)
+    db.session.commit()
+
+
+def bulk_save(survey_id, answers, increments):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.ingest import save_submission
+
+    save_submission(survey_id, None, "Benchmark", answers, increments)
+    db.session.commit()
+
+
+def measure(app, survey_id, writer, submissions):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.schema import get_compiled_survey
+
+    with app.app_context():
+        survey = get_compiled_survey(survey_id)
+        payloads = [build_rows(survey, seq) for seq in range(submissions)]
+        start = time.perf_counter()
+        for answers, increments in payloads:
+            writer(survey_id, answers, increments)
+        elapsed = time.perf_counter() - start
+        db.session.remove()
+    return submissions / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--database", help="Database URI to run against (default: a throwaway SQLite file).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = args.database or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = make_app(uri)
+        results = {}
+        for name, writer in (("orm-per-answer", legacy_save), ("bulk-executemany", bulk_save)):
+            with app.app_context():
+                survey_id = seed_survey(args.questions)
+            results[name] = measure(app, survey_id, writer, args.submissions)
+
+    print(f"{args.questions} questions x {args.submissions} submissions")
+    for name, rate in results.items():
+        print(f"  {name:<18} {rate:8.1f} submissions/s")
+    print(f"  speedup            {results['bulk-executemany'] / results['orm-per-answer']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
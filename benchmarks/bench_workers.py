@@ -0,0 +1,193 @@
+"""
+Gunicorn worker benchmark: concurrent submission throughput of the sync
+preset against the gevent preset (gunicorn.conf.py), served by real
+gunicorn processes on a seeded database.
+
+    python -m benchmarks.bench_workers --workers 2 --concurrency 32 --streams 4
+    DATABASE_URI=postgresql://... python -m benchmarks.bench_workers --db-latency-ms 2
+
+Each preset runs twice: plain, then with ``--streams`` /live result
+streams held open, as owners watching a survey would. A sync worker
+serves nothing else while it streams. ``--db-latency-ms`` puts a TCP
+proxy that delays every packet in front of a networked database
+(PostgreSQL), standing in for a database on another host. It does not
+apply to SQLite.
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from sqlalchemy.engine import make_url
+
+from benchmarks.loadtest import HTTPSession, Worker, local_app, login, run_scenario
+from benchmarks.seed import seed_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("submit_survey", "respond")
+
+
+class LatencyProxy:
+    """
+    TCP proxy adding ``delay`` seconds to every chunk in both directions.
+    """
+
+    def __init__(self, host, port, delay):
+        self.target = (host, port)
+        self.delay = delay
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            upstream = socket.create_connection(self.target)
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pipe, args=(src, dst), daemon=True).start()
+
+    def _pipe(self, src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                time.sleep(self.delay)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (src, dst):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(preset, workers, database_uri):
+    """
+    Start gunicorn with a preset and wait until it accepts requests.
+    :return: (process, base URL)
+    """
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRESET=preset, WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}", DATABASE_URI=database_uri)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "run:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"gunicorn ({preset}) exited:\n{process.stderr.read().decode()}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/auth/login")
+            conn.getresponse().read()
+            conn.close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    sys.exit(f"gunicorn ({preset}) did not start")
+
+
+def open_streams(base_url, manifest, count):
+    """
+    Hold ``count`` /live streams open, each logged in as a survey's owner.
+    :return: the open connections
+    """
+    parts = urlsplit(base_url)
+    streams = []
+
+    def connect(survey):
+        owner = next(u for u in manifest["users"] if u["uid"] == survey["owner"])
+        session = HTTPSession(base_url)
+        login(session, owner["email"], manifest["password"])
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+        cookie = "; ".join(f"{k}={v}" for k, v in session.cookies.items())
+        conn.request("GET", f"/survey/{survey['id']}/live", headers={"Cookie": cookie})
+        response = conn.getresponse()
+        response.readline()
+        session.close()
+        streams.append(conn)
+
+    # connect in the background: with sync workers a stream holds its worker
+    for i in range(count):
+        threading.Thread(target=connect, args=(manifest["surveys"][i % len(manifest["surveys"])],), daemon=True).start()
+    time.sleep(2)
+    return streams
+
+
+def measure(base_url, manifest, args, streams):
+    rng = random.Random(args.seed)
+    workers = [
+        Worker(lambda: HTTPSession(base_url), manifest, manifest["users"][i % len(manifest["users"])],
+               random.Random(rng.random()))
+        for i in range(args.concurrency)
+    ]
+    # opened after the clients log in, so any stall they cause is measured
+    open_conns = open_streams(base_url, manifest, streams) if streams else []
+    try:
+        results = {scenario: run_scenario(scenario, workers, args.requests, args.warmup) for scenario in SCENARIOS}
+    finally:
+        for conn in open_conns:
+            conn.close()
+        for worker in workers:
+            worker.session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--presets", nargs="+", default=["sync", "gevent"], choices=("sync", "gthread", "gevent"))
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn worker processes.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients.")
+    parser.add_argument("--streams", type=int, default=4, help="/live streams held open in the second run.")
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = local_app(tmp)
+        os.environ["INSTRUMENTATION_ENABLED"] = "false"
+        manifest = seed_dataset(app, 8, 2, 12, 100, seed=args.seed)
+        database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        if args.db_latency_ms:
+            url = make_url(database_uri)
+            if url.get_backend_name() == "sqlite":
+                sys.exit("--db-latency-ms needs a networked database (DATABASE_URI)")
+            proxy = LatencyProxy(url.host or "127.0.0.1", url.port or 5432, args.db_latency_ms / 1000)
+            database_uri = url.set(host="127.0.0.1", port=proxy.port).render_as_string(hide_password=False)
+
+        print(f"{args.workers} workers, {args.concurrency} clients, db latency {args.db_latency_ms} ms")
+        for preset in args.presets:
+            process, base_url = start_server(preset, args.workers, database_uri)
+            try:
+                for streams in sorted({0, args.streams}):
+                    results = measure(base_url, manifest, args, streams)
+                    for scenario, r in results.items():
+                        print(f"  {preset:<8} {streams:>2} streams  {scenario:<14} {r['throughput_rps']:8.1f} req/s"
+                              f"  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f} ms  {r['errors']} errors")
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
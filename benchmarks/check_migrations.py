@@ -0,0 +1,127 @@
+"""
+Data-migration check for b5f1e3a7c290 (question options and choice
+selections moved into their own tables): builds a database at the
+previous revision with legacy allowed_types and comma-joined choice
+answers, including options that contain commas, upgrades it and verifies
+the option and selection rows, then downgrades and verifies the legacy
+column is restored (and that options too long for it stop the downgrade).
+
+    python -m benchmarks.check_migrations
+
+Uses a throwaway SQLite file. Exits non-zero if any check fails.
+"""
+import json
+import os
+import sys
+import tempfile
+
+from sqlalchemy import text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BEFORE = "e71b4c92a0d5"
+REVISION = "b5f1e3a7c290"
+
+QUESTIONS = [
+    # id, qtype, allowed_types
+    (1, "Multiple Choice", json.dumps(["A", "B, with comma", "C"])),
+    (2, "Checkboxes", json.dumps(["A", "B, C", "D"])),
+    (3, "Checkboxes", "X, Y, Z"),
+    (4, "Text Response", None),
+]
+ANSWERS = [
+    # response_id, question_id, answer_text, expected option values
+    (1, 1, "B, with comma", ["B, with comma"]),
+    (1, 2, "A,B, C", ["A", "B, C"]),
+    (1, 3, "X,Z", ["X", "Z"]),
+    (2, 1, "Gone", []),
+    (2, 2, "B, C,D", ["B, C", "D"]),
+    (2, 3, "Y", ["Y"]),
+    (3, 2, "A,Removed,D", ["A", "D"]),
+    (3, 4, "free text", []),
+]
+
+
+def main():
+    from flask_migrate import upgrade, downgrade
+
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    directory = os.path.join(ROOT, "migrations")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("SECRET_KEY", "bench")
+        os.environ.setdefault("MAIL_PORT", "25")
+        os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'migrate.db')}"
+        from app.blueprints.app import create_app
+        from app.blueprints.extensions import db
+
+        app = create_app()
+        with app.app_context():
+            upgrade(directory=directory, revision=BEFORE)
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO users (uid, username, email, password) VALUES (1, 'u', 'u@x', 'p')"))
+                conn.execute(text("INSERT INTO surveys (id, title, publish, user_id, created_at, updated_at) "
+                                  "VALUES (1, 'T', 1, 1, '2025-01-01', '2025-01-01')"))
+                for qid, qtype, allowed in QUESTIONS:
+                    conn.execute(text("INSERT INTO questions (id, survey_id, text, qtype, required, allowed_types) "
+                                      "VALUES (:id, 1, 'Q', :qtype, 0, :allowed)"),
+                                 {"id": qid, "qtype": qtype, "allowed": allowed})
+                for rid in sorted({a[0] for a in ANSWERS}):
+                    conn.execute(text("INSERT INTO responses (id, survey_id, submitted_at) VALUES (:id, 1, '2025-01-01')"),
+                                 {"id": rid})
+                for i, (rid, qid, answer, _expected) in enumerate(ANSWERS, start=1):
+                    conn.execute(text("INSERT INTO answers (id, response_id, question_id, answer_text) "
+                                      "VALUES (:id, :rid, :qid, :answer)"),
+                                 {"id": i, "rid": rid, "qid": qid, "answer": answer})
+
+            print("upgrade")
+            upgrade(directory=directory, revision=REVISION)
+            with db.engine.connect() as conn:
+                options = {
+                    qid: [value for value, in conn.execute(text(
+                        "SELECT value FROM question_options WHERE question_id = :q ORDER BY position"), {"q": qid})]
+                    for qid, _qtype, _allowed in QUESTIONS
+                }
+                check("JSON options keep their commas", options[2] == ["A", "B, C", "D"])
+                check("comma-separated legacy options are split", options[3] == ["X", "Y", "Z"])
+                selected = {}
+                for rid, qid, value in conn.execute(text(
+                        "SELECT s.response_id, s.question_id, o.value FROM answer_selections s "
+                        "JOIN question_options o ON o.id = s.option_id ORDER BY o.position")):
+                    selected.setdefault((rid, qid), []).append(value)
+                for rid, qid, answer, expected in ANSWERS:
+                    check(f"answer {answer!r} links {expected}", selected.get((rid, qid), []) == expected)
+
+            print("downgrade")
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO question_options (question_id, position, value) "
+                                  "VALUES (1, 10, :value)"), {"value": "L" * 300})
+            try:
+                # Flask-Migrate logs the migration's error and exits
+                downgrade(directory=directory, revision=BEFORE)
+                stopped = False
+            except SystemExit:
+                stopped = True
+            with db.engine.connect() as conn:
+                columns = [row[1] for row in conn.execute(text("PRAGMA table_info(questions)"))]
+                revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+            check("options too long for allowed_types stop the downgrade",
+                  stopped and "allowed_types" not in columns and revision == REVISION)
+            with db.engine.begin() as conn:
+                conn.execute(text("DELETE FROM question_options WHERE position = 10"))
+            downgrade(directory=directory, revision=BEFORE)
+            with db.engine.connect() as conn:
+                restored = dict(conn.execute(text("SELECT id, allowed_types FROM questions")).all())
+                check("allowed_types restored", json.loads(restored[2]) == ["A", "B, C", "D"])
+            db.session.remove()
+            db.engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Query-plan regression check: seeds a dataset, drives the results,
+dashboard and summary pages (plus a tally rebuild) and asserts that every
+statement they issue reaches surveys, questions, responses, answers and
+the option/selection tables through an index rather than a full table scan,
+and that statements using an indexed expression are served by its index.
+
+    python -m benchmarks.check_query_plans --surveys 20 --submissions 200
+
+Exits non-zero and prints the offending plans on a regression. Uses a
+throwaway SQLite file unless --database is given; on PostgreSQL sequential
+scans are disabled for the check so the small seeded tables still show
+whether a usable index exists.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from sqlalchemy import event, text
+
+from benchmarks.bench_submit import make_app, seed_survey, build_rows
+
+CHECKED_TABLES = ("surveys", "questions", "question_options", "responses", "answers", "answer_selections")
+# SQLite: "SCAN answers" (no index); PostgreSQL: "Seq Scan on answers"
+SQLITE_FULL_SCAN = re.compile(r"\bSCAN (%s)\b(?! USING)" % "|".join(CHECKED_TABLES))
+POSTGRES_FULL_SCAN = re.compile(r"Seq Scan on (%s)\b" % "|".join(CHECKED_TABLES))
+# expression index -> the expression as queries render it; the planner only
+# uses the index for that exact expression
+EXPRESSION_INDEXES = {
+    "ix_answers_question_id_answer_text": "substr(answers.answer_text, 1, 255)",
+}
+
+
+def seed(app, surveys, submissions):
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.ingest import save_submission
+    from app.blueprints.survey.models import Survey
+    from app.blueprints.survey.schema import get_compiled_survey
+
+    platforms = ["WhatsApp", "Facebook", "Twitter", None]
+    survey_ids = []
+    with app.app_context():
+        for _ in range(surveys):
+            survey_id = seed_survey(12)
+            survey = get_compiled_survey(survey_id)
+            for seq in range(submissions):
+                answers, increments = build_rows(survey, seq)
+                save_submission(survey_id, None, platforms[seq % len(platforms)], answers, increments)
+            db.session.commit()
+            survey_ids.append(survey_id)
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+        owner = db.session.get(Survey, survey_ids[0]).user_id
+        db.session.remove()
+    return survey_ids[0], owner
+
+
+def capture(app, survey_id, owner):
+    """
+    Statements (with parameters) issued by the pages under test, by page.
+    """
+    from app.blueprints.extensions import db
+    from app.blueprints.survey.tallies import rebuild_tallies
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            captured.append((current[0], statement, parameters))
+
+    current = [None]
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(owner)
+        session["_fresh"] = True
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            pages = (
+                ("results", f"/survey/results/{survey_id}"),
+                ("results?platform", f"/survey/results/{survey_id}?platform=WhatsApp"),
+                ("dashboard", "/survey/dashboard"),
+                ("summary", f"/survey/{survey_id}/summary"),
+            )
+            for name, url in pages:
+                current[0] = name
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise SystemExit(f"{url} returned {response.status_code}")
+            current[0] = "rebuild-tallies"
+            rebuild_tallies(survey_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+    return captured
+
+
+def explain(app, statements):
+    from app.blueprints.extensions import db
+
+    failures = []
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        with db.engine.connect() as conn:
+            raw = conn.connection.driver_connection
+            cursor = raw.cursor()
+            if dialect == "postgresql":
+                cursor.execute("SET enable_seqscan = off")
+                prefix, full_scan = "EXPLAIN ", POSTGRES_FULL_SCAN
+            else:
+                prefix, full_scan = "EXPLAIN QUERY PLAN ", SQLITE_FULL_SCAN
+            for page, statement, parameters in statements:
+                cursor.execute(prefix + statement, parameters)
+                plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+                if full_scan.search(plan):
+                    failures.append((page, "full table scan", statement, plan))
+                for index, expression in EXPRESSION_INDEXES.items():
+                    if expression in statement and index not in plan:
+                        failures.append((page, f"{index} unused", statement, plan))
+            cursor.close()
+    for index, expression in EXPRESSION_INDEXES.items():
+        if not any(expression in statement for _, statement, _ in statements):
+            failures.append(("-", f"{index} not exercised by any page", expression, ""))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--surveys", type=int, default=20)
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--database", help="Database URI to run against (default: a throwaway SQLite file).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = args.database or f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        app = make_app(uri)
+        survey_id, owner = seed(app, args.surveys, args.submissions)
+        statements = capture(app, survey_id, owner)
+        failures = explain(app, statements)
+
+    for page, problem, statement, plan in failures:
+        print(f"[{page}] {problem}:\n{statement}\n--\n{plan}\n")
+    print(f"{len(statements)} statements checked, {len(failures)} problem(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Rate-limit policy parsing check: unit spellings, numeric periods and the
+errors raised for specs that cannot be parsed; plus the default of
+limiting only once the reverse proxy is trusted.
+
+    python -m benchmarks.check_ratelimit
+
+Exits non-zero if any check fails.
+"""
+import os
+import sys
+import tempfile
+
+from app.blueprints.ratelimit import Policy
+from benchmarks.bench_submit import make_app
+
+VALID = [
+    # spec, limit, period in seconds
+    ("10/s", 10, 1),
+    ("10/sec", 10, 1),
+    ("10/second", 10, 1),
+    ("10/seconds", 10, 1),
+    ("10/m", 10, 60),
+    ("10/min", 10, 60),
+    ("10/minute", 10, 60),
+    ("10/minutes", 10, 60),
+    ("5/h", 5, 3600),
+    ("5/hour", 5, 3600),
+    ("5/hours", 5, 3600),
+    ("100/d", 100, 86400),
+    ("100/day", 100, 86400),
+    ("3/ Minute ", 3, 60),
+    ("10/60", 10, 60),
+    ("10/0.5", 10, 0.5),
+    ("10", 10, 60),
+]
+INVALID = ["10/fortnight", "10/ss", "10/0", "10/-5", "ten/minute", "0/minute", "-1/minute"]
+
+
+def main():
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    print("valid specs")
+    for spec, limit, period in VALID:
+        policy = Policy.parse(spec)
+        check(f"{spec!r} -> {limit} per {period}s", (policy.limit, policy.period) == (limit, period))
+
+    print("invalid specs")
+    for spec in INVALID:
+        try:
+            Policy.parse(spec)
+        except ValueError:
+            check(f"{spec!r} raises ValueError", True)
+        else:
+            check(f"{spec!r} raises ValueError", False)
+
+    print("defaults")
+    os.environ.pop("RATELIMIT_ENABLED", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        for proxies, expected in (("0", False), ("1", True)):
+            os.environ["PROXY_FIX_X_FOR"] = proxies
+            app = make_app(f"sqlite:///{os.path.join(tmp, 'ratelimit.db')}")
+            state = "on" if expected else "off"
+            check(f"limiting is {state} with PROXY_FIX_X_FOR={proxies}", app.config["RATELIMIT_ENABLED"] is expected)
+        os.environ.pop("PROXY_FIX_X_FOR")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
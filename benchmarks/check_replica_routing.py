@@ -0,0 +1,110 @@
+"""
+Read-replica routing check against two local SQLite databases: a primary
+and a copy of it acting as the replica, whose lag is read from a
+one-row table. Verifies that read-only pages read from the replica, that
+writes and a client's reads right after its own write go to the primary,
+and that a lagging or unreachable replica falls back to the primary.
+
+    python -m benchmarks.check_replica_routing
+
+Exits non-zero if any check fails.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks.bench_submit import make_app, seed_survey
+
+REPLICA_TITLE = "Served by the replica"
+
+
+def set_lag(path, lag):
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE replica_lag SET lag = ?", (lag,))
+
+
+def login(app, uid):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(uid)
+        session["_fresh"] = True
+    return client
+
+
+def main():
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        primary_path, replica_path = os.path.join(tmp, "primary.db"), os.path.join(tmp, "replica.db")
+        os.environ["DATABASE_REPLICA_URIS"] = f"sqlite:///{replica_path}"
+        os.environ["DATABASE_REPLICA_LAG_QUERY"] = "SELECT lag FROM replica_lag"
+        os.environ["DATABASE_REPLICA_MAX_LAG"] = "5"
+        os.environ["DATABASE_REPLICA_CHECK_INTERVAL"] = "0"
+        os.environ["RATELIMIT_ENABLED"] = "false"
+        app = make_app(f"sqlite:///{primary_path}")
+        app.config["WTF_CSRF_ENABLED"] = False
+
+        from app.blueprints.extensions import db
+        from app.blueprints.survey.models import Survey
+
+        with app.app_context():
+            survey_id = seed_survey(6)
+            owner = db.session.get(Survey, survey_id).user_id
+            db.session.remove()
+        shutil.copyfile(primary_path, replica_path)
+        with sqlite3.connect(replica_path) as conn:
+            conn.execute("CREATE TABLE replica_lag (lag REAL)")
+            conn.execute("INSERT INTO replica_lag VALUES (0)")
+            conn.execute("UPDATE surveys SET title = ? WHERE id = ?", (REPLICA_TITLE, survey_id))
+
+        def dashboard_source(client):
+            body = client.get("/survey/dashboard").get_data(as_text=True)
+            return "replica" if REPLICA_TITLE in body else "primary"
+
+        reader = login(app, owner)
+        print("replica routing")
+        check("dashboard reads from a fresh replica", dashboard_source(reader) == "replica")
+        check("results page reads from a fresh replica",
+              REPLICA_TITLE in reader.get(f"/survey/results/{survey_id}").get_data(as_text=True))
+
+        writer = login(app, owner)
+        response = writer.post("/survey/save", json={
+            "info": {"title": "Written", "publish": True},
+            "questions": [{"text": "Why?", "type": "Text Response"}]
+        })
+        with app.app_context():
+            written = db.session.get(Survey, response.get_json()["survey_id"])
+            check("writes go to the primary", response.status_code == 201 and written is not None)
+        with sqlite3.connect(replica_path) as conn:
+            check("writes skip the replica", conn.execute("SELECT count(*) FROM surveys WHERE title = 'Written'").fetchone()[0] == 0)
+        check("a client reads its own write from the primary", dashboard_source(writer) == "primary")
+        check("other clients keep reading from the replica", dashboard_source(reader) == "replica")
+
+        set_lag(replica_path, 60)
+        check("a lagging replica falls back to the primary", dashboard_source(reader) == "primary")
+        set_lag(replica_path, 0)
+        check("a caught-up replica is used again", dashboard_source(reader) == "replica")
+
+        with sqlite3.connect(replica_path) as conn:
+            conn.execute("DROP TABLE replica_lag")
+        check("an unreachable replica falls back to the primary", dashboard_source(reader) == "primary")
+
+        from app.blueprints.database import replica_router
+        print(f"replica reads {replica_router.reads}, primary fallbacks {replica_router.fallbacks}")
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Input validation check: submissions and survey definitions the write
+paths must refuse are answered with a 400 (or a per-survey error for bulk
+imports) and leave the database untouched.
+
+    python -m benchmarks.check_validation
+
+Uses a throwaway SQLite file. Exits non-zero if any check fails.
+"""
+import os
+import sys
+import tempfile
+
+from benchmarks.bench_submit import make_app, seed_survey
+
+# name, question, whether it is valid
+QUESTIONS = [
+    ("a choice question", {"text": "Q", "type": "Multiple Choice", "allowed_types": ["A", "B"]}, True),
+    ("a 255-character option", {"text": "Q", "type": "Checkboxes", "allowed_types": ["A" * 255]}, True),
+    ("a 256-character option", {"text": "Q", "type": "Checkboxes", "allowed_types": ["A" * 256]}, False),
+    ("a question without a type", {"text": "Q"}, False),
+    ("an unknown type", {"text": "Q", "type": "Essay"}, False),
+    ("an over-long type", {"text": "Q", "type": "T" * 60}, False),
+]
+
+
+def main():
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["RATELIMIT_ENABLED"] = "false"
+        app = make_app(f"sqlite:///{os.path.join(tmp, 'validation.db')}")
+        app.config["WTF_CSRF_ENABLED"] = False
+
+        from app.blueprints.extensions import db
+        from app.blueprints.survey.models import Response, Survey
+        from app.blueprints.survey.schema import get_compiled_survey
+        from app.blueprints.survey.provision import validate_survey
+
+        with app.app_context():
+            survey_id = seed_survey(6)
+            slider = next(q for q in get_compiled_survey(survey_id).questions if q.qtype == "Slider/Range")
+            db.session.remove()
+        client = app.test_client()
+
+        def submit(value):
+            return client.post(f"/survey/submit/{survey_id}", data={slider.field_name: value}).status_code
+
+        print("slider values")
+        for value in ("nan", "NaN", "inf", "-inf", "Infinity", "1e999", "abc"):
+            check(f"{value!r} is rejected with 400", submit(value) == 400)
+        with app.app_context():
+            check("rejected submissions store nothing", Response.query.count() == 0)
+        check("a finite value is accepted", submit("42.5") == 200)
+
+        print("survey definitions")
+        with app.app_context():
+            for name, question, ok in QUESTIONS:
+                item = {"info": {"title": "Validation"}, "questions": [question]}
+                try:
+                    validate_survey(item)
+                    accepted = True
+                except ValueError:
+                    accepted = False
+                check(f"{name} is {'accepted' if ok else 'rejected'}", accepted is ok)
+
+        print("bulk import")
+        login = app.test_client()
+        with app.app_context():
+            owner = Survey.query.first().user_id
+            surveys = Survey.query.count()
+        with login.session_transaction() as session:
+            session["_user_id"] = str(owner)
+            session["_fresh"] = True
+        valid = {"info": {"title": "Fine"}, "questions": [{"text": "Q", "type": "Text Response"}]}
+        invalid = {"info": {"title": "Broken"}, "questions": [{"text": "Q", "type": "Essay"}]}
+        response = login.post("/survey/import", json={"surveys": [valid, invalid]})
+        errors = (response.get_json() or {}).get("errors", [])
+        check("a batch with an unknown type is answered with 400", response.status_code == 400)
+        check("the error names the failing survey", [e["index"] for e in errors] == [1])
+        with app.app_context():
+            check("nothing of the batch is written", Survey.query.count() == surveys)
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
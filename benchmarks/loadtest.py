@@ -0,0 +1,429 @@
+"""
+Load test of the survey app: drives respond, submit_survey, results,
+dashboard, fetch_questions and login against a seeded dataset and reports
+p50/p95/p99 latency, throughput and SQL statements per request.
+
+    python -m benchmarks.loadtest run --mode client --out before.json
+    python -m benchmarks.loadtest run --mode http --concurrency 16 --out after.json
+    python -m benchmarks.loadtest compare before.json after.json
+
+``--mode client`` calls the app in-process through the Flask test client;
+``--mode http`` starts a threaded local server and sends real HTTP
+requests from ``--concurrency`` keep-alive connections. With ``--url`` the
+HTTP load goes to an already running server instead, seeded beforehand
+with ``python -m benchmarks.seed`` (pass its manifest with ``--manifest``).
+
+Without --url, the app runs against a throwaway SQLite file (or
+--database) with local stand-ins: content-addressed local storage
+instead of Cloudinary and an in-process SMTP sink instead of a mail server.
+Query counts come from the Server-Timing header, so the server needs
+INSTRUMENTATION_ENABLED=true (set automatically for local runs).
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+SCENARIOS = ("respond", "submit_survey", "results", "dashboard", "fetch_questions", "login")
+CSRF_INPUT = re.compile(r'name="csrf_token"\s+value="([^"]+)"')
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class ClientSession:
+    """
+    One user agent calling the app in-process through the Flask test client.
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        body = response.get_data(as_text=True)
+        return response.status_code, response.headers.get("Server-Timing", ""), body
+
+
+class HTTPSession:
+    """
+    One user agent on a keep-alive HTTP connection, with its own cookies.
+    """
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+        self.cookies = {}
+
+    def request(self, method, path, form=None):
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())} if self.cookies else {}
+        body = None
+        if form is not None:
+            body = urlencode(form, doseq=True)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read().decode("utf-8", "replace")
+                break
+            except (http.client.HTTPException, OSError):
+                # the server closed an idle keep-alive connection
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all("Set-Cookie") or ():
+            name, _, rest = header.partition("=")
+            self.cookies[name.strip()] = rest.split(";", 1)[0]
+        if response.getheader("Connection", "").lower() == "close":
+            self.conn.close()
+            self.conn = None
+        return response.status, response.getheader("Server-Timing", ""), data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def csrf_token(session):
+    _status, _timing, body = session.request("GET", "/auth/login")
+    match = CSRF_INPUT.search(body)
+    return match.group(1) if match else ""
+
+
+def login(session, email, password):
+    form = {"email": email, "password": password, "csrf_token": csrf_token(session)}
+    return session.request("POST", "/auth/login", form)
+
+
+def submission_form(survey, rng):
+    form = {}
+    for q in survey["questions"]:
+        if q["type"] == "Multiple Choice":
+            form[q["field"]] = rng.choice(q["options"])
+        elif q["type"] == "Checkboxes":
+            form[q["field"]] = rng.sample(q["options"], rng.randint(1, len(q["options"])))
+        elif q["type"] == "Rating (1–5)":
+            form[q["field"]] = str(rng.randint(1, 5))
+        elif q["type"] == "Slider/Range":
+            form[q["field"]] = str(rng.randint(0, 100))
+        elif q["type"] == "Date Picker":
+            form[q["field"]] = f"2025-01-{rng.randint(1, 28):02d}"
+        elif q["type"] != "File Upload":
+            form[q["field"]] = f"load test answer {rng.randint(0, 10 ** 6)}"
+    return form
+
+
+class Worker:
+    """
+    A session bound to one seeded user; owner-only scenarios use that
+    user's surveys, public ones any survey.
+    """
+
+    def __init__(self, make_session, manifest, user, rng):
+        self.make_session = make_session
+        self.manifest = manifest
+        self.user = user
+        self.rng = rng
+        self.own_surveys = [s for s in manifest["surveys"] if s["owner"] == user["uid"]] or manifest["surveys"]
+        self.session = make_session()
+        login(self.session, user["email"], manifest["password"])
+        self.token = csrf_token(self.session)
+
+    def call(self, scenario):
+        """
+        Issue one request of ``scenario``.
+        :return: (status, Server-Timing header)
+        """
+        rng = self.rng
+        if scenario == "respond":
+            survey = rng.choice(self.manifest["surveys"])
+            return self.session.request("GET", f"/survey/respond/{survey['id']}")[:2]
+        if scenario == "submit_survey":
+            survey = rng.choice(self.manifest["surveys"])
+            form = dict(submission_form(survey, rng), csrf_token=self.token)
+            return self.session.request("POST", f"/survey/submit/{survey['id']}", form)[:2]
+        if scenario == "results":
+            return self.session.request("GET", f"/survey/results/{rng.choice(self.own_surveys)['id']}")[:2]
+        if scenario == "dashboard":
+            return self.session.request("GET", "/survey/dashboard")[:2]
+        if scenario == "fetch_questions":
+            return self.session.request("GET", f"/survey/fetch-questions?survey_id={rng.choice(self.own_surveys)['id']}")[:2]
+        if scenario == "login":
+            # a fresh visitor each time; fetching the form is not timed
+            session = self.make_session()
+            form = {"email": self.user["email"], "password": self.manifest["password"], "csrf_token": csrf_token(session)}
+            start = time.perf_counter()
+            status, timing, _body = session.request("POST", "/auth/login", form)
+            if hasattr(session, "close"):
+                session.close()
+            return status, timing, time.perf_counter() - start
+        raise ValueError(f"Unknown scenario {scenario}")
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_scenario(scenario, workers, requests, warmup):
+    """
+    Spread ``requests`` calls of one scenario over the workers' threads.
+    """
+    remaining = [warmup + requests]
+    lock = threading.Lock()
+    samples = []
+
+    def loop(worker):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                measured = remaining[0] < requests
+            start = time.perf_counter()
+            try:
+                status, timing, *elapsed = worker.call(scenario)
+            except Exception as e:
+                status, timing, elapsed = f"{type(e).__name__}", "", []
+            elapsed = elapsed[0] if elapsed else time.perf_counter() - start
+            if measured:
+                match = SERVER_TIMING_QUERIES.search(timing or "")
+                with lock:
+                    samples.append((elapsed, status, int(match.group(1)) if match else None))
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[2] for s in samples if s[2] is not None]
+    statuses = {}
+    for _elapsed, status, _queries in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for s in samples if not isinstance(s[1], int) or s[1] >= 400)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "statuses": statuses,
+        # warmup calls run at the same rate, so count them against the wall clock too
+        "throughput_rps": round((len(samples) + warmup) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def local_app(tmp, database=None):
+    """
+    The app configured against local stand-ins, with its files, spool and
+    broker under ``tmp`` and mail going to an in-process SMTP sink.
+    :param database: database URI; a SQLite file under ``tmp`` if not given
+    """
+    from app.blueprints.mailer import DebugSMTPServer
+
+    sink = DebugSMTPServer(("127.0.0.1", 0))
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    overrides = {
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(sink.server_address[1]),
+        "MAIL_USE_TLS": "false",
+        "FILE_STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(tmp, "files"),
+        "UPLOAD_STAGING_DIR": os.path.join(tmp, "staging"),
+        "SUBMISSION_SPOOL_DIR": os.path.join(tmp, "spool"),
+        "LIVE_BROKER_DIR": os.path.join(tmp, "live"),
+        "RATELIMIT_ENABLED": "false",
+        "INSTRUMENTATION_ENABLED": "true",
+        "CLOUDINARY_CLOUD_NAME": "",
+    }
+    os.environ.update(overrides)
+    from benchmarks.bench_submit import make_app
+
+    return make_app(database or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}")
+
+
+def serve(app):
+    """
+    Serve the app from a threaded server with HTTP/1.1 keep-alive.
+    :return: base URL
+    """
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(args):
+    from benchmarks.seed import seed_dataset
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            if not args.manifest:
+                sys.exit("--url needs --manifest from python -m benchmarks.seed")
+            with open(args.manifest) as fh:
+                manifest = json.load(fh)
+            database = "remote"
+        else:
+            app = local_app(tmp, args.database)
+            manifest = seed_dataset(app, args.users, args.surveys, args.questions, args.responses, seed=args.seed)
+            with app.app_context():
+                from app.blueprints.extensions import db
+                database = db.engine.dialect.name
+
+        if args.mode == "client":
+            if args.url:
+                sys.exit("--url only applies to --mode http")
+            make_session = lambda: ClientSession(app)
+        else:
+            base_url = args.url or serve(app)
+            make_session = lambda: HTTPSession(base_url)
+
+        rng = random.Random(args.seed)
+        workers = [
+            Worker(make_session, manifest, manifest["users"][i % len(manifest["users"])], random.Random(rng.random()))
+            for i in range(args.concurrency)
+        ]
+        results = {}
+        for scenario in args.scenarios:
+            results[scenario] = run_scenario(scenario, workers, args.requests, args.warmup)
+            r = results[scenario]
+            queries = "-" if r["queries_per_request"] is None else f"{r['queries_per_request']:.1f}"
+            print(f"  {scenario:<16} {r['throughput_rps']:9.1f} req/s  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}"
+                  f"  p99 {r['p99_ms']:8.2f} ms  {queries:>5} queries  {r['errors']} errors")
+        for worker in workers:
+            if hasattr(worker.session, "close"):
+                worker.session.close()
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "target": args.url or "local",
+            "database": database,
+            "python": platform.python_version(),
+            "params": {k: getattr(args, k) for k in ("users", "surveys", "questions", "responses",
+                                                     "requests", "warmup", "concurrency", "seed")},
+        },
+        "scenarios": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Results written to {args.out}")
+
+
+def compare(args):
+    """
+    Print per-scenario changes between two result files; exit 1 when p95
+    latency or throughput got worse by more than --threshold, or a
+    scenario issues more queries per request.
+    """
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+    print(f"baseline  {baseline['meta'].get('commit')}  {baseline['meta'].get('created')}")
+    print(f"candidate {candidate['meta'].get('commit')}  {candidate['meta'].get('created')}")
+    for key in ("mode", "target", "database", "params"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    def change(old, new):
+        return (new - old) / old if old else 0.0
+
+    regressions = []
+    for scenario, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(scenario)
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            cells.append(f"{key[:-3] if key.endswith('_ms') else 'rps'} {old[key]:.1f}->{new[key]:.1f} ({change(old[key], new[key]):+.0%})")
+        print(f"  {scenario:<16} " + "  ".join(cells))
+        if change(old["p95_ms"], new["p95_ms"]) > args.threshold:
+            regressions.append(f"{scenario}: p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms")
+        if change(old["throughput_rps"], new["throughput_rps"]) < -args.threshold:
+            regressions.append(f"{scenario}: throughput {old['throughput_rps']:.1f} -> {new['throughput_rps']:.1f} req/s")
+        if None not in (old["queries_per_request"], new["queries_per_request"]) and \
+                new["queries_per_request"] > old["queries_per_request"] + 0.5:
+            regressions.append(f"{scenario}: {old['queries_per_request']} -> {new['queries_per_request']} queries/request")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed (locally) and run the scenarios.")
+    run_parser.add_argument("--mode", choices=("client", "http"), default="client")
+    run_parser.add_argument("--url", help="Base URL of an already running server (http mode).")
+    run_parser.add_argument("--manifest", help="Manifest written by benchmarks.seed (with --url).")
+    run_parser.add_argument("--database", help="Database URI for a local run (default: a throwaway SQLite file).")
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument("--users", type=int, default=10)
+    run_parser.add_argument("--surveys", type=int, default=3, help="Surveys per user.")
+    run_parser.add_argument("--questions", type=int, default=12, help="Questions per survey.")
+    run_parser.add_argument("--responses", type=int, default=200, help="Responses per survey.")
+    run_parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario.")
+    run_parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario.")
+    run_parser.add_argument("--concurrency", type=int, default=1)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--out", help="Write results as JSON to this file.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown.")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
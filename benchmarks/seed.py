@@ -0,0 +1,107 @@
+"""
+Seed a database with a synthetic dataset for load tests and write a
+manifest (user credentials, survey ids, question fields) describing it.
+
+    DATABASE_URI=postgresql://... python -m benchmarks.seed \
+        --users 20 --surveys 5 --questions 12 --responses 200 --out manifest.json
+
+Works on SQLite and PostgreSQL; responses are written in batches through
+the same bulk path as spooled submissions. Every user gets the same
+password (hashed once), given in the manifest.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.bench_submit import make_app, build_rows
+
+PASSWORD = "bench-password"
+QUESTION_TYPES = ("Multiple Choice", "Checkboxes", "Rating (1–5)", "Slider/Range", "Date Picker", "Text Response")
+PLATFORMS = ("WhatsApp", "Facebook", "Twitter", "LinkedIn", "Chrome", None)
+BATCH = 500
+
+
+def seed_dataset(app, users, surveys, questions, responses, seed=1):
+    """
+    :param users: number of users
+    :param surveys: published surveys per user
+    :param questions: questions per survey
+    :param responses: responses per survey
+    :return: manifest dict
+    """
+    from werkzeug.security import generate_password_hash
+    from app.blueprints.extensions import db
+    from app.blueprints.people.models import User
+    from app.blueprints.survey.ingest import save_submissions
+    from app.blueprints.survey.models import Survey, Question, QuestionOption
+    from app.blueprints.survey.schema import get_compiled_survey
+
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256", salt_length=16)
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    start = datetime.now() - timedelta(days=30)
+    manifest = {"password": PASSWORD, "users": [], "surveys": []}
+
+    with app.app_context():
+        for u in range(users):
+            user = User(username=f"bench{u}", email=f"bench{u}-{stamp}@example.com", password=password_hash)
+            db.session.add(user)
+            db.session.flush()
+            manifest["users"].append({"uid": user.uid, "email": user.email})
+            for s in range(surveys):
+                survey = Survey(title=f"Load test {u}.{s}", description="Synthetic survey", publish=True, user_id=user.uid)
+                db.session.add(survey)
+                db.session.flush()
+                for i in range(questions):
+                    qtype = QUESTION_TYPES[i % len(QUESTION_TYPES)]
+                    options = [QuestionOption(position=p, value=v) for p, v in enumerate("ABC")] \
+                        if qtype in ("Multiple Choice", "Checkboxes") else []
+                    db.session.add(Question(survey_id=survey.id, text=f"Q{i}", qtype=qtype, options=options))
+                db.session.commit()
+                compiled = get_compiled_survey(survey.id)
+                manifest["surveys"].append({
+                    "id": survey.id,
+                    "owner": user.uid,
+                    "questions": [{"field": q.field_name, "type": q.qtype, "options": list(q.options)} for q in compiled.questions],
+                })
+                records = []
+                for seq in range(responses):
+                    answers, increments = build_rows(compiled, seq)
+                    records.append({
+                        "survey_id": survey.id, "user_id": None, "platform": rng.choice(PLATFORMS),
+                        "submitted_at": (start + timedelta(seconds=rng.randrange(30 * 86400))).isoformat(),
+                        "answers": answers, "increments": increments,
+                    })
+                    if len(records) >= BATCH:
+                        save_submissions(records)
+                        db.session.commit()
+                        records = []
+                if records:
+                    save_submissions(records)
+                    db.session.commit()
+        db.session.remove()
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--surveys", type=int, default=5, help="Surveys per user.")
+    parser.add_argument("--questions", type=int, default=12, help="Questions per survey.")
+    parser.add_argument("--responses", type=int, default=200, help="Responses per survey.")
+    parser.add_argument("--out", default="manifest.json")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URI"):
+        parser.error("DATABASE_URI must point at the database the server under test uses")
+    app = make_app(os.environ["DATABASE_URI"])
+    manifest = seed_dataset(app, args.users, args.surveys, args.questions, args.responses)
+    with open(args.out, "w") as fh:
+        json.dump(manifest, fh)
+    print(f"Seeded {len(manifest['users'])} users, {len(manifest['surveys'])} surveys; manifest in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
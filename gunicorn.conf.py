@@ -0,0 +1,59 @@
+"""
+Gunicorn settings, loaded automatically from the working directory:
+
+    gunicorn run:app                           # sync preset
+    GUNICORN_PRESET=gevent gunicorn run:app    # high-concurrency preset
+
+Presets:
+  sync     one request per process at a time. Any wait on the database,
+           SMTP or Cloudinary holds the whole process, and an open /live
+           stream holds it for as long as the stream stays open.
+  gthread  a few threads per process. Waits overlap without patching.
+  gevent   about a thousand greenlets per process. Sockets, psycopg2
+           queries (see database.make_psycopg_cooperative) and background
+           workers yield while they wait. Suited to many slow clients and
+           live streams.
+
+Any setting can still be changed with the variables below or on the
+command line.
+"""
+import multiprocessing
+import os
+
+cores = multiprocessing.cpu_count()
+
+PRESETS = {
+    "sync": {"worker_class": "sync", "workers": cores * 2 + 1, "threads": 1, "timeout": 30},
+    "gthread": {"worker_class": "gthread", "workers": cores + 1, "threads": 8, "timeout": 30},
+    "gevent": {"worker_class": "gevent", "workers": cores + 1, "worker_connections": 1000, "timeout": 60},
+}
+# connection pool per worker process to go with each preset. Size it so
+# that workers x (pool size + overflow) stays below the server's
+# max_connections.
+POOL_DEFAULTS = {
+    "gthread": {"DB_POOL_SIZE": "8", "DB_MAX_OVERFLOW": "4"},
+    "gevent": {"DB_POOL_SIZE": "10", "DB_MAX_OVERFLOW": "10"},
+}
+
+preset_name = os.getenv("GUNICORN_PRESET", "sync")
+if preset_name not in PRESETS:
+    raise RuntimeError(f"GUNICORN_PRESET must be one of {', '.join(PRESETS)}, not {preset_name!r}")
+preset = PRESETS[preset_name]
+# the app reads these when each worker creates it; explicit values win
+for name, value in POOL_DEFAULTS.get(preset_name, {}).items():
+    os.environ.setdefault(name, value)
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+worker_class = preset["worker_class"]
+workers = int(os.getenv("WEB_CONCURRENCY", preset["workers"]))
+threads = int(os.getenv("GUNICORN_THREADS", preset.get("threads", 1)))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", preset.get("worker_connections", 1000)))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", preset["timeout"]))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# The app starts mail, upload, spool and live-update threads when it is
+# created. Each worker must create its own app after the fork, and under
+# gevent after monkey-patching, so the app is never preloaded.
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+errorlog = "-"
@@ -0,0 +1,202 @@
+"""move question options into question_options and choice answers into answer_selections
+
+Revision ID: b5f1e3a7c290
+Revises: e71b4c92a0d5
+Create Date: 2026-10-18 21:10:43.118520
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f1e3a7c290'
+down_revision = 'e71b4c92a0d5'
+branch_labels = None
+depends_on = None
+
+CHOICE_TYPES = ('Multiple Choice', 'Checkboxes', 'Multiple Selection')
+MULTI_SELECT_TYPES = ('Checkboxes', 'Multiple Selection')
+BATCH = 5000
+# width of the questions.allowed_types column this revision removes
+ALLOWED_TYPES_MAX_LEN = 255
+
+questions = sa.table(
+    'questions',
+    sa.column('id', sa.Integer),
+    sa.column('qtype', sa.String),
+    sa.column('allowed_types', sa.String),
+)
+question_options = sa.table(
+    'question_options',
+    sa.column('id', sa.Integer),
+    sa.column('question_id', sa.Integer),
+    sa.column('position', sa.Integer),
+    sa.column('value', sa.Text),
+)
+answers = sa.table(
+    'answers',
+    sa.column('response_id', sa.Integer),
+    sa.column('question_id', sa.Integer),
+    sa.column('answer_text', sa.Text),
+)
+answer_selections = sa.table(
+    'answer_selections',
+    sa.column('response_id', sa.Integer),
+    sa.column('option_id', sa.Integer),
+    sa.column('question_id', sa.Integer),
+)
+
+
+def parse_allowed_types(value):
+    # JSON list, or the legacy comma-separated form
+    if not value:
+        return []
+    try:
+        opts = json.loads(value)
+    except ValueError:
+        return [opt.strip() for opt in value.split(',') if opt.strip()]
+    if isinstance(opts, list):
+        return [str(opt) for opt in opts]
+    return [str(opts)]
+
+
+def chosen_options(text, multi, lookup):
+    """
+    Option ids named by a stored answer. A multi-select answer was stored
+    comma-joined, so the text is matched whole first; otherwise its comma
+    parts are matched against the known options, rejoining consecutive
+    parts (longest run first) so an option that itself contains commas is
+    found among the others.
+    :return: (option ids, whether every part matched an option)
+    """
+    if text in lookup:
+        return [lookup[text]], True
+    if not multi:
+        return [], False
+    stripped = {value.strip(): oid for value, oid in lookup.items()}
+    parts = text.split(',')
+    found, complete, i = [], True, 0
+    while i < len(parts):
+        for j in range(len(parts), i, -1):
+            candidate = ','.join(parts[i:j])
+            oid = lookup.get(candidate)
+            if oid is None:
+                oid = stripped.get(candidate.strip())
+            if oid is not None:
+                found.append(oid)
+                i = j
+                break
+        else:
+            if parts[i].strip():
+                complete = False
+            i += 1
+    return list(dict.fromkeys(found)), complete
+
+
+def upgrade():
+    op.create_table('question_options',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('question_id', 'position', name='uq_question_options_question_position')
+    )
+    op.create_table('answer_selections',
+    sa.Column('response_id', sa.Integer(), nullable=False),
+    sa.Column('option_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['option_id'], ['question_options.id'], ),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.ForeignKeyConstraint(['response_id'], ['responses.id'], ),
+    sa.PrimaryKeyConstraint('response_id', 'option_id')
+    )
+
+    conn = op.get_bind()
+
+    # options
+    rows = []
+    qtypes = {}
+    for qid, qtype, allowed in conn.execute(
+        sa.select(questions.c.id, questions.c.qtype, questions.c.allowed_types)
+        .where(questions.c.allowed_types.isnot(None))
+    ):
+        qtypes[qid] = qtype
+        for position, value in enumerate(dict.fromkeys(parse_allowed_types(allowed))):
+            rows.append({'question_id': qid, 'position': position, 'value': value})
+    for start in range(0, len(rows), BATCH):
+        conn.execute(question_options.insert(), rows[start:start + BATCH])
+
+    # selections, from the option text stored in choice answers
+    lookups = {}
+    for oid, qid, value in conn.execute(
+        sa.select(question_options.c.id, question_options.c.question_id, question_options.c.value)
+    ):
+        if qtypes.get(qid) in CHOICE_TYPES:
+            lookups.setdefault(qid, {})[value] = oid
+    if lookups:
+        result = conn.execution_options(yield_per=BATCH).execute(
+            sa.select(answers.c.response_id, answers.c.question_id, answers.c.answer_text)
+            .where(answers.c.question_id.in_(list(lookups)), answers.c.answer_text.isnot(None))
+        )
+        batch, unmatched, partial = [], 0, 0
+        for response_id, qid, text in result:
+            option_ids, complete = chosen_options(text, qtypes[qid] in MULTI_SELECT_TYPES, lookups[qid])
+            if not option_ids and text.strip():
+                unmatched += 1
+            elif not complete:
+                partial += 1
+            batch.extend({'response_id': response_id, 'option_id': oid, 'question_id': qid} for oid in option_ids)
+            if len(batch) >= BATCH:
+                conn.execute(answer_selections.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(answer_selections.insert(), batch)
+        if unmatched:
+            print(f"{unmatched} choice answers name no current option; their text is kept in answers.answer_text")
+        if partial:
+            print(f"{partial} choice answers name options that no longer exist besides current ones; "
+                  f"only the current ones were linked, the full text is kept in answers.answer_text")
+
+    with op.batch_alter_table('answer_selections', schema=None) as batch_op:
+        batch_op.create_index('ix_answer_selections_question_id_option_id', ['question_id', 'option_id'], unique=False)
+
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_column('allowed_types')
+
+
+def downgrade():
+    conn = op.get_bind()
+    options = {}
+    for qid, value in conn.execute(
+        sa.select(question_options.c.question_id, question_options.c.value)
+        .order_by(question_options.c.question_id, question_options.c.position)
+    ):
+        options.setdefault(qid, []).append(value)
+    # the old column holds the JSON list in 255 characters; refuse rather than lose options
+    too_long = sorted(qid for qid, values in options.items() if len(json.dumps(values)) > ALLOWED_TYPES_MAX_LEN)
+    if too_long:
+        raise RuntimeError(
+            f"Cannot downgrade: the options of {len(too_long)} question(s) do not fit in "
+            f"questions.allowed_types ({ALLOWED_TYPES_MAX_LEN} characters as JSON), "
+            f"question ids: {', '.join(map(str, too_long[:20]))}{' ...' if len(too_long) > 20 else ''}. "
+            f"Shorten or remove those options first."
+        )
+
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('allowed_types', sa.String(length=ALLOWED_TYPES_MAX_LEN), nullable=True))
+
+    for qid, values in options.items():
+        conn.execute(
+            questions.update().where(questions.c.id == qid).values(allowed_types=json.dumps(values))
+        )
+
+    with op.batch_alter_table('answer_selections', schema=None) as batch_op:
+        batch_op.drop_index('ix_answer_selections_question_id_option_id')
+
+    op.drop_table('answer_selections')
+    op.drop_table('question_options')
@@ -1,3 +1,4 @@
+# development server; in production run gunicorn run:app (presets in gunicorn.conf.py)
 from app.blueprints.app import create_app
 
 app = create_app()